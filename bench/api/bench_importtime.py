@@ -0,0 +1,80 @@
+"""Cold-start import time of every Lambda handler, checked against a budget.
+
+Each handler's app module is imported in a fresh interpreter with
+`-X importtime`, the way a Lambda cold start would import it. The budget in
+importtime_budget.json holds the cumulative import time allowed per handler
+in milliseconds.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from harness import API_DIR, SHARED_DIR, report
+
+BUDGET_PATH = Path(__file__).with_name("importtime_budget.json")
+RUNS = 5
+TOP_IMPORTS = 3
+
+
+def import_times(handler: str) -> dict[str, float]:
+    """Import a handler once with -X importtime.
+
+    Args:
+        handler: Handler directory name under src/api.
+
+    Returns:
+        Cumulative milliseconds for the app module and each of its direct imports.
+    """
+    env = os.environ | {
+        "PYTHONPATH": os.pathsep.join([str(SHARED_DIR), str(API_DIR)]),
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=API_DIR / handler,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Output is post-order, so an import's children are listed before it
+    children: dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1e3
+        elif depth == 0:
+            if name.strip() == "app":
+                return children | {"app": int(cumulative) / 1e3}
+            children = {}
+    raise RuntimeError(f"No import time reported for {handler}")
+
+
+def main() -> None:
+    """Report per-handler import time and its heaviest direct imports."""
+    budget = json.loads(BUDGET_PATH.read_text())
+    rows = []
+    for handler in sorted(budget):
+        runs = [import_times(handler) for _ in range(RUNS)]
+        best = min(runs, key=lambda times: times["app"])
+        total = best.pop("app")
+        heaviest = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        breakdown = ", ".join(f"{name} {ms:.0f}" for name, ms in heaviest[:TOP_IMPORTS])
+        status = "ok" if total <= budget[handler] else "OVER"
+        rows.append([handler, f"{total:.0f}", budget[handler], status, breakdown])
+    report(
+        "Handler import time (ms, best of 5)",
+        ["handler", "import", "budget", "status", "heaviest imports"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
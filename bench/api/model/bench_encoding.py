@@ -0,0 +1,93 @@
+"""Throughput and payload size of visualization JSON and binary encoding."""
+
+import gzip
+import json
+
+import numpy as np
+from harness import fmt_time, measure, report
+from model.app import NumpyEncoder, encode_binary, encode_json
+
+GRID_SIZE = 50
+
+
+def sample_visualization(dims: int) -> dict:
+    """Build visualization data at a realistic grid resolution.
+
+    Args:
+        dims: Number of dimensions.
+
+    Returns:
+        Visualization data with float64 arrays.
+    """
+    rng = np.random.default_rng(0)
+    axes = np.meshgrid(*[np.linspace(-3, 3, GRID_SIZE)] * dims)
+    return {
+        "actual": [
+            {"BUY": rng.normal(size=500), "SELL": rng.normal(size=500)}
+            for _ in range(dims)
+        ],
+        "centroid": rng.normal(size=dims),
+        "radius": float(rng.random()),
+        "grid": list(axes),
+        "preds": rng.integers(0, 2, axes[0].size),
+    }
+
+
+def count_values(data: dict) -> int:
+    """Count the numbers held in visualization data.
+
+    Args:
+        data: Visualization data.
+
+    Returns:
+        Total number of array elements and scalars.
+    """
+    arrays = [*data["grid"], data["centroid"], data["preds"]]
+    arrays += [array for side in data["actual"] for array in side.values()]
+    return sum(array.size for array in arrays) + 1
+
+
+def bench_dims(dims: int) -> None:
+    """Compare NumpyEncoder, encode_json and encode_binary for one dimensionality.
+
+    Args:
+        dims: Number of dimensions.
+    """
+    data = sample_visualization(dims)
+    values = count_values(data)
+    cases = [
+        ("NumpyEncoder", lambda: json.dumps(data, cls=NumpyEncoder)),
+        ("encode_json full", lambda: encode_json(data)),
+    ]
+    for digits in [6, 4]:
+        cases.append(
+            (
+                f"encode_json {digits} sd, compact",
+                lambda d=digits: encode_json(data, d, compact=True),
+            )
+        )
+    cases += [
+        ("encode_binary", lambda: encode_binary(data)),
+        ("encode_binary, gzip", lambda: gzip.compress(encode_binary(data), 6)),
+    ]
+    rows = []
+    for label, fx in cases:
+        size = len(fx())
+        per_call = measure(fx, repeat=3)
+        rate = values / per_call / 1e6
+        rows.append([label, fmt_time(per_call), f"{rate:.1f}", f"{size / 1e6:.2f}"])
+    report(
+        f"{dims}D visualization encoding ({values:,} values)",
+        ["encoder", "time", "M values/s", "payload MB"],
+        rows,
+    )
+
+
+def main() -> None:
+    """Report encoding time and payload size for 2D and 3D data."""
+    for dims in [2, 3]:
+        bench_dims(dims)
+
+
+if __name__ == "__main__":
+    main()
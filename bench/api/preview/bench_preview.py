@@ -0,0 +1,77 @@
+"""Response size and time of /preview for full history versus windows."""
+
+import json
+from datetime import date, timedelta
+from io import BytesIO
+
+import numpy as np
+from backtest import INTERVALS, backtest, downsample_preview, to_preview
+from harness import fmt_time, measure, report
+from preview import app
+
+YEARS = 10
+WINDOWS = [
+    {},
+    {"range": "all"},
+    {"interval": "week"},
+    {"interval": "month"},
+    {"range": "1y"},
+    {"range": "3m"},
+    {"interval": "week", "range": "5y"},
+]
+
+
+class LocalS3:
+    """Serve fixed objects in place of S3."""
+
+    def __init__(self, objects: dict[str, bytes]) -> None:
+        """Store the objects."""
+        self.objects = objects
+
+    def get_object(self, Bucket: str, Key: str) -> dict[str, BytesIO]:  # noqa: N803
+        """Return an object body."""
+        return {"Body": BytesIO(self.objects[Key])}
+
+
+def main() -> None:
+    """Report payload size and handler time per query."""
+    days = YEARS * 365
+    rng = np.random.default_rng(0)
+    close = 1_000 * np.cumprod(1 + rng.normal(0.001, 0.03, days))
+    signals = rng.random(days) < 0.6
+    start = date(2015, 1, 1)
+    times = [(start + timedelta(days=idx)).isoformat() for idx in range(days)]
+    preview = to_preview(times, signals, backtest(close, signals))
+    objects = {app.PREVIEW_KEY: json.dumps(preview).encode()}
+    for interval in INTERVALS[1:]:
+        tier = downsample_preview(preview, interval)
+        objects[app.TIER_KEY.format(interval=interval)] = json.dumps(tier).encode()
+    app.get_client = lambda _: LocalS3(objects)
+
+    rows = []
+    for params in WINDOWS:
+        event = {"headers": {}, "queryStringParameters": params}
+        res = app.get_preview(event, None)
+        body = json.loads(res["body"])
+        points = sum(len(side["data"]) for side in body.values())
+        per_call = measure(lambda e=event: app.get_preview(e, None))
+        parse = measure(lambda b=res["body"]: json.loads(b))
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        rows.append(
+            [
+                query or "(none)",
+                f"{points:,}",
+                f"{len(res['body']) / 1e3:,.0f}",
+                fmt_time(per_call),
+                fmt_time(parse),
+            ]
+        )
+    report(
+        f"/preview over {YEARS} years of daily points",
+        ["query", "points", "body kB", "handler", "client parse"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Cold-start and token verification benchmarks for shared auth."""
+
+import json
+import os
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from time import time
+
+import auth
+import rsa
+from harness import SHARED_DIR, fmt_time, measure, report, serve
+from jose import jwk, jwt
+
+
+def _cold_import() -> None:
+    """Import auth in a fresh interpreter, as a Lambda cold start would."""
+    subprocess.run([sys.executable, "-c", "import auth"], cwd=SHARED_DIR, check=True)
+
+
+def main() -> None:
+    """Report import, first verification and warm verification times."""
+    public, private = rsa.newkeys(2048)
+    public_jwk = jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict()
+    claims = {"aud": "bench", "exp": int(time()) + 3600}
+    token = jwt.encode(
+        claims, private.save_pkcs1().decode(), "RS256", headers={"kid": "bench"}
+    )
+    event = {"body": json.dumps({"token": token})}
+    os.environ["WEB_CLIENT_ID"] = "bench"
+    jwks = json.dumps({"keys": [public_jwk | {"kid": "bench"}]}).encode()
+
+    with serve(jwks) as url, redirect_stdout(StringIO()):
+
+        def _first_verify() -> None:
+            auth.jwks = auth.JWKSCache(f"{url}/jwks.json")
+            auth.verified_tokens = auth.VerifiedTokenCache()
+            auth.verify_token(event)
+
+        rows = [
+            ["import auth (fresh interpreter)", fmt_time(measure(_cold_import)), ""],
+            ["first verify (fetch + construct)", fmt_time(measure(_first_verify)), ""],
+        ]
+        for label, capacity in [("warm verify (uncached)", 0), ("warm verify", 256)]:
+            auth.verified_tokens = auth.VerifiedTokenCache(capacity)
+            per_call = measure(lambda: auth.verify_token(event), number=500)
+            rows.append([label, fmt_time(per_call), f"{1 / per_call:,.0f}"])
+
+    report("JWT verification", ["case", "time", "tokens/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
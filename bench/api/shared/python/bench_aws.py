@@ -0,0 +1,54 @@
+"""Client creation and per-call latency benchmarks for the AWS registry."""
+
+import os
+import subprocess
+import sys
+
+import aws
+import boto3
+from harness import SHARED_DIR, fmt_time, measure, report, serve
+
+
+def _cold_client() -> None:
+    """Create an S3 client in a fresh interpreter, as a Lambda cold start would."""
+    code = "import aws; aws.get_client('s3')"
+    subprocess.run([sys.executable, "-c", code], cwd=SHARED_DIR, check=True)
+
+
+def main() -> None:
+    """Report client creation cost and GetObject latency with and without reuse."""
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    rows = [["cold import + client", fmt_time(measure(_cold_client, repeat=3)), ""]]
+
+    def _new_client() -> None:
+        boto3.client("s3")
+
+    def _shared_client() -> None:
+        aws.get_client("s3")
+
+    rows.append(["boto3.client per call", fmt_time(measure(_new_client, 20)), ""])
+    rows.append(["get_client per call", fmt_time(measure(_shared_client, 1000)), ""])
+
+    with serve(b"x" * 1024) as url:
+
+        def _get_new() -> None:
+            s3 = boto3.client("s3", endpoint_url=url)
+            s3.get_object(Bucket="bench", Key="obj")["Body"].read()
+
+        def _get_shared() -> None:
+            s3 = aws.get_client("s3", endpoint_url=url)
+            s3.get_object(Bucket="bench", Key="obj")["Body"].read()
+
+        for label, fx in [
+            ("GetObject, new client", _get_new),
+            ("GetObject, shared", _get_shared),
+        ]:
+            per_call = measure(fx, number=50)
+            rows.append([label, fmt_time(per_call), f"{1 / per_call:,.0f}"])
+
+    report("AWS clients", ["case", "time", "calls/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
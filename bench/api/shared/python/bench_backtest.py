@@ -0,0 +1,109 @@
+"""Backtest engine time over 10+ years of daily prices and signals."""
+
+import json
+from datetime import date, timedelta
+
+import numpy as np
+from backtest import (
+    advance,
+    backtest,
+    build_preview,
+    simulate,
+    summarize,
+    summary_stats,
+    to_preview,
+)
+from harness import fmt_time, measure, report
+
+YEARS = [10, 15, 20]
+STRATEGY_COUNTS = [10, 100]
+
+
+def sample_csvs(days: int) -> tuple[str, str]:
+    """Build prices and signals.csv text for a run of daily closes.
+
+    Args:
+        days: Number of daily closes.
+
+    Returns:
+        Tuple of (prices, signals) CSV text.
+    """
+    rng = np.random.default_rng(0)
+    close = 1_000 * np.cumprod(1 + rng.normal(0.001, 0.03, days))
+    signals = rng.random(days) < 0.6
+    start = date(2010, 1, 1)
+    times = [(start + timedelta(days=idx)).isoformat() for idx in range(days)]
+    prices = "".join(f"{t},{c:.2f}\n" for t, c in zip(times, close, strict=True))
+    sigs = "".join(f"{t},{s}\n" for t, s in zip(times, signals, strict=True))
+    return f"Time,Close\n{prices}", f"Time,Sig\n{sigs}"
+
+
+def loop_balances(close: list[float], signals: list[bool], fee: float) -> list:
+    """Compute hyperdrive USD balances one day at a time, as a baseline.
+
+    Args:
+        close: Close prices.
+        signals: Signal at each close.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        USD balance after each close.
+    """
+    btc, usd, held = 1.0, 0.0, True
+    balances = []
+    for price, sig in zip(close, signals, strict=True):
+        if sig != held:
+            if sig:
+                btc, usd = usd * (1 - fee) / price, 0.0
+            else:
+                btc, usd = 0.0, btc * price * (1 - fee)
+            held = sig
+        balances.append(btc * price + usd)
+    return balances
+
+
+def main() -> None:
+    """Report each backtest stage, the full preview build and incremental appends."""
+    rows = []
+    for years in YEARS:
+        days = years * 365
+        prices, signals = sample_csvs(days)
+        rng = np.random.default_rng(1)
+        close = 1_000 * np.cumprod(1 + rng.normal(0.001, 0.03, days))
+        sig = rng.random(days) < 0.6
+        result = backtest(close, sig)
+        times = [str(idx) for idx in range(days)]
+        summary = summarize(times, close, sig, result)
+
+        def _append(summary: dict = summary, close: float = float(close[-1])) -> None:
+            advance(summary, "next", close, True)
+            summary_stats(summary)
+
+        cases = [
+            (
+                "python loop (balances only)",
+                lambda c=close, s=sig: loop_balances(c.tolist(), s.tolist(), 0.001),
+            ),
+            ("backtest (balances + stats)", lambda c=close, s=sig: backtest(c, s)),
+            ("to_preview", lambda t=times, s=sig, r=result: to_preview(t, s, r)),
+            (
+                "build_preview + json",
+                lambda p=prices, s=signals: json.dumps(build_preview(p, s)),
+            ),
+            ("advance + summary_stats (one close)", _append),
+        ]
+        for count in STRATEGY_COUNTS:
+            positions = rng.random((count, days)) < 0.6
+            cases.append(
+                (
+                    f"simulate {count} strategies",
+                    lambda c=close, p=positions: simulate(c, p),
+                )
+            )
+        for label, fx in cases:
+            rows.append([f"{years} y ({days:,} d)", label, fmt_time(measure(fx))])
+    report("Backtest engine", ["history", "case", "time"], rows)
+
+
+if __name__ == "__main__":
+    main()
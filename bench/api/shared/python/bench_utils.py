@@ -0,0 +1,44 @@
+"""CPU cost of utils.success for large JSON bodies read from S3."""
+
+import json
+
+from harness import fmt_time, measure, report
+from utils import RawJSON, success
+
+SIZES_MB = [0.1, 1, 4]
+
+
+def sample_body(size_mb: float) -> bytes:
+    """Build a preview-like JSON document of roughly the given size.
+
+    Args:
+        size_mb: Target size in megabytes.
+
+    Returns:
+        UTF-8 JSON bytes, as read from an S3 object body.
+    """
+    row = {"Time": "2024-01-01", "Bal": 10432.123456, "Name": "BTC"}
+    rows = int(size_mb * 1e6 / len(json.dumps(row)))
+    return json.dumps({"BTC": {"data": [row] * rows}}).encode()
+
+
+def main() -> None:
+    """Compare the validating string path with RawJSON passthrough."""
+    gzip_event = {"headers": {"Accept-Encoding": "gzip"}}
+    rows = []
+    for size_mb in SIZES_MB:
+        data = sample_body(size_mb)
+        cases = [
+            ("str (json.loads check)", lambda d=data: success(d.decode())),
+            ("RawJSON", lambda d=data: success(RawJSON(d))),
+            ("str + gzip", lambda d=data: success(d.decode(), event=gzip_event)),
+            ("RawJSON + gzip", lambda d=data: success(RawJSON(d), event=gzip_event)),
+        ]
+        for label, fx in cases:
+            per_call = measure(fx, repeat=3)
+            rows.append([f"{size_mb:g} MB", label, fmt_time(per_call)])
+    report("utils.success", ["body", "case", "time"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Shared setup, timing and reporting helpers for API benchmarks.
+
+Run every benchmark, or only those whose path contains FILTER, with:
+
+    uv run python bench/harness.py [FILTER]
+"""
+
+import importlib.util
+import os
+import sys
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from time import perf_counter
+from typing import Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+API_DIR = ROOT / "src" / "api"
+SHARED_DIR = API_DIR / "shared" / "python"
+SCRIPTS_DIR = ROOT / "scripts"
+
+# Same stubbed environment the test suite uses
+ENV_DEFAULTS = {
+    "TABLE_NAME": "users-local",
+    "THROTTLE_TABLE_NAME": "throttle-local",
+    "TEST": "true",
+    "STAGE": "dev",
+    "DOMAIN": "algotrade.io",
+    "STRIPE_SECRET_KEY": "sk_test_fake",
+    "STRIPE_PRICE_ID": "price_fake",
+    "EMIT_SECRET": "secret",
+    "S3_BUCKET": "test-bucket",
+    "EMAIL_USER": "test",
+    "EMAIL_PASS": "test",
+    "SIGNAL_EMAIL": "signal@test.com",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+for key, val in ENV_DEFAULTS.items():
+    os.environ.setdefault(key, val)
+for path in [str(SHARED_DIR), str(API_DIR), str(SCRIPTS_DIR), str(BENCH_DIR)]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def measure(fx: Callable[[], Any], number: int = 1, repeat: int = 5) -> float:
+    """Time a function and return the best mean seconds per call.
+
+    Args:
+        fx: Zero-argument function to time.
+        number: Calls per timing run.
+        repeat: Number of timing runs.
+
+    Returns:
+        Fastest observed seconds per call.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            fx()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def fmt_time(seconds: float) -> str:
+    """Format a duration with a readable unit.
+
+    Args:
+        seconds: Duration in seconds.
+
+    Returns:
+        Duration string in s, ms or µs.
+    """
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} µs"
+
+
+def report(title: str, header: list[str], rows: list[list[Any]]) -> None:
+    """Print a benchmark result table.
+
+    Args:
+        title: Table title.
+        header: Column names.
+        rows: Table rows, converted to strings.
+    """
+    cells = [header] + [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[idx]) for row in cells) for idx in range(len(header))]
+    print(f"\n{title}")
+    for idx, row in enumerate(cells):
+        padded = [cell.ljust(width) for cell, width in zip(row, widths, strict=True)]
+        print("  ".join(padded))
+        if not idx:
+            print("  ".join("-" * width for width in widths))
+
+
+@contextmanager
+def serve(payload: bytes) -> Iterator[str]:
+    """Serve a fixed payload from a local HTTP stand-in.
+
+    Args:
+        payload: Response body for every GET request.
+
+    Yields:
+        Base URL of the running server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        """Request handler that serves the payload."""
+
+        def do_GET(self) -> None:
+            """Respond with the payload."""
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *_: Any) -> None:
+            """Silence per-request logging."""
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_port}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def run(pattern: str = "") -> None:
+    """Import and run the main() of every matching bench_*.py module.
+
+    Args:
+        pattern: Only run benchmarks whose path contains this string.
+    """
+    for path in sorted(BENCH_DIR.rglob("bench_*.py")):
+        rel = path.relative_to(BENCH_DIR)
+        if pattern not in str(rel):
+            continue
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        if spec is None or spec.loader is None:
+            continue
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        print(f"\n=== {rel}")
+        module.main()
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "")
@@ -0,0 +1,47 @@
+"""Parameter-sweep throughput versus worker processes."""
+
+import os
+from itertools import product
+
+import numpy as np
+from harness import fmt_time, measure, report
+from sweep import evaluate, sweep
+
+YEARS = 10
+GRID = {
+    "confirm": list(range(1, 21)),
+    "fee": [0.0005, 0.001, 0.002, 0.004, 0.008],
+    "slippage": [0.0, 0.0005, 0.001, 0.002, 0.004],
+}
+
+
+def main() -> None:
+    """Report combinations per second, in process and across pool sizes."""
+    days = YEARS * 365
+    rng = np.random.default_rng(0)
+    close = 1_000 * np.cumprod(1 + rng.normal(0.001, 0.03, days))
+    signals = rng.random(days) < 0.6
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    rows = []
+    # The same combinations in one process, without a pool
+    combos = list(product(*GRID.values()))
+    in_process = measure(lambda: evaluate(close, signals, combos), repeat=2)
+    rows.append(
+        ["in process", fmt_time(in_process), f"{len(combos) / in_process:,.0f}"]
+    )
+    for count in workers:
+        per_run = measure(lambda n=count: sweep(close, signals, GRID, n), repeat=2)
+        rows.append(
+            [f"{count} workers", fmt_time(per_run), f"{len(combos) / per_run:,.0f}"]
+        )
+    report(
+        f"Sweep of {len(combos):,} combinations over {YEARS} years on {cores} cores",
+        ["run", "time", "combos/s"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Publish a trained model's files to S3 under a content-addressed version.
+
+The model directory holds metadata.json and, per dimensionality, the
+visualization pickles the training pipeline writes, e.g. 2D/grid.pkl. Each
+set of pickles is published as the packed and rendered artifacts the model
+Lambda reads, and every other file is published as it is.
+
+Run offline with:
+
+    make publish MODEL=path/to/model
+
+Objects are written in the order publish_version returns them, so the
+active manifest is replaced last. See docs/model_artifacts.md.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+from aws import get_client
+from model.app import (
+    LATEST_PREFIX,
+    MANIFEST_NAME,
+    PACKED_FORMAT,
+    PACKED_NAME,
+    RENDERED_NAME,
+    VISUALIZATION_LABELS,
+    flatten_arrays,
+    render_visualization,
+    version_prefix,
+)
+from utils import lazy_import
+
+np = lazy_import("numpy")
+
+
+def publish_version(files: dict[str, bytes]) -> dict[str, bytes]:
+    """Lay out a model's files under a content-addressed version prefix.
+
+    Write the returned objects in order. The active manifest comes last, so
+    readers switch to the new version only once all of its files exist.
+
+    Args:
+        files: File bytes keyed by path within the model, e.g. 'metadata.json'
+            or '2D/visualization.npz'.
+
+    Returns:
+        Object bytes keyed by S3 key.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}\0{len(files[name])}\0".encode())
+        digest.update(files[name])
+    version = digest.hexdigest()[:16]
+    prefix = version_prefix(version)
+    manifest = json.dumps({"version": version, "files": sorted(files)}).encode()
+    objects = {f"{prefix}{name}": body for name, body in files.items()}
+    objects[f"{prefix}{MANIFEST_NAME}"] = manifest
+    objects[f"{LATEST_PREFIX}{MANIFEST_NAME}"] = manifest
+    return objects
+
+
+def publish_visualization(data: dict[str, Any]) -> dict[str, bytes]:
+    """Build every visualization artifact for one dimensionality.
+
+    Each returned file is passed to publish_version as {dims}/{name}.
+
+    Args:
+        data: Visualization data keyed by VISUALIZATION_LABELS.
+
+    Returns:
+        Artifact bytes keyed by file name.
+    """
+    return {
+        PACKED_NAME: pack_visualization(data),
+        RENDERED_NAME: render_visualization(data).encode(),
+    }
+
+
+def pack_visualization(data: dict[str, Any]) -> bytes:
+    """Pack visualization data into a single .npz artifact.
+
+    Nested lists and dicts are flattened into one array per leaf, named by
+    its path, e.g. 'actual/0/BUY'.
+
+    Args:
+        data: Visualization data keyed by VISUALIZATION_LABELS.
+
+    Returns:
+        Uncompressed .npz bytes.
+    """
+    arrays = {"format": np.array(PACKED_FORMAT)}
+    arrays |= flatten_arrays({label: data[label] for label in VISUALIZATION_LABELS})
+    buffer = BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def read_model(model_dir: Path) -> dict[str, bytes]:
+    """Read a model directory into the files to publish.
+
+    Args:
+        model_dir: Directory with metadata.json and {dims}/{label}.pkl files.
+
+    Returns:
+        File bytes keyed by path within the model, with each dimensionality's
+        pickles replaced by its visualization artifacts.
+    """
+    pickles = {f"{label}.pkl" for label in VISUALIZATION_LABELS}
+    files: dict[str, bytes] = {}
+    for path in sorted(model_dir.rglob("*")):
+        name = path.relative_to(model_dir).as_posix()
+        if path.is_file() and path.name not in pickles:
+            files[name] = path.read_bytes()
+        elif path.is_dir() and all((path / pkl).is_file() for pkl in pickles):
+            data = {
+                label: pickle.loads((path / f"{label}.pkl").read_bytes())
+                for label in VISUALIZATION_LABELS
+            }
+            for artifact, body in publish_visualization(data).items():
+                files[f"{name}/{artifact}"] = body
+    return files
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Publish a local model directory to S3_BUCKET.
+
+    Args:
+        argv: Command line arguments, defaulting to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", type=Path, help="Model directory")
+    parser.add_argument("--bucket", default=os.environ.get("S3_BUCKET"))
+    parser.add_argument("--dry-run", action="store_true", help="Only list the keys")
+    args = parser.parse_args(argv)
+
+    if not (args.bucket or args.dry_run):
+        parser.error("Set --bucket or S3_BUCKET")
+
+    objects = publish_version(read_model(args.model))
+    for key, body in objects.items():
+        print(f"{key} ({len(body):,} bytes)")
+        if not args.dry_run:
+            get_client("s3").put_object(Bucket=args.bucket, Key=key, Body=body)
+
+
+if __name__ == "__main__":
+    main()
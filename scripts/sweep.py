@@ -0,0 +1,298 @@
+"""Backtest every combination of a strategy parameter grid in a process pool.
+
+Each combination is a variant of the hyperdrive strategy: how many closes
+in a row a new signal must repeat before it is acted on (confirm), and the
+fee and slippage paid on every trade. The closes and signals are copied
+into shared memory once, and workers read them in place instead of
+receiving a pickled copy with every batch.
+
+Run offline against local CSVs with:
+
+    make sweep SWEEP="prices.csv signals.csv --confirm 1 2 3 --slippage 0 0.0005"
+
+Results are saved as one compressed array per column, readable with
+numpy.load, and the best combinations are printed as a ranked summary.
+"""
+
+import argparse
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import product
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any
+
+from backtest import (
+    BACKTEST_FEE,
+    METRICS,
+    aggregate,
+    join_series,
+    metrics,
+    simulate,
+)
+from utils import lazy_import
+
+np = lazy_import("numpy")
+
+# Sweep configuration
+# SWEEP_CHUNK: Combinations per worker task, backtested with one simulate call
+#   per fee and slippage pair
+# SWEEP_RANK_BY: Result column the summary is ranked by
+SWEEP_CHUNK = int(os.environ.get("SWEEP_CHUNK", 64))
+SWEEP_RANK_BY = os.environ.get("SWEEP_RANK_BY", "USD Sharpe Ratio")
+
+# Strategy parameters in column order, with their default values
+PARAMS: dict[str, list[Any]] = {
+    "confirm": [1],
+    "fee": [BACKTEST_FEE],
+    "slippage": [0.0],
+}
+# One result column per metric and denomination, after the parameters
+METRIC_COLUMNS = [
+    f"{denom} {name}" for denom, names in METRICS.items() for name in names
+]
+# Metrics where lower values rank higher
+LOWER_IS_BETTER = {"Max Drawdown [%]", "Total Fees Paid"}
+# Columns printed in the ranked summary, besides the parameters
+SUMMARY_COLUMNS = [
+    "USD Total Return [%]",
+    "USD Max Drawdown [%]",
+    "USD Sharpe Ratio",
+    "BTC Total Return [%]",
+]
+
+# Arrays this worker reads from shared memory, and the blocks backing them
+_shared: dict[str, Any] = {}
+_blocks: list[SharedMemory] = []
+
+
+def confirm_positions(signals: Any, confirm: int) -> Any:
+    """Act on a signal only once it has repeated for `confirm` closes.
+
+    Args:
+        signals: Signal at each close, True for BUY and False for SELL.
+        confirm: Closes in a row a signal must be given before it is held.
+
+    Returns:
+        Whether BTC is held after each close. Like every strategy, it holds
+        BTC until the first confirmed signal.
+    """
+    signals = np.asarray(signals, dtype=bool)
+    idx = np.arange(len(signals))
+    change = np.ones(len(signals), dtype=bool)
+    change[1:] = signals[1:] != signals[:-1]
+    run = idx - np.maximum.accumulate(np.where(change, idx, 0)) + 1
+    acted = np.maximum.accumulate(np.where(run >= confirm, idx, -1))
+    return np.where(acted >= 0, signals[np.maximum(acted, 0)], True)
+
+
+def evaluate(close: Any, signals: Any, combos: list[tuple]) -> Any:
+    """Backtest parameter combinations over one price and signal series.
+
+    Combinations sharing a fee and slippage are simulated together. Both
+    are charged as one proportional cost per trade, so 'Total Fees Paid'
+    includes slippage.
+
+    Args:
+        close: Close prices, shape (periods,).
+        signals: Signal at each close, True for BUY and False for SELL.
+        combos: Parameter values in PARAMS order.
+
+    Returns:
+        Metric values in METRIC_COLUMNS order, shape (combos, metrics).
+    """
+    values = np.empty((len(combos), len(METRIC_COLUMNS)))
+    groups: dict[float, list[int]] = {}
+    for row, (_, fee, slippage) in enumerate(combos):
+        cost = 1 - (1 - fee) * (1 - slippage)
+        groups.setdefault(cost, []).append(row)
+    positions_by_confirm: dict[int, Any] = {}
+    for cost, rows in groups.items():
+        for row in rows:
+            confirm = combos[row][0]
+            if confirm not in positions_by_confirm:
+                positions_by_confirm[confirm] = confirm_positions(signals, confirm)
+        positions = np.stack([positions_by_confirm[combos[row][0]] for row in rows])
+        result = simulate(close, positions, cost)
+        # USD balances are exposed while holding BTC, BTC balances while holding USD
+        exposure = {"USD": positions, "BTC": ~positions}
+        col = 0
+        for denom, names in METRICS.items():
+            side = result[denom]
+            stats = metrics(
+                aggregate(
+                    side["balances"],
+                    exposure[denom],
+                    result["traded"],
+                    side["fees"],
+                    cost,
+                )
+            )
+            for name in names:
+                values[rows, col] = stats[name]
+                col += 1
+    return values
+
+
+@contextmanager
+def shared_arrays(arrays: dict[str, Any]) -> Iterator[dict[str, tuple]]:
+    """Copy arrays into shared memory for the lifetime of the context.
+
+    Args:
+        arrays: Name mapped to the array to share.
+
+    Yields:
+        Name mapped to (block name, shape, dtype), as _attach takes.
+    """
+    blocks = []
+    specs = {}
+    try:
+        for key, array in arrays.items():
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+            specs[key] = (block.name, array.shape, array.dtype.str)
+        yield specs
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach(specs: dict[str, tuple]) -> None:
+    """Map the shared arrays into a worker, as its pool initializer."""
+    for key, (name, shape, dtype) in specs.items():
+        # The parent owns the blocks and unlinks them when the sweep ends
+        block = SharedMemory(name=name, track=False)
+        _blocks.append(block)
+        _shared[key] = np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _evaluate_shared(combos: list[tuple]) -> Any:
+    """Backtest combinations over the worker's shared arrays."""
+    return evaluate(_shared["close"], _shared["signals"], combos)
+
+
+def sweep(
+    close: Any,
+    signals: Any,
+    grid: dict[str, list[Any]],
+    workers: int | None = None,
+    chunk: int = SWEEP_CHUNK,
+) -> dict[str, Any]:
+    """Backtest every combination of a parameter grid across processes.
+
+    Args:
+        close: Close prices, shape (periods,).
+        signals: Signal at each close, True for BUY and False for SELL.
+        grid: Parameter name mapped to the values to try. Parameters left
+            out keep their PARAMS defaults.
+        workers: Worker processes, defaulting to one per CPU.
+        chunk: Combinations per worker task.
+
+    Returns:
+        Column name mapped to one value per combination: the parameters in
+        PARAMS order, then METRIC_COLUMNS.
+
+    Raises:
+        ValueError: If the grid names an unknown parameter.
+    """
+    unknown = set(grid) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    grid = PARAMS | grid
+    combos = list(product(*(grid[name] for name in PARAMS)))
+    tasks = [combos[start : start + chunk] for start in range(0, len(combos), chunk)]
+    arrays = {
+        "close": np.asarray(close, dtype=float),
+        "signals": np.asarray(signals, dtype=bool),
+    }
+    with (
+        shared_arrays(arrays) as specs,
+        ProcessPoolExecutor(workers, initializer=_attach, initargs=(specs,)) as pool,
+    ):
+        values = np.concatenate(list(pool.map(_evaluate_shared, tasks)))
+    columns = {
+        name: np.array([combo[idx] for combo in combos])
+        for idx, name in enumerate(PARAMS)
+    }
+    return columns | dict(zip(METRIC_COLUMNS, values.T, strict=True))
+
+
+def rank(
+    columns: dict[str, Any], by: str = SWEEP_RANK_BY, top: int = 10
+) -> list[dict[str, Any]]:
+    """Pick the best combinations by one metric column.
+
+    Args:
+        columns: Output of sweep.
+        by: Metric column to rank by, from METRIC_COLUMNS.
+        top: Number of combinations to return.
+
+    Returns:
+        Best combinations first, each as column name mapped to its value.
+        Combinations where the metric is undefined rank last.
+    """
+    values = columns[by]
+    key = values if by.split(" ", 1)[1] in LOWER_IS_BETTER else -values
+    order = np.argsort(np.where(np.isnan(key), np.inf, key), kind="stable")[:top]
+    return [{name: col[idx].item() for name, col in columns.items()} for idx in order]
+
+
+def save(columns: dict[str, Any], path: Path) -> None:
+    """Save sweep results as one compressed array per column.
+
+    Args:
+        columns: Output of sweep.
+        path: Destination .npz file.
+    """
+    np.savez_compressed(path, **columns)
+
+
+def _format(rows: list[dict[str, Any]], names: list[str]) -> str:
+    """Format ranked rows as an aligned text table."""
+    cells = [["#", *names]] + [
+        [str(idx), *(f"{row[name]:.6g}" for name in names)]
+        for idx, row in enumerate(rows, 1)
+    ]
+    widths = [max(len(row[col]) for row in cells) for col in range(len(cells[0]))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths, strict=True))
+        for row in cells
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run a sweep over local CSVs, save it and print the ranked summary.
+
+    Args:
+        argv: Command line arguments, defaulting to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prices", type=Path, help="CSV with Time and Close")
+    parser.add_argument("signals", type=Path, help="signals.csv")
+    parser.add_argument("--confirm", type=int, nargs="+", default=PARAMS["confirm"])
+    parser.add_argument("--fee", type=float, nargs="+", default=PARAMS["fee"])
+    parser.add_argument("--slippage", type=float, nargs="+", default=PARAMS["slippage"])
+    parser.add_argument("--workers", type=int, help="Default: one per CPU")
+    parser.add_argument("--chunk", type=int, default=SWEEP_CHUNK)
+    parser.add_argument("--out", type=Path, default=Path("sweep.npz"))
+    parser.add_argument("--rank-by", choices=METRIC_COLUMNS, default=SWEEP_RANK_BY)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    _, close, signals = join_series(args.prices.read_text(), args.signals.read_text())
+    grid = {name: getattr(args, name) for name in PARAMS}
+    columns = sweep(close, signals, grid, args.workers, args.chunk)
+    save(columns, args.out)
+
+    names = [*PARAMS, *dict.fromkeys([args.rank_by, *SUMMARY_COLUMNS])]
+    print(f"{len(columns['fee']):,} combinations over {len(close):,} closes")
+    print(f"Saved to {args.out}, best by {args.rank_by}:")
+    print(_format(rank(columns, args.rank_by, args.top), names))
+
+
+if __name__ == "__main__":
+    main()
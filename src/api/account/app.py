@@ -5,13 +5,32 @@ import os
 import re
 from typing import Any
 
-import stripe
-from models import ALERTS_LOOKUP, ATTRS_LOOKUP, UserModel
-from utils import error, get_origin, options, success, verify_user
+from billing import get_stripe_client
+from models import ALERTS_LOOKUP, ATTRS_LOOKUP, UserModel, get_or_create_user
+from pynamodb.exceptions import UpdateError
+from pynamodb.expressions.update import Action
+from utils import (
+    error,
+    get_body,
+    get_origin,
+    options,
+    success,
+    verify_user,
+)
 
-stripe_client = stripe.StripeClient(os.environ["STRIPE_SECRET_KEY"])
 domain = os.environ["DOMAIN"]
 
+# Attributes the UI renders, selectable with GET /account?fields=a,b
+ACCOUNT_FIELDS = [
+    "email",
+    "api_key",
+    "customer_id",
+    "in_beta",
+    "subscribed",
+    "permissions",
+    "alerts",
+]
+
 
 def handle_account(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Route account requests to appropriate handler.
@@ -34,10 +53,11 @@ def handle_account(event: dict[str, Any], _: Any) -> dict[str, Any]:
 
 
 def get_account(event: dict[str, Any]) -> dict[str, Any]:
-    """Get user account details.
+    """Get user account details, creating the account on first login.
 
     Args:
-        event: API Gateway event with authorization claims.
+        event: API Gateway event with authorization claims and an optional
+            comma-separated `fields` query parameter to project the response.
 
     Returns:
         Success response with user data or 401 error.
@@ -49,13 +69,104 @@ def get_account(event: dict[str, Any]) -> dict[str, Any]:
         return error(401, "This account is not verified.", origin)
 
     email = verified["email"]
-    try:
-        user = UserModel.get(email)
-    except UserModel.DoesNotExist:
-        user = UserModel(email)
-        user.save()
+    params = event.get("queryStringParameters") or {}
+    requested = set((params.get("fields") or "").split(","))
+    fields = [field for field in ACCOUNT_FIELDS if field in requested]
+    user = get_or_create_user(email, attributes_to_get=fields or None)
+    user_data = user.to_simple_dict()
+    if fields:
+        user_data = {field: user_data[field] for field in fields if field in user_data}
 
-    return success(user.to_simple_dict(), origin=origin)
+    return success(user_data, origin=origin)
+
+
+def get_account_diff(req_body: dict[str, Any], email: str) -> dict[str, Any]:
+    """Extract the validated fields a request asks to change.
+
+    Args:
+        req_body: Parsed request body.
+        email: Email of the verified user.
+
+    Returns:
+        Dict of attribute name to new value, with nested dicts for map
+        attributes holding only the requested keys.
+    """
+    diff: dict[str, Any] = {}
+    permissions = req_body.get("permissions") or {}
+    if permissions.get("read_disclaimer"):
+        diff["permissions"] = {"read_disclaimer": True}
+
+    alerts = {}
+    for key, val in (req_body.get("alerts") or {}).items():
+        if key in ALERTS_LOOKUP:
+            # type(getattr(Alerts, 'sms')) == BooleanAttribute
+            expected_attr = ALERTS_LOOKUP[key]["attr"]
+            expected_type = ATTRS_LOOKUP[expected_attr]
+            if isinstance(val, expected_type):
+                alerts[key] = val
+    if alerts:
+        diff["alerts"] = alerts
+
+    if "in_beta" in req_body:
+        in_beta = int(req_body["in_beta"])
+        pattern = rf"^.*@(dev\.)?{re.escape(domain)}$"
+        if re.match(pattern, email):
+            print("updating beta status", email, in_beta)
+            diff["in_beta"] = in_beta
+    return diff
+
+
+def update_account(email: str, diff: dict[str, Any]) -> UserModel:
+    """Apply an account diff, writing only the values that change.
+
+    The user is read first, so a request that repeats the stored values
+    costs one GetItem and no write. Otherwise only the changed nested paths
+    are set in one UpdateItem and the user is rebuilt from its ALL_NEW
+    response. Items created before a map attribute existed are written with
+    the merged maps instead.
+
+    Args:
+        email: Email of the user to update.
+        diff: Changes from get_account_diff.
+
+    Returns:
+        Updated user model.
+
+    Raises:
+        UserModel.DoesNotExist: If the user does not exist.
+    """
+    user = UserModel.get(email)
+    current = user.to_simple_dict()
+    actions: list[Action] = []
+    condition = UserModel.email.exists()
+    merged: dict[str, Any] = {}
+    for name, value in diff.items():
+        attr = getattr(UserModel, name)
+        if isinstance(value, dict):
+            changed = {
+                key: val
+                for key, val in value.items()
+                if current.get(name, {}).get(key) != val
+            }
+            if changed:
+                actions += [attr[key].set(val) for key, val in changed.items()]
+                condition &= attr.exists()
+                merged[name] = current.get(name, {}) | changed
+        elif current.get(name) != value:
+            actions.append(attr.set(value))
+            merged[name] = value
+    if not actions:
+        return user
+
+    try:
+        user.update(actions=actions, condition=condition)
+    except UpdateError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+        user.update(
+            actions=[getattr(UserModel, name).set(val) for name, val in merged.items()]
+        )
+    return user
 
 
 def post_account(event: dict[str, Any]) -> dict[str, Any]:
@@ -74,39 +185,9 @@ def post_account(event: dict[str, Any]) -> dict[str, Any]:
         return error(401, "This account is not verified.", origin)
 
     email = verified["email"]
-    user = UserModel.get(email)
-    req_body = json.loads(event["body"])
-    actions = []
-    if (
-        "permissions" in req_body
-        and "read_disclaimer" in req_body["permissions"]
-        and req_body["permissions"]["read_disclaimer"]
-    ):
-        user.permissions.read_disclaimer = True
-        actions.append(UserModel.permissions.set(user.permissions))
-
-    if "alerts" in req_body:
-        alerts = user.to_simple_dict()["alerts"]
-        updated_alerts = req_body["alerts"]
-        for key, val in updated_alerts.items():
-            if key in ALERTS_LOOKUP:
-                # type(getattr(Alerts, 'sms')) == BooleanAttribute
-                expected_attr = ALERTS_LOOKUP[key]["attr"]
-                expected_type = ATTRS_LOOKUP[expected_attr]
-                if isinstance(val, expected_type):
-                    alerts[key] = val
-        user.alerts = alerts
-        actions.append(UserModel.alerts.set(user.alerts))
-
-    if "in_beta" in req_body:
-        in_beta = int(req_body["in_beta"])
-        pattern = rf"^.*@(dev\.)?{re.escape(domain)}$"
-        if re.match(pattern, email):
-            print("updating beta status", email, in_beta)
-            actions.append(UserModel.in_beta.set(in_beta))
-
-    if actions:
-        user.update(actions=actions)
+    req_body = json.loads(get_body(event))
+    diff = get_account_diff(req_body, email)
+    user = update_account(email, diff) if diff else UserModel.get(email)
 
     return success(user.to_simple_dict(), origin=origin)
 
@@ -127,7 +208,7 @@ def delete_account(event: dict[str, Any]) -> dict[str, Any]:
     customer_id = user.customer_id
     if customer_id and customer_id != "_":
         # deleting a customer automatically cancels subscriptions
-        stripe_client.v1.customers.delete(customer_id)
+        get_stripe_client().v1.customers.delete(customer_id)
     user.delete()
 
     return success("OK", origin=origin)
@@ -5,9 +5,18 @@ import logging
 import os
 from typing import Any
 
-import boto3
+from aws import get_client
 from botocore.exceptions import ClientError
-from utils import TEST, error, get_email, get_origin, options, success, verify_user
+from utils import (
+    TEST,
+    error,
+    get_body,
+    get_email,
+    get_origin,
+    options,
+    success,
+    verify_user,
+)
 
 
 def handle_contact(event: dict[str, Any], _: Any) -> dict[str, Any]:
@@ -40,7 +49,7 @@ def post_contact(event: dict[str, Any]) -> dict[str, Any]:
     if not verified:
         return error(401, "This account is not verified.", origin)
 
-    req_body = json.loads(event["body"])
+    req_body = json.loads(get_body(event))
     subject = req_body.get("subject")
     message = req_body.get("message")
     max_subject_len = 64
@@ -72,9 +81,8 @@ def send_email(user: str, subject: str, message: str) -> bool:
     """
     sender = get_email(os.environ["EMAIL_USER"], os.environ["STAGE"])
     recipient = "success@simulator.amazonses.com" if TEST else sender
-    region = "us-east-1"
     charset = "UTF-8"
-    client = boto3.client("sesv2", region_name=region)
+    client = get_client("sesv2", region_name="us-east-1")
 
     try:
         response = client.send_email(
@@ -1,31 +1,268 @@
 """Gym Lambda handler for retrieving exercise log data."""
 
+import math
+import os
+from hashlib import sha256
 from io import BytesIO
+from threading import Lock, Thread
+from time import time
 from typing import Any
 
-import pandas as pd
-import requests
-from utils import get_origin, success
+from aws import get_client
+from botocore.exceptions import BotoCoreError, ClientError
+from utils import RawJSON, error, get_origin, lazy_import, success
+
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+
+# Exercise log source: the Workouts sheet exported as CSV
+SHEET_URL = os.environ.get(
+    "EXERCISE_LOG_URL",
+    "https://docs.google.com/spreadsheets/d/"
+    "1Pu6T67VpIl049GGIyoe_OARejxuXSl-aWK5x2ORaCcY/"
+    "gviz/tq?tqx=out:csv&sheet=Workouts",
+)
+COLUMNS = ["Date", "Id", "Weight", "Reps", "Exercise", "Volume", "1RM"]
+
+# Exercise log caching
+# EXERCISE_LOG_TTL: Seconds a fetched log is served before it is revalidated
+# EXERCISE_LOG_MAX_STALE: Seconds past the TTL a log is still served at once
+#   while it is revalidated in the background; older logs are refreshed first
+# EXERCISE_LOG_RETRY: Minimum seconds between attempts after the sheet fails
+# EXERCISE_LOG_CONNECT_TIMEOUT / EXERCISE_LOG_READ_TIMEOUT: Seconds to wait on
+#   the sheet before falling back to the last good snapshot
+EXERCISE_LOG_TTL = float(os.environ.get("EXERCISE_LOG_TTL", 300))
+EXERCISE_LOG_MAX_STALE = float(os.environ.get("EXERCISE_LOG_MAX_STALE", 86400))
+EXERCISE_LOG_RETRY = float(os.environ.get("EXERCISE_LOG_RETRY", 60))
+EXERCISE_LOG_CONNECT_TIMEOUT = float(os.environ.get("EXERCISE_LOG_CONNECT_TIMEOUT", 2))
+EXERCISE_LOG_READ_TIMEOUT = float(os.environ.get("EXERCISE_LOG_READ_TIMEOUT", 5))
+# Last good snapshot of the records, shared by every container, and an empty
+# object whose metadata records when they were last confirmed current
+SNAPSHOT_KEY = "data/api/gym/exercise_log.json"
+VALIDATED_KEY = "data/api/gym/exercise_log.validated"
+# Failures reading or writing the snapshot, which never fail a request
+S3_ERRORS = (ClientError, BotoCoreError)
+
+
+def parse_records(content: bytes) -> bytes:
+    """Parse the sheet's CSV export into records JSON.
+
+    Args:
+        content: CSV export of the Workouts sheet.
+
+    Returns:
+        JSON array of records with COLUMNS, without repeated header rows.
+
+    Raises:
+        ValueError: If the CSV is malformed or lacks any of COLUMNS.
+    """
+    df = pd.read_csv(BytesIO(content))
+    missing = set(COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Exercise log is missing columns: {sorted(missing)}")
+    df = df[df["Exercise"] != "Exercise"]
+    return df[COLUMNS].to_json(orient="records").encode()
+
+
+class ExerciseLogCache:
+    """Parsed exercise log records, kept in the container and in S3.
+
+    Records younger than the TTL are served as is. Older records are served
+    while a background refresh revalidates them, up to `max_stale` past the
+    TTL, after which the sheet is read before responding. Refreshes send the
+    sheet's ETag and skip parsing unchanged CSV, and a failed refresh keeps
+    serving the last good records.
+    """
+
+    def __init__(
+        self,
+        url: str = SHEET_URL,
+        ttl: float = EXERCISE_LOG_TTL,
+        max_stale: float = EXERCISE_LOG_MAX_STALE,
+        retry: float = EXERCISE_LOG_RETRY,
+        timeout: tuple[float, float] = (
+            EXERCISE_LOG_CONNECT_TIMEOUT,
+            EXERCISE_LOG_READ_TIMEOUT,
+        ),
+    ) -> None:
+        """Initialize an empty cache without touching the network or S3.
+
+        Args:
+            url: CSV export URL of the sheet.
+            ttl: Seconds before fetched records are revalidated.
+            max_stale: Seconds past the TTL stale records are served at once.
+            retry: Minimum seconds between attempts after a failed refresh.
+            timeout: Connect and read timeouts for the sheet, in seconds.
+        """
+        self.url = url
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry = retry
+        self.timeout = timeout
+        self.records: bytes | None = None
+        self.digest: str | None = None
+        self.etag: str | None = None
+        # Wall clock, as snapshots are shared between containers
+        self.fetched_at: float | None = None
+        self.failed_at: float | None = None
+        self.loaded = False
+        self.refreshing: Thread | None = None
+        self._lock = Lock()
+
+    def get(self) -> bytes | None:
+        """Get the records, refreshing them as needed.
+
+        Returns:
+            Records JSON, or None if the sheet has never been read.
+        """
+        if not self.loaded:
+            self.load()
+        now = time()
+        age = math.inf if self.fetched_at is None else now - self.fetched_at
+        if age < self.ttl:
+            return self.records
+        if self.failed_at is not None and now - self.failed_at < self.retry:
+            return self.records
+        if self.records is not None and age < self.ttl + self.max_stale:
+            self.revalidate()
+        else:
+            self.refresh()
+        return self.records
+
+    def revalidate(self) -> None:
+        """Refresh in a background thread, unless one is already running."""
+        if self.refreshing is None or not self.refreshing.is_alive():
+            # Lambda may freeze the thread after responding, in which case it
+            # finishes during the next invocation
+            self.refreshing = Thread(target=self.refresh, daemon=True)
+            self.refreshing.start()
+
+    def refresh(self) -> bool:
+        """Read the sheet and update the records if it changed.
+
+        Returns:
+            Whether the records are now current. On failure the last good
+            records are kept.
+        """
+        with self._lock:
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+            try:
+                res = requests.get(self.url, headers=headers, timeout=self.timeout)
+                if res.status_code != 304:
+                    res.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Could not refresh exercise log, serving last good one: {e}")
+                self.failed_at = time()
+                return False
+            changed = False
+            if res.status_code != 304:
+                digest = sha256(res.content).hexdigest()
+                if digest != self.digest:
+                    try:
+                        self.records = parse_records(res.content)
+                    except ValueError as e:
+                        print(
+                            f"Could not parse exercise log, serving last good one: {e}"
+                        )
+                        self.failed_at = time()
+                        return False
+                    self.digest = digest
+                    changed = True
+                self.etag = res.headers.get("ETag")
+            self.fetched_at, self.failed_at = time(), None
+            # Unchanged records keep their snapshot, and only the time they
+            # were last confirmed current is stored beside it
+            if changed:
+                self.save()
+            else:
+                self.mark_validated()
+            return True
+
+    def load(self) -> None:
+        """Read the last good snapshot from S3, if there is one.
+
+        S3 being unreachable is treated like a missing snapshot, so the sheet
+        is read instead.
+        """
+        self.loaded = True
+        bucket = os.environ["S3_BUCKET"]
+        try:
+            s3 = get_client("s3")
+            obj = s3.get_object(Bucket=bucket, Key=SNAPSHOT_KEY)
+            records = obj["Body"].read()
+        except S3_ERRORS as e:
+            if not _missing(e):
+                print(f"Could not read exercise log snapshot: {e}")
+            return
+        meta = obj.get("Metadata", {})
+        self.records = records
+        self.digest = meta.get("source-digest")
+        self.etag = meta.get("source-etag")
+        self.fetched_at = float(meta.get("fetched-at", 0))
+        try:
+            meta = s3.head_object(Bucket=bucket, Key=VALIDATED_KEY).get("Metadata", {})
+        except S3_ERRORS as e:
+            if not _missing(e):
+                print(f"Could not read exercise log validation time: {e}")
+            return
+        # Only a validation of the same records extends their age
+        if meta.get("source-digest") == self.digest:
+            self.fetched_at = max(self.fetched_at, float(meta.get("validated-at", 0)))
+
+    def save(self) -> None:
+        """Write the records to S3 as the last good snapshot."""
+        meta = {"fetched-at": str(self.fetched_at), "source-digest": self.digest}
+        if self.etag:
+            meta["source-etag"] = self.etag
+        try:
+            get_client("s3").put_object(
+                Bucket=os.environ["S3_BUCKET"],
+                Key=SNAPSHOT_KEY,
+                Body=self.records,
+                ContentType="application/json",
+                Metadata=meta,
+            )
+        except S3_ERRORS as e:
+            print(f"Could not write exercise log snapshot: {e}")
+
+    def mark_validated(self) -> None:
+        """Record in S3 that the snapshot's records were just confirmed current."""
+        meta = {"validated-at": str(self.fetched_at), "source-digest": self.digest}
+        try:
+            get_client("s3").put_object(
+                Bucket=os.environ["S3_BUCKET"],
+                Key=VALIDATED_KEY,
+                Body=b"",
+                Metadata=meta,
+            )
+        except S3_ERRORS as e:
+            print(f"Could not write exercise log validation time: {e}")
+
+
+def _missing(e: Exception) -> bool:
+    """Tell whether an S3 error is for a key that does not exist."""
+    return isinstance(e, ClientError) and e.response["Error"]["Code"] in {
+        "NoSuchKey",
+        "404",
+    }
+
+
+exercise_log = ExerciseLogCache()
 
 
 def get_exercise_log(event: dict[str, Any], _: Any) -> dict[str, Any]:
-    """Fetch exercise log from Google Sheets.
+    """Get the exercise log from Google Sheets, through the cache.
 
     Args:
         event: API Gateway event.
         _: Lambda context (unused).
 
     Returns:
-        API response with exercise log records as JSON.
+        API response with exercise log records as JSON, compressed if the
+        client accepts it, or 502 if the sheet has never been read.
     """
     origin = get_origin(event)
-    res = requests.get(
-        "https://docs.google.com/spreadsheets/d/"
-        "1Pu6T67VpIl049GGIyoe_OARejxuXSl-aWK5x2ORaCcY/"
-        "gviz/tq?tqx=out:csv&sheet=Workouts"
-    )
-    df = pd.read_csv(BytesIO(res.content))
-    df = df[df["Exercise"] != "Exercise"]
-    df = df[["Date", "Id", "Weight", "Reps", "Exercise", "Volume", "1RM"]]
-    records = df.to_json(orient="records")
-    return success(records, origin=origin)
+    records = exercise_log.get()
+    if records is None:
+        return error(502, "Exercise log is unavailable.", origin)
+    return success(RawJSON(records), origin=origin, event=event)
@@ -1,66 +1,771 @@
 """Model Lambda handler for ML model metadata and visualizations."""
 
+import base64
+import gzip
 import json
 import os
 import pickle
+import re
+import struct
+from collections import OrderedDict
+from io import BytesIO
+from itertools import permutations
+from time import monotonic
 from typing import Any
 
-import boto3
-import numpy as np
-from utils import get_origin, success
+from aws import get_client
+from botocore.exceptions import ClientError
+from utils import (
+    RawJSON,
+    accepts,
+    decode,
+    error,
+    get_headers,
+    get_origin,
+    lazy_import,
+    normalize_headers,
+    success,
+)
 
-s3 = boto3.client("s3")
+np = lazy_import("numpy")
+
+# Published models live under models/versions/{version}/, where the version
+# is a hash of the model's files. models/latest/manifest.json names the
+# active version; models/latest/ itself is only read when no manifest exists.
+LATEST_PREFIX = "models/latest/"
+VERSIONS_PREFIX = "models/versions/"
+MANIFEST_NAME = "manifest.json"
+VERSION_PATTERN = re.compile(r"[0-9a-f]{16}")
+# MODEL_MANIFEST_TTL: Seconds a warm container trusts the manifest it last read
+MANIFEST_TTL = float(os.environ.get("MODEL_MANIFEST_TTL", 30))
+# Responses for an explicit ?version= never change
+IMMUTABLE_MAX_AGE = 365 * 86400
+
+VISUALIZATION_LABELS = ["actual", "centroid", "radius", "grid", "preds"]
+# Published artifacts: the final response body, and the arrays it is built from
+RENDERED_NAME = "visualization.json"
+PACKED_NAME = "visualization.npz"
+PACKED_FORMAT = 1
+# grid: every lattice point and its prediction
+# boundary: the decision boundary as line segments (2D) or a triangle mesh (3D)
+VISUALIZATION_FORMATS = {"grid", "boundary"}
+# Typed-array encoding for clients that send Accept: BINARY_MEDIA_TYPE
+BINARY_MEDIA_TYPE = "application/vnd.algotrade.visualization"
+BINARY_FORMAT = 1
+# Crossing edges per simplex, by number of inside corners. Corners are
+# ordered inside first; each case is one face (segment or triangle) listed as
+# the simplex edges it crosses.
+BOUNDARY_CASES = {
+    2: {
+        1: [[(0, 1), (0, 2)]],
+        2: [[(0, 2), (1, 2)]],
+    },
+    3: {
+        1: [[(0, 1), (0, 2), (0, 3)]],
+        2: [[(0, 2), (0, 3), (1, 3)], [(0, 2), (1, 3), (1, 2)]],
+        3: [[(0, 3), (1, 3), (2, 3)]],
+    },
+}
+
+# Level of detail for /visualization?resolution=N
+# MIN_RESOLUTION / MAX_RESOLUTION: Allowed grid points per axis
+# LOD_CACHE_SIZE: Downsampled or boundary bodies kept per container
+MIN_RESOLUTION = int(os.environ.get("VISUALIZATION_MIN_RESOLUTION", 4))
+MAX_RESOLUTION = int(os.environ.get("VISUALIZATION_MAX_RESOLUTION", 128))
+LOD_CACHE_SIZE = int(os.environ.get("VISUALIZATION_LOD_CACHE_SIZE", 8))
+
+# Reduced precision for /visualization?digits=N, served at full precision
+# unless requested
+# VISUALIZATION_DIGITS: Significant digits served when ?digits= is not given;
+#   unset serves full precision
+# MIN_DIGITS / MAX_DIGITS: Allowed significant digits
+VISUALIZATION_DIGITS = (
+    int(os.environ["VISUALIZATION_DIGITS"])
+    if os.environ.get("VISUALIZATION_DIGITS")
+    else None
+)
+MIN_DIGITS = 1
+MAX_DIGITS = 17
+
+# Active version and when to re-read the manifest
+manifest_cache: dict[str, Any] = {"version": None, "expires": 0.0}
+# Versions confirmed to exist, so pinned requests skip the lookup
+known_versions: set[str] = set()
+
+# (version or None, dims, resolution, format, media type, content coding)
+#   -> (version or ETag of the packed artifact, rendered body)
+lod_cache: OrderedDict[tuple, tuple[str, str | bytes]] = OrderedDict()
 
 
 def get_model(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Get ML model metadata.
 
     Args:
-        event: API Gateway event.
+        event: API Gateway event with an optional version query parameter.
         _: Lambda context (unused).
 
     Returns:
-        API response with model metadata (created, start, end, features, accuracy).
+        API response with model metadata (created, start, end, features,
+        accuracy, and version once models are versioned).
     """
     origin = get_origin(event)
-    obj = s3.get_object(
-        Bucket=os.environ["S3_BUCKET"], Key="models/latest/metadata.json"
+    resolved = resolve_request_version(event)
+    if resolved is None:
+        return error(404, "Unknown model version.", origin)
+    version, pinned = resolved
+    headers = get_headers(origin) | cache_headers(version, pinned, "metadata")
+    if response := not_modified(event, headers):
+        return response
+
+    obj = get_client("s3").get_object(
+        Bucket=os.environ["S3_BUCKET"], Key=f"{version_prefix(version)}metadata.json"
     )
     metadata = json.loads(obj["Body"].read())
     metadata["num_features"] = len(metadata["features"])
     allowed_fields = ["created", "start", "end", "num_features", "accuracy"]
     metadata = {key: metadata[key] for key in allowed_fields}
-    return success(metadata, origin=origin)
+    if version:
+        metadata["version"] = version
+    return success(metadata, origin=origin) | {"headers": headers}
 
 
 def get_visualization(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Get ML model visualization data (2D or 3D).
 
     Args:
-        event: API Gateway event with optional dims query parameter.
+        event: API Gateway event with optional dims, resolution, format and
+            version query parameters. `resolution` caps the grid points per axis and
+            `format=boundary` replaces the grid with the decision boundary.
+            `digits` rounds JSON floats to that many significant digits,
+            defaulting to VISUALIZATION_DIGITS.
+            `Accept: application/vnd.algotrade.visualization` selects the
+            typed-array encoding, gzipped if Accept-Encoding allows.
         _: Lambda context (unused).
 
     Returns:
         API response with visualization data (actual, centroid, radius, grid, preds).
     """
     origin = get_origin(event)
-    params = event["queryStringParameters"]
+    params = event["queryStringParameters"] or {}
     dims = "2D"
     supported_dims = {"2D", "3D"}
-    if params and "dims" in params and params["dims"] in supported_dims:
+    if params.get("dims") in supported_dims:
         dims = params["dims"]
 
-    data_labels = ["actual", "centroid", "radius", "grid", "preds"]
+    resolution = None
+    if "resolution" in params:
+        if not params["resolution"].isdigit() or not (
+            MIN_RESOLUTION <= int(params["resolution"]) <= MAX_RESOLUTION
+        ):
+            message = f"Resolution must be an integer from {MIN_RESOLUTION} to {MAX_RESOLUTION}."
+            return error(400, message, origin)
+        resolution = int(params["resolution"])
+    digits = VISUALIZATION_DIGITS
+    if "digits" in params:
+        if not params["digits"].isdigit() or not (
+            MIN_DIGITS <= int(params["digits"]) <= MAX_DIGITS
+        ):
+            message = f"Digits must be an integer from {MIN_DIGITS} to {MAX_DIGITS}."
+            return error(400, message, origin)
+        digits = int(params["digits"])
+    fmt = params.get("format", "grid")
+    if fmt not in VISUALIZATION_FORMATS:
+        message = f"Format must be one of {', '.join(sorted(VISUALIZATION_FORMATS))}."
+        return error(400, message, origin)
+
+    resolved = resolve_request_version(event)
+    if resolved is None:
+        return error(404, "Unknown model version.", origin)
+    version, pinned = resolved
+    prefix = version_prefix(version)
+
+    request_headers = normalize_headers(event)
+    binary = accepts(request_headers.get("accept", ""), BINARY_MEDIA_TYPE)
+    encoding = None
+    if binary and accepts(request_headers.get("accept-encoding", ""), "gzip"):
+        encoding = "gzip"
+    variant = f"{dims}-{resolution or 'full'}-{fmt}-{'bin' if binary else 'json'}"
+    variant += f"-{encoding}" if encoding else ""
+    variant += f"-{digits}sd" if digits and not binary else ""
+    headers = get_headers(origin) | {"Vary": "Accept, Accept-Encoding"}
+    headers |= cache_headers(version, pinned, variant)
+    if response := not_modified(event, headers):
+        return response
+
+    if binary:
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = get_derived_visualization(
+            dims, resolution, fmt, BINARY_MEDIA_TYPE, encoding, version
+        )
+        headers["Content-Type"] = BINARY_MEDIA_TYPE
+        return {
+            "statusCode": 200,
+            "body": base64.b64encode(body).decode(),
+            "isBase64Encoded": True,
+            "headers": headers,
+        }
+
+    if resolution or fmt != "grid" or digits:
+        body = get_derived_visualization(
+            dims, resolution, fmt, version=version, digits=digits
+        )
+    else:
+        rendered = get_encoded_artifact(f"{prefix}{dims}/{RENDERED_NAME}")
+        if rendered is not None:
+            # Already the response body, so skip encoding and validation
+            data, encoding = rendered
+            body = RawJSON(data, encoding)
+        else:
+            body = render_visualization(load_visualization(dims, prefix))
+    if not isinstance(body, RawJSON):
+        body = RawJSON(body)
+    response = success(body, origin=origin, event=event)
+    return response | {"headers": response["headers"] | headers}
+
+
+def resolve_version() -> str | None:
+    """Get the active model version, re-reading the manifest after its TTL.
+
+    Returns:
+        Version, or None if models are not versioned yet.
+    """
+    now = monotonic()
+    if now < manifest_cache["expires"]:
+        return manifest_cache["version"]
+    manifest = get_artifact(f"{LATEST_PREFIX}{MANIFEST_NAME}")
+    version = json.loads(manifest)["version"] if manifest else None
+    manifest_cache.update(version=version, expires=now + MANIFEST_TTL)
+    return version
+
+
+def resolve_request_version(event: dict[str, Any]) -> tuple[str | None, bool] | None:
+    """Get the model version a request asks for.
+
+    Args:
+        event: API Gateway event with an optional version query parameter.
+
+    Returns:
+        (version, pinned), where pinned means the request named the version,
+        or None if the requested version does not exist.
+    """
+    params = event.get("queryStringParameters") or {}
+    version = params.get("version")
+    if version is None:
+        return resolve_version(), False
+    if not VERSION_PATTERN.fullmatch(version):
+        return None
+    if version not in known_versions:
+        if get_artifact(f"{version_prefix(version)}{MANIFEST_NAME}") is None:
+            return None
+        known_versions.add(version)
+    return version, True
+
+
+def version_prefix(version: str | None) -> str:
+    """Get the S3 prefix holding a model version's artifacts.
+
+    Args:
+        version: Model version, or None for the unversioned layout.
+
+    Returns:
+        Key prefix ending in '/'.
+    """
+    return f"{VERSIONS_PREFIX}{version}/" if version else LATEST_PREFIX
+
+
+def cache_headers(version: str | None, pinned: bool, variant: str) -> dict[str, str]:
+    """Build caching headers for a response derived from a model version.
+
+    Args:
+        version: Model version, or None for the unversioned layout.
+        pinned: Whether the request named the version, so it can never change.
+        variant: Representation of the version being served, e.g. '2D-full-json'.
+
+    Returns:
+        ETag and Cache-Control headers, or none without a version.
+    """
+    if version is None:
+        return {}
+    if pinned:
+        cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={int(MANIFEST_TTL)}"
+    return {"ETag": f'"{version}-{variant}"', "Cache-Control": cache_control}
+
+
+def not_modified(
+    event: dict[str, Any], headers: dict[str, str]
+) -> dict[str, Any] | None:
+    """Answer a conditional request whose ETag still matches.
+
+    Args:
+        event: API Gateway event with an optional If-None-Match header.
+        headers: Response headers, including the current ETag.
+
+    Returns:
+        304 response, or None if the client's copy is stale or absent.
+    """
+    etag = headers.get("ETag")
+    if_none_match = normalize_headers(event).get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag and etag in tags:
+        return {"statusCode": 304, "body": "", "headers": headers}
+    return None
+
+
+def get_derived_visualization(
+    dims: str,
+    resolution: int | None,
+    fmt: str,
+    media_type: str = "application/json",
+    encoding: str | None = None,
+    version: str | None = None,
+    digits: int | None = None,
+) -> str | bytes:
+    """Get a rendered visualization downsampled, reduced to its boundary or rounded.
+
+    Each body is computed once per published model. Versioned artifacts never
+    change, so their bodies are served from memory without touching S3.
+    Without versions, a conditional GET on the packed artifact detects a new
+    model without transferring it again.
+
+    Args:
+        dims: '2D' or '3D'.
+        resolution: Maximum grid points per axis, or None for the full grid.
+        fmt: One of VISUALIZATION_FORMATS.
+        media_type: 'application/json' or BINARY_MEDIA_TYPE.
+        encoding: 'gzip' to compress a binary body, or None.
+        version: Model version, or None for the unversioned layout.
+        digits: Significant digits for JSON floats, or None for full precision.
+
+    Returns:
+        JSON text, or binary bytes.
+    """
+    key = (version, dims, resolution, fmt, media_type, encoding, digits)
+    cached = lod_cache.get(key)
+    if version is not None:
+        if cached is None:
+            data = load_visualization(dims, version_prefix(version))
+            body = derive_visualization(
+                data, resolution, fmt, media_type, encoding, digits
+            )
+            cached = cache_derived(key, version, body)
+        lod_cache.move_to_end(key)
+        return cached[1]
+
+    conditions = {"IfNoneMatch": cached[0]} if cached else {}
+    try:
+        obj = get_client("s3").get_object(
+            Bucket=os.environ["S3_BUCKET"],
+            Key=f"{LATEST_PREFIX}{dims}/{PACKED_NAME}",
+            **conditions,
+        )
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if cached and code == "304":
+            lod_cache.move_to_end(key)
+            return cached[1]
+        if code not in {"NoSuchKey", "AccessDenied"}:
+            raise
+        # Legacy pickles have no version to cache against
+        data = load_visualization(dims)
+        return derive_visualization(data, resolution, fmt, media_type, encoding, digits)
+
+    data = unpack_visualization(obj["Body"].read())
+    body = derive_visualization(data, resolution, fmt, media_type, encoding, digits)
+    return cache_derived(key, obj["ETag"], body)[1]
+
+
+def cache_derived(key: tuple, tag: str, body: str | bytes) -> tuple[str, str | bytes]:
+    """Store a derived body, evicting the least recently used.
+
+    Args:
+        key: lod_cache key.
+        tag: Version or ETag the body was derived from.
+        body: Rendered body.
+
+    Returns:
+        The cache entry.
+    """
+    lod_cache[key] = (tag, body)
+    lod_cache.move_to_end(key)
+    while len(lod_cache) > LOD_CACHE_SIZE:
+        lod_cache.popitem(last=False)
+    return lod_cache[key]
+
+
+def derive_visualization(
+    data: dict[str, Any],
+    resolution: int | None,
+    fmt: str,
+    media_type: str = "application/json",
+    encoding: str | None = None,
+    digits: int | None = None,
+) -> str | bytes:
+    """Downsample and/or extract the boundary, then render.
+
+    Args:
+        data: Visualization data keyed by VISUALIZATION_LABELS.
+        resolution: Maximum grid points per axis, or None for the full grid.
+        fmt: One of VISUALIZATION_FORMATS.
+        media_type: 'application/json' or BINARY_MEDIA_TYPE.
+        encoding: 'gzip' to compress a binary body, or None.
+        digits: Significant digits for JSON floats, or None for full precision.
+
+    Returns:
+        JSON text, or binary bytes.
+    """
+    if resolution:
+        data = downsample_visualization(data, resolution)
+    if fmt == "boundary":
+        data = extract_boundary(data)
+    if media_type != BINARY_MEDIA_TYPE:
+        return render_visualization(data, digits)
+    body = encode_binary(data)
+    return gzip.compress(body, compresslevel=6) if encoding == "gzip" else body
+
+
+def _lattice(data: dict[str, Any]) -> tuple[list, list, Any] | None:
+    """Locate each grid point on the regular lattice it was sampled from.
+
+    Args:
+        data: Visualization data with `grid` and `preds`.
+
+    Returns:
+        Sorted coordinates per axis, each point's index per axis, and the
+        flat preds, or None if the points do not fill a lattice.
+    """
+    grid = [np.asarray(axis).ravel() for axis in data["grid"]]
+    preds = np.asarray(data["preds"]).ravel()
+    axes = [np.unique(axis) for axis in grid]
+    if int(np.prod([len(axis) for axis in axes])) != preds.size:
+        return None
+    indices = [
+        np.searchsorted(axis, coords) for axis, coords in zip(axes, grid, strict=True)
+    ]
+    return axes, indices, preds
+
+
+def downsample_visualization(data: dict[str, Any], resolution: int) -> dict[str, Any]:
+    """Downsample the prediction grid to at most `resolution` points per axis.
+
+    `grid` holds the flattened coordinates of a regular lattice, one array
+    per axis, and `preds` the prediction at each point. Lattice points are
+    grouped into `resolution` equal index bins per axis. Each cell is placed
+    at the mean of its coordinates and predicts the majority label of its
+    points, with ties going to the lower label. Output points keep the
+    input's axis order. Data that is not a full lattice is returned as-is.
+
+    Args:
+        data: Visualization data keyed by VISUALIZATION_LABELS.
+        resolution: Maximum grid points per axis.
+
+    Returns:
+        Visualization data with a downsampled grid and preds.
+    """
+    lattice = _lattice(data)
+    if lattice is None:
+        return data
+    axes, indices, preds = lattice
+    shape = [len(axis) for axis in axes]
+    if max(shape) <= resolution:
+        return data
+
+    # Cells per axis, and each point's cell along each axis
+    grid = [np.asarray(axis).ravel() for axis in data["grid"]]
+    cells = [min(resolution, size) for size in shape]
+    bins = [
+        index * count // size
+        for index, count, size in zip(indices, cells, shape, strict=True)
+    ]
+    # The axis that changes least often along the input varies slowest
+    order = sorted(
+        range(len(grid)), key=lambda idx: np.count_nonzero(np.diff(grid[idx]))
+    )
+    cell_ids = np.ravel_multi_index(
+        [bins[idx] for idx in order], [cells[idx] for idx in order]
+    )
+    num_cells = int(np.prod(cells))
+
+    labels, label_ids = np.unique(preds, return_inverse=True)
+    votes = np.zeros((num_cells, len(labels)), dtype=np.int64)
+    np.add.at(votes, (cell_ids, label_ids), 1)
+    counts = votes.sum(axis=1)
+
+    centers = [
+        np.bincount(cell_ids, weights=coords, minlength=num_cells) / counts
+        for coords in grid
+    ]
+    return data | {"grid": centers, "preds": labels[votes.argmax(axis=1)]}
+
+
+def extract_boundary(data: dict[str, Any]) -> dict[str, Any]:
+    """Replace the prediction grid with the decision boundary.
 
-    data = {
-        label: pickle.loads(
-            s3.get_object(
-                Bucket=os.environ["S3_BUCKET"], Key=f"models/latest/{dims}/{label}.pkl"
-            )["Body"].read()
+    Each lattice cell is split into simplices along its main diagonal
+    (2 triangles in 2D, 6 tetrahedra in 3D), which tile the lattice without
+    gaps, and the level set between the two classes is traced through every
+    simplex whose corners disagree. With binary preds the level set crosses
+    each edge at its midpoint, so no interpolation table is needed. 2D
+    produces line segments and 3D a triangle mesh. Winding is not consistent,
+    so render the mesh with double-sided lighting.
+
+    `boundary` holds `vertices`, one coordinate array per axis, and `faces`,
+    one vertex index array per corner: 2 for segments, 3 for triangles. Both
+    map directly onto Plotly's scatter (x, y) and mesh3d (x, y, z, i, j, k).
+
+    Args:
+        data: Visualization data with binary (0/1) preds on a regular lattice.
+
+    Returns:
+        Visualization data with `boundary` in place of `grid` and `preds`.
+
+    Raises:
+        ValueError: If the grid is not a regular lattice.
+    """
+    lattice = _lattice(data)
+    if lattice is None:
+        raise ValueError("Grid is not a regular lattice")
+    axes, indices, preds = lattice
+    dims = len(axes)
+    shape = tuple(len(axis) for axis in axes)
+    inside = np.zeros(shape, dtype=bool)
+    inside[tuple(indices)] = preds > 0
+
+    # Corner ids of every simplex: paths from a cell's origin to its far
+    # corner, stepping along one axis at a time
+    origins = np.indices([size - 1 for size in shape]).reshape(dims, -1)
+    simplices = []
+    for path in permutations(range(dims)):
+        corner = origins.copy()
+        ids = [np.ravel_multi_index(corner, shape)]
+        for axis in path:
+            corner[axis] += 1
+            ids.append(np.ravel_multi_index(corner, shape))
+        simplices.append(np.stack(ids, axis=1))
+    simplices = np.concatenate(simplices)
+    values = inside.ravel()[simplices]
+    count = values.sum(axis=1)
+    crossed = (count > 0) & (count <= dims)
+    simplices, values, count = simplices[crossed], values[crossed], count[crossed]
+    # Inside corners first, so every case reads its crossing edges by position
+    order = np.argsort(~values, axis=1, kind="stable")
+    simplices = np.take_along_axis(simplices, order, axis=1)
+
+    edges = []
+    for inside_count, cases in BOUNDARY_CASES[dims].items():
+        selected = simplices[count == inside_count]
+        for case in cases:
+            edges.append(np.stack([selected[:, list(edge)] for edge in case], axis=1))
+    edges = np.sort(np.concatenate(edges), axis=2)
+
+    # Faces share a vertex wherever they cross the same lattice edge
+    size = inside.size
+    keys, faces = np.unique(edges[..., 0] * size + edges[..., 1], return_inverse=True)
+    ends = np.unravel_index(np.stack([keys // size, keys % size]), shape)
+    vertices = [
+        (axis[end[0]] + axis[end[1]]) / 2 for axis, end in zip(axes, ends, strict=True)
+    ]
+    faces = faces.reshape(-1, dims)
+    boundary = {"vertices": vertices, "faces": list(faces.T)}
+    rest = {key: value for key, value in data.items() if key not in {"grid", "preds"}}
+    return rest | {"boundary": boundary}
+
+
+def get_artifact(key: str) -> bytes | None:
+    """Read a model artifact from S3, decompressing it if stored compressed.
+
+    Args:
+        key: Object key in the data bucket.
+
+    Returns:
+        Object bytes, or None if the artifact has not been published.
+
+    Raises:
+        ValueError: If the artifact is stored with an unsupported coding.
+    """
+    artifact = get_encoded_artifact(key)
+    if artifact is None:
+        return None
+    body, encoding = artifact
+    return decode(body, encoding)
+
+
+def get_encoded_artifact(key: str) -> tuple[bytes, str | None] | None:
+    """Read a model artifact from S3 as stored.
+
+    Args:
+        key: Object key in the data bucket.
+
+    Returns:
+        Object bytes and their Content-Encoding, or None if the artifact has
+        not been published.
+    """
+    try:
+        obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=key)
+    except ClientError as e:
+        # Without s3:ListBucket a missing key is reported as AccessDenied
+        if e.response["Error"]["Code"] in {"NoSuchKey", "AccessDenied"}:
+            return None
+        raise
+    return obj["Body"].read(), obj.get("ContentEncoding")
+
+
+def load_visualization(dims: str, prefix: str = LATEST_PREFIX) -> dict[str, Any]:
+    """Load visualization data, preferring the packed artifact.
+
+    Args:
+        dims: '2D' or '3D'.
+        prefix: Model prefix, from version_prefix.
+
+    Returns:
+        Visualization data keyed by VISUALIZATION_LABELS.
+    """
+    packed = get_artifact(f"{prefix}{dims}/{PACKED_NAME}")
+    if packed is not None:
+        return unpack_visualization(packed)
+    # Only models published before the packed artifact need the thread pool
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _load_pickle(label: str) -> Any:
+        key = f"{prefix}{dims}/{label}.pkl"
+        obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=key)
+        return pickle.loads(obj["Body"].read())
+
+    with ThreadPoolExecutor(max_workers=len(VISUALIZATION_LABELS)) as executor:
+        values = executor.map(_load_pickle, VISUALIZATION_LABELS)
+    return dict(zip(VISUALIZATION_LABELS, values, strict=True))
+
+
+def render_visualization(data: dict[str, Any], digits: int | None = None) -> str:
+    """Encode visualization data as the /visualization response body.
+
+    Args:
+        data: Visualization data keyed by VISUALIZATION_LABELS.
+        digits: Significant digits to round floats to, or None for full
+            precision.
+
+    Returns:
+        JSON text. Rounded bodies are also written without whitespace.
+    """
+    return encode_json(data, digits=digits, compact=digits is not None)
+
+
+def flatten_arrays(data: dict[str, Any]) -> dict[str, Any]:
+    """Flatten nested lists and dicts into one array per leaf.
+
+    Args:
+        data: Nested data with arrays or scalars at the leaves.
+
+    Returns:
+        Arrays keyed by path, e.g. 'actual/0/BUY', in traversal order.
+    """
+    arrays: dict[str, Any] = {}
+
+    def _flatten(path: str, value: Any) -> None:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                _flatten(f"{path}/{key}", item)
+        elif isinstance(value, list | tuple):
+            for idx, item in enumerate(value):
+                _flatten(f"{path}/{idx}", item)
+        else:
+            arrays[path] = np.asarray(value)
+
+    for key, value in data.items():
+        _flatten(key, value)
+    return arrays
+
+
+def encode_binary(data: dict[str, Any]) -> bytes:
+    """Encode visualization data as little-endian typed arrays.
+
+    Layout: a uint32 header length, a JSON header, then one buffer per
+    array. The header is {"format": BINARY_FORMAT, "arrays": [{"path",
+    "dtype", "shape", "offset"}]}, where `path` is as in flatten_arrays,
+    `dtype` names the typed array (float32, uint8, uint32 or int32) and
+    `offset` counts bytes from the end of the header. The header and every
+    buffer are padded to 4 bytes, so each buffer can be viewed in place,
+    e.g. `new Float32Array(buffer, start + offset, length)`. Floats are
+    float32 and integers use the narrowest of the integer types that fits.
+
+    Args:
+        data: Visualization data, possibly downsampled or reduced to a boundary.
+
+    Returns:
+        Encoded bytes.
+
+    Raises:
+        ValueError: If a leaf is not numeric.
+    """
+    entries = []
+    buffers = []
+    offset = 0
+    for path, array in flatten_arrays(data).items():
+        if array.dtype.kind == "f":
+            array = array.astype("<f4")
+        elif array.dtype.kind in "biu":
+            low, high = (array.min(), array.max()) if array.size else (0, 0)
+            if low >= 0:
+                array = array.astype("<u1" if high < 256 else "<u4")
+            else:
+                array = array.astype("<i4")
+        else:
+            raise ValueError(f"Cannot encode {path} of type {array.dtype}")
+        raw = array.tobytes()
+        raw += bytes(-len(raw) % 4)
+        entries.append(
+            {
+                "path": path,
+                "dtype": array.dtype.name,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
         )
-        for label in data_labels
-    }
-    return success(json.dumps(data, cls=NumpyEncoder), origin=origin)
+        buffers.append(raw)
+        offset += len(raw)
+    header = {"format": BINARY_FORMAT, "arrays": entries}
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    encoded += b" " * (-len(encoded) % 4)
+    return struct.pack("<I", len(encoded)) + encoded + b"".join(buffers)
+
+
+def unpack_visualization(packed: bytes) -> dict[str, Any]:
+    """Unpack a .npz artifact from scripts/publish_model.py, without pickle.
+
+    Args:
+        packed: .npz bytes.
+
+    Returns:
+        Visualization data with numpy arrays at the leaves.
+
+    Raises:
+        ValueError: If the artifact has an unsupported format version.
+    """
+    with np.load(BytesIO(packed), allow_pickle=False) as npz:
+        if int(npz["format"]) != PACKED_FORMAT:
+            raise ValueError(f"Unsupported visualization format: {npz['format']}")
+        tree: dict[str, Any] = {}
+        for path in npz.files:
+            if path == "format":
+                continue
+            *parents, leaf = path.split("/")
+            node = tree
+            for part in parents:
+                node = node.setdefault(part, {})
+            node[leaf] = npz[path]
+
+    def _restore(node: Any) -> Any:
+        # Dicts keyed 0..n-1 were lists before packing
+        if not isinstance(node, dict):
+            return node
+        items = {key: _restore(value) for key, value in node.items()}
+        if all(key.isdigit() for key in items):
+            return [items[str(idx)] for idx in range(len(items))]
+        return items
+
+    return _restore(tree)
 
 
 class NumpyEncoder(json.JSONEncoder):
@@ -98,3 +803,94 @@ class NumpyEncoder(json.JSONEncoder):
             return None
 
         return json.JSONEncoder.default(self, o)
+
+
+def encode_json(
+    data: Any,
+    digits: int | None = None,
+    nonfinite: str = "null",
+    compact: bool = False,
+) -> str:
+    """Encode data holding numpy arrays as JSON.
+
+    Arrays are rounded with one vectorized call per array and converted with
+    `tolist`, so the C JSON encoder writes every element. At full precision
+    the output is identical to `json.dumps(data, cls=NumpyEncoder)`, except
+    for NaN and infinity: NumpyEncoder writes them as NaN, Infinity and
+    -Infinity, which are not valid JSON, while this writes null or raises.
+
+    Args:
+        data: Dict, list or array to encode.
+        digits: Significant digits to round floats to, or None for full
+            precision.
+        nonfinite: 'null' to write NaN and infinity as null, or 'raise'.
+        compact: Omit whitespace after separators.
+
+    Returns:
+        JSON text.
+
+    Raises:
+        ValueError: If `nonfinite` is 'raise' and data has NaN or infinity.
+    """
+    if nonfinite not in {"null", "raise"}:
+        raise ValueError(f"Unsupported nonfinite policy: {nonfinite}")
+    native = _to_native(data, digits, nonfinite)
+    separators = (",", ":") if compact else None
+    return json.dumps(native, cls=NumpyEncoder, separators=separators)
+
+
+def round_significant(array: Any, digits: int) -> Any:
+    """Round floats to a number of significant digits, in one vectorized pass.
+
+    Unlike a fixed number of decimal places, this keeps the same relative
+    precision for small and large values.
+
+    Args:
+        array: Float array.
+        digits: Significant digits to keep.
+
+    Returns:
+        Rounded array. Zeros, NaN and infinity are unchanged.
+    """
+    array = np.asarray(array, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        magnitude = np.floor(np.log10(np.abs(array)))
+        decimals = np.where(np.isfinite(magnitude), digits - 1 - magnitude, 0)
+        # Dividing by an exact power of ten gives the nearest float to the
+        # rounded decimal, so it prints with no more digits than requested
+        up = 10.0 ** np.maximum(decimals, 0)
+        down = 10.0 ** np.maximum(-decimals, 0)
+        rounded = np.round(array * up / down) * down / up
+    return np.where(np.isfinite(rounded), rounded, array)
+
+
+def _to_native(value: Any, digits: int | None, nonfinite: str) -> Any:
+    """Convert arrays and numpy scalars in a value to rounded Python objects.
+
+    Args:
+        value: Value to convert.
+        digits: Significant digits to round floats to, or None for full precision.
+        nonfinite: 'null' or 'raise', see encode_json.
+
+    Returns:
+        Value with arrays replaced by nested lists.
+    """
+    if isinstance(value, dict):
+        return {key: _to_native(item, digits, nonfinite) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [_to_native(item, digits, nonfinite) for item in value]
+    if isinstance(value, float | np.floating | np.ndarray):
+        array = np.asarray(value)
+        if array.dtype.kind != "f":
+            return array.tolist()
+        if digits is not None:
+            array = round_significant(array, digits)
+        finite = np.isfinite(array)
+        if not finite.all():
+            if nonfinite == "raise":
+                raise ValueError("Cannot encode NaN or infinity as JSON")
+            return np.where(finite, array, None).tolist()
+        return array.tolist()
+    if isinstance(value, np.integer | np.bool_):
+        return value.item()
+    return value
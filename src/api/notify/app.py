@@ -1,5 +1,6 @@
 """Notify Lambda handler for sending signal alerts via email, SMS, and webhook."""
 
+import hmac
 import json
 import logging
 import os
@@ -7,26 +8,68 @@ from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
 from multiprocessing import Pipe, Process
 from multiprocessing.connection import Connection
-from time import sleep
 from typing import Any, TypedDict
 
-import boto3
-import requests
+from aws import get_client
+from backtest import (
+    HYPERDRIVE,
+    INTERVALS,
+    METRICS,
+    STRATEGIES,
+    advance,
+    backtest,
+    daily_lines,
+    downsample_preview,
+    extend_tier,
+    from_preview,
+    summarize,
+    summary_stats,
+)
 from botocore.exceptions import ClientError
-from jinja2 import Template
-from models import UserModel
+from history import (
+    DAILY_KEY,
+    PREVIEW_KEY,
+    SUMMARY_KEY,
+    TIER_KEY,
+    history_version,
+    read_json,
+)
+from models import UserModel, is_throttled, record_failed_attempt
 from pynamodb.attributes import UTCDateTimeAttribute
 from utils import (
+    CODINGS,
     TEST,
     enough_time_has_passed,
     error,
+    get_body,
     get_email,
     get_origin,
+    get_source_ip,
+    lazy_import,
     normalize_headers,
     success,
     transform_signal,
 )
 
+jinja2 = lazy_import("jinja2")
+requests = lazy_import("requests")
+
+# Brute-force protection for the emit secret
+# EMIT_MAX_FAILURES_PER_IP: Failed attempts allowed per source IP per window
+# EMIT_MAX_FAILURES: Failed attempts allowed across all sources per window
+# EMIT_THROTTLE_MINUTES: Duration of the throttle window in minutes
+# EMIT_SOURCE_IPS: Comma-separated IPs of the signal emitter, exempt from the
+#   global limit so failures from other sources cannot lock it out
+EMIT_MAX_FAILURES_PER_IP = int(os.environ.get("EMIT_MAX_FAILURES_PER_IP", 5))
+EMIT_MAX_FAILURES = int(os.environ.get("EMIT_MAX_FAILURES", 50))
+EMIT_THROTTLE_MINUTES = int(os.environ.get("EMIT_THROTTLE_MINUTES", 15))
+EMIT_SOURCE_IPS = {
+    ip.strip() for ip in os.environ.get("EMIT_SOURCE_IPS", "").split(",") if ip
+}
+
+# Content-Type of the daily preview lines
+NDJSON = "application/x-ndjson"
+
 
 class AlertConfig(TypedDict):
     """Configuration for an alert notification type."""
@@ -181,6 +224,9 @@ def skip_users(users: Any, to_skip: set[str | None]) -> Any:
 def post_notify(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Handle notify POST request to send signal alerts.
 
+    A body with a 'Close' price also appends that close to the preview, once
+    the alerts are sent. A failure there is logged without failing delivery.
+
     Args:
         event: API Gateway event with signal data.
         _: Lambda context (unused).
@@ -188,15 +234,11 @@ def post_notify(event: dict[str, Any], _: Any) -> dict[str, Any]:
     Returns:
         Success response or error if authentication fails.
     """
-    emit_secret = os.environ["EMIT_SECRET"]
-    req_headers = normalize_headers(event)
     origin = get_origin(event)
-    header = "emit-secret"
-    if not req_headers.get(header) == emit_secret:
-        sleep(0 if TEST else 10)
-        print("Incorrect emit secret provided.")
-        return error(401, "Provide a valid emit secret.", origin)
-    req_body = json.loads(event["body"])
+    rejected = check_emit_secret(event, origin)
+    if rejected:
+        return rejected
+    req_body = json.loads(get_body(event))
     signal = transform_signal(req_body)
     # NOTE: PynamoDB requires explicit `== True` comparisons for BooleanAttribute
     # filter conditions.
@@ -206,18 +248,24 @@ def post_notify(event: dict[str, Any], _: Any) -> dict[str, Any]:
         | ((UserModel.alerts["webhook"].exists()) & (UserModel.alerts["webhook"] != ""))
     )
     users_in_beta = UserModel.in_beta_index.query(1, filter_condition=cond)
-    s3 = boto3.client("s3")
-    obj = s3.get_object(Bucket=os.environ["S3_BUCKET"], Key="data/api/preview.json")
-    preview = json.loads(obj["Body"].read())
-    hyperdrive = [
-        data for data in preview["BTC"]["data"][-2:] if data["Name"] == "hyperdrive"
-    ][0]
-    signal["Perf"] = hyperdrive["Bal"] - 1
+    summary = get_summary()
+    close = float(req_body["Close"]) if "Close" in req_body else None
+    if close is not None and signal["Date"] > summary["Time"]:
+        # Perf includes the new close, though the preview is only written
+        # once the alerts are out
+        advance(summary, signal["Date"], close, signal["Signal"] == "BUY")
+    signal["Perf"] = summary["BTC"][HYPERDRIVE]["Bal"] - 1
     processor = Processor(notify_user, signal)
     notified = set(processor.run(users_in_beta))
     users_subscribed = UserModel.subscribed_index.query(1, filter_condition=cond)
     users_to_notify = skip_users(users_subscribed, notified)
     notified = notified.union(set(processor.run(users_to_notify)))
+    if close is not None:
+        try:
+            update_preview(signal["Date"], close, signal)
+        except Exception as e:
+            print(f"Could not append {signal['Date']} to the preview")
+            logging.exception(e)
     num_notified = len(notified)
     total_users = processor.total
     success_ratio = num_notified / total_users if total_users else 1
@@ -228,6 +276,203 @@ def post_notify(event: dict[str, Any], _: Any) -> dict[str, Any]:
     return success(response, origin=origin)
 
 
+def check_emit_secret(event: dict[str, Any], origin: str) -> dict[str, Any] | None:
+    """Validate the emit secret, throttling sources that keep failing.
+
+    The throttle is checked before the secret, so a throttled source is
+    refused even with the correct one and cannot keep guessing. Sources in
+    EMIT_SOURCE_IPS are only held to their own limit.
+
+    Args:
+        event: API Gateway event with the emit-secret header.
+        origin: Request origin for CORS.
+
+    Returns:
+        None if the secret is correct, otherwise a 401 or 429 response.
+    """
+    source_ip = get_source_ip(event)
+    limits = {f"notify#{source_ip}": EMIT_MAX_FAILURES_PER_IP}
+    if source_ip not in EMIT_SOURCE_IPS:
+        limits["notify#*"] = EMIT_MAX_FAILURES
+    if is_throttled(limits):
+        print("Emit secret attempts throttled.")
+        return error(429, "Too many failed attempts. Try again later.", origin)
+    provided = normalize_headers(event).get("emit-secret", "")
+    if hmac.compare_digest(provided.encode(), os.environ["EMIT_SECRET"].encode()):
+        return None
+    record_failed_attempt(list(limits), timedelta(minutes=EMIT_THROTTLE_MINUTES))
+    print("Incorrect emit secret provided.")
+    return error(401, "Provide a valid emit secret.", origin)
+
+
+def put_object(
+    key: str,
+    body: bytes,
+    version: str,
+    encoding: str | None = None,
+    content_type: str = "application/json",
+) -> None:
+    """Write a preview artifact to S3, tagged with its history version.
+
+    Args:
+        key: S3 key.
+        body: Uncompressed object body.
+        version: History version of the preview it was derived from.
+        encoding: Content-Encoding from CODINGS, or None to store it as is.
+        content_type: Content-Type of the body.
+    """
+    extra = {}
+    if encoding:
+        body = CODINGS[encoding][0](body)
+        extra["ContentEncoding"] = encoding
+    get_client("s3").put_object(
+        Bucket=os.environ["S3_BUCKET"],
+        Key=key,
+        Body=body,
+        ContentType=content_type,
+        Metadata={"history-version": version},
+        **extra,
+    )
+
+
+def _missing(e: ClientError) -> bool:
+    """Tell whether an S3 error is for a key that does not exist."""
+    return e.response["Error"]["Code"] == "NoSuchKey"
+
+
+def get_summary(
+    preview: dict[str, Any] | None = None, version: str | None = None
+) -> dict[str, Any]:
+    """Read the preview summary, rebuilding and storing it if needed.
+
+    A rebuilt summary takes its balances from the preview's last points, as
+    re-simulating the preview's rounded closes drifts from what it shows,
+    and is stored so later reads skip the rebuild.
+
+    Args:
+        preview: Preview to rebuild from, read from S3 if not given.
+        version: History version of that preview. A summary written for
+            another version is stale and gets rebuilt. Any summary is
+            accepted if not given.
+
+    Returns:
+        Summary as produced by backtest.summarize.
+
+    Raises:
+        ClientError: If S3 fails for any reason other than a missing summary.
+    """
+    try:
+        summary, _, summary_version = read_json(SUMMARY_KEY)
+        if version is None or summary_version == version:
+            return summary
+    except ClientError as e:
+        if not _missing(e):
+            raise
+    if preview is None:
+        preview, _, version = read_json(PREVIEW_KEY)
+    times, close, signals = from_preview(preview)
+    summary = summarize(times, close, signals, backtest(close, signals))
+    for denom in METRICS:
+        for point in preview[denom]["data"][-len(STRATEGIES) :]:
+            summary[denom][point["Name"]]["Bal"] = point["Bal"]
+    summary["Stats"] = {denom: preview[denom]["stats"] for denom in METRICS}
+    if version is not None:
+        try:
+            put_object(SUMMARY_KEY, json.dumps(summary).encode(), version)
+        except ClientError as e:
+            print(f"Could not store the rebuilt preview summary: {e}")
+    return summary
+
+
+def get_daily_lines(preview: dict[str, Any], version: str, time: str) -> list[bytes]:
+    """Read the preview's daily lines, dropping any dated on or after a date.
+
+    Args:
+        preview: Preview the lines are rebuilt from if missing or stale.
+        version: History version of that preview.
+        time: Date being appended, as a DATE_FMT string.
+
+    Returns:
+        Lines dated before `time`.
+
+    Raises:
+        ClientError: If S3 fails for any reason other than missing lines.
+    """
+    try:
+        obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=DAILY_KEY)
+        if history_version(obj) == version:
+            lines = obj["Body"].read().splitlines()
+        else:
+            lines = daily_lines(preview)
+    except ClientError as e:
+        if not _missing(e):
+            raise
+        lines = daily_lines(preview)
+    # Drop lines from an earlier attempt, or the new points already in preview
+    while lines and json.loads(lines[-1])["Time"] >= time:
+        lines.pop()
+    return lines
+
+
+def update_preview(time: str, close: float, signal: dict[str, Any]) -> dict[str, Any]:
+    """Append one close to the preview and everything derived from it.
+
+    Only the new points are computed; the stats come from the summary's
+    running totals. Repeating a date that is already applied changes nothing.
+    Derived artifacts written for another history version (e.g. before the
+    preview was rebuilt offline) are rebuilt from the preview first.
+
+    Args:
+        time: Date of the close, as a DATE_FMT string.
+        close: Close price on that date.
+        signal: Transformed signal for that date.
+
+    Returns:
+        The updated summary.
+
+    Raises:
+        ClientError: If S3 fails for any reason other than a missing artifact.
+    """
+    preview, encoding, version = read_json(PREVIEW_KEY)
+    summary = get_summary(preview, version)
+    if time <= summary["Time"]:
+        return summary
+    points = advance(summary, time, close, signal["Signal"] == "BUY")
+    stats = summary_stats(summary)
+    lines = get_daily_lines(preview, version, time)
+    for denom in METRICS:
+        data = preview[denom]["data"]
+        # Drop points from an earlier attempt that wrote the preview only
+        while data and data[-1]["Time"] >= time:
+            data.pop()
+        data += points[denom]
+        preview[denom]["stats"] = stats[denom]
+    put_object(PREVIEW_KEY, json.dumps(preview).encode(), version, encoding)
+    for interval in INTERVALS[1:]:
+        key = TIER_KEY.format(interval=interval)
+        try:
+            tier, tier_encoding, tier_version = read_json(key)
+        except ClientError as e:
+            if not _missing(e):
+                raise
+            tier_version = None
+        if tier_version != version:
+            tier, tier_encoding = downsample_preview(preview, interval), None
+        else:
+            for denom in METRICS:
+                data = tier[denom]["data"]
+                if not data or data[-1]["Time"] < time:
+                    extend_tier(data, points[denom], interval)
+                tier[denom]["stats"] = stats[denom]
+        put_object(key, json.dumps(tier).encode(), version, tier_encoding)
+    lines.append(json.dumps({"Time": time} | points).encode())
+    put_object(DAILY_KEY, b"\n".join(lines) + b"\n", version, None, NDJSON)
+    # Written last, so a summary never runs ahead of the preview
+    summary["Stats"] = stats
+    put_object(SUMMARY_KEY, json.dumps(summary).encode(), version)
+    return summary
+
+
 def notify_email(user: UserModel, signal: dict[str, Any]) -> None:
     """Send signal alert via SES email.
 
@@ -242,14 +487,13 @@ def notify_email(user: UserModel, signal: dict[str, Any]) -> None:
     domain = os.environ["DOMAIN"]
     sender = get_email(os.environ["SIGNAL_EMAIL"], stage)
     recipient = "success@simulator.amazonses.com" if TEST else user.email
-    region = "us-east-1"
     charset = "UTF-8"
-    client = boto3.client("sesv2", region_name=region)
+    client = get_client("sesv2", region_name="us-east-1")
     subject = f"{domain.upper()}: {signal['Asset']} (₿) Signal Alert"
     body_text = f"Visit {domain.upper()} to view the new signal."
     with open(os.path.join(os.path.dirname(__file__), "template.html.jinja")) as file:
         content = file.read()
-    template = Template(content)
+    template = jinja2.Template(content)
     signal["Prefix"] = "dev." if stage == "dev" else ""
     signal["Domain"] = domain
     signal["Signal"] = signal["Signal"] == "BUY"
@@ -1,24 +1,241 @@
 """Preview Lambda handler for fetching preview data from S3."""
 
+import json
 import os
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
 from typing import Any
 
-import boto3
-from utils import get_origin, success
+from aws import get_client
+from backtest import INTERVALS, build_preview, downsample_preview
+from botocore.exceptions import ClientError
+from history import (
+    DAILY_KEY,
+    PREVIEW_KEY,
+    SIGNALS_KEY,
+    SUMMARY_KEY,
+    TIER_KEY,
+    history_version,
+    read_json,
+    read_since,
+)
+from utils import DATE_FMT, RawJSON, error, get_origin, success
 
-s3 = boto3.client("s3")
+# Backtest inputs, besides the signals
+# BACKTEST_PRICES_KEY: S3 key of the daily close prices (Time,Close columns)
+PRICES_KEY = os.environ.get("BACKTEST_PRICES_KEY", "models/latest/prices.csv")
+
+# ?range= is a count of days, weeks, months or years, e.g. 6m
+RANGE_PATTERN = re.compile(r"([1-9][0-9]{0,3})([dwmy])")
+RANGE_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+# Last read of each backtest input by ETag, and the body built from them
+backtest_cache: dict[str, Any] = {"sources": {}, "etags": None, "body": None}
 
 
 def get_preview(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Get preview data from S3.
 
+    Without parameters the stored preview is passed through as is. With
+    ?interval=day|week|month and/or ?range= (e.g. 30d, 6m, 5y or all), only
+    the requested window of that tier is returned. With ?since=YYYY-MM-DD,
+    only the daily points after that date are returned, with a 'version'
+    that changes whenever the history is rewritten rather than extended.
+
     Args:
         event: API Gateway event.
         _: Lambda context (unused).
 
     Returns:
-        API response with preview JSON data.
+        API response with preview JSON data, compressed if the client accepts it.
     """
     origin = get_origin(event)
-    obj = s3.get_object(Bucket=os.environ["S3_BUCKET"], Key="data/api/preview.json")
-    return success(obj["Body"].read().decode(), origin=origin)
+    params = event.get("queryStringParameters") or {}
+    if "since" in params:
+        return get_preview_since(params["since"], origin, event)
+    if "interval" in params or "range" in params:
+        return get_preview_window(params, origin, event)
+    obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=PREVIEW_KEY)
+    # Stored pre-compressed if uploaded with e.g. --content-encoding gzip
+    encoding = obj.get("ContentEncoding")
+    body = RawJSON(obj["Body"].read(), encoding)
+    return success(body, origin=origin, event=event)
+
+
+def get_preview_window(
+    params: dict[str, str], origin: str, event: dict[str, Any]
+) -> dict[str, Any]:
+    """Serve a window of one preview tier.
+
+    Args:
+        params: Query parameters with 'interval' and/or 'range'.
+        origin: Request origin for CORS.
+        event: API Gateway event, for response compression.
+
+    Returns:
+        API response with the tier's points in range and the full-history
+        stats, or 400 for invalid parameters.
+    """
+    interval = params.get("interval", "day")
+    if interval not in INTERVALS:
+        return error(400, f"Provide an interval in {INTERVALS}.", origin)
+    span = params.get("range", "all")
+    match = RANGE_PATTERN.fullmatch(span)
+    if span != "all" and not match:
+        return error(400, "Provide a range like 30d, 12w, 6m, 5y or all.", origin)
+    preview = load_tier(interval)
+    if match:
+        count, unit = match.groups()
+        days = int(count) * RANGE_DAYS[unit]
+        for side in preview.values():
+            data = side["data"]
+            if not data:
+                continue
+            end = datetime.strptime(data[-1]["Time"], DATE_FMT)
+            start = (end - timedelta(days=days - 1)).strftime(DATE_FMT)
+            side["data"] = data[bisect_left(data, start, key=lambda p: p["Time"]) :]
+    return success(preview, origin=origin, event=event)
+
+
+def get_preview_since(since: str, origin: str, event: dict[str, Any]) -> dict[str, Any]:
+    """Serve the daily preview points after a date.
+
+    Args:
+        since: Last date the client has, as a DATE_FMT string.
+        origin: Request origin for CORS.
+        event: API Gateway event, for response compression.
+
+    Returns:
+        API response with 'version', and per denomination the new 'data'
+        points and current 'stats', or 400 for an invalid date.
+    """
+    try:
+        datetime.strptime(since, DATE_FMT)
+    except ValueError:
+        return error(400, "Provide since as a YYYY-MM-DD date.", origin)
+    s3 = get_client("s3")
+    bucket = os.environ["S3_BUCKET"]
+    version = history_version(s3.head_object(Bucket=bucket, Key=PREVIEW_KEY))
+    delta = read_delta(since, version)
+    if delta is None:
+        preview = read_json(PREVIEW_KEY)[0]
+        delta = {
+            denom: {
+                "data": [point for point in side["data"] if point["Time"] > since],
+                "stats": side["stats"],
+            }
+            for denom, side in preview.items()
+        }
+    return success({"version": version} | delta, origin=origin, event=event)
+
+
+def read_delta(since: str, version: str) -> dict[str, Any] | None:
+    """Read the days after a date from the summary and daily lines.
+
+    Args:
+        since: Last date the client has, as a DATE_FMT string.
+        version: History version of the current preview.
+
+    Returns:
+        Per denomination 'data' and 'stats', or None if the artifacts are
+        missing or were written for another version of the preview.
+
+    Raises:
+        ClientError: If S3 fails for any reason other than a missing artifact.
+    """
+    s3 = get_client("s3")
+    bucket = os.environ["S3_BUCKET"]
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=SUMMARY_KEY)
+        summary = json.loads(obj["Body"].read())
+        if history_version(obj) != version or "Stats" not in summary:
+            return None
+        lines = []
+        if since < summary["Time"]:
+            _, lines, daily = read_since(s3, bucket, DAILY_KEY, since)
+            if history_version(daily) != version:
+                return None
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        return None
+    delta = {
+        denom: {"data": [], "stats": rows} for denom, rows in summary["Stats"].items()
+    }
+    for line in lines:
+        day = json.loads(line)
+        for denom, side in delta.items():
+            side["data"] += day[denom]
+    return delta
+
+
+def load_tier(interval: str) -> dict[str, Any]:
+    """Load a preview tier, downsampling the daily preview if it is missing.
+
+    Args:
+        interval: Tier interval from INTERVALS.
+
+    Returns:
+        Preview dict for the tier.
+
+    Raises:
+        ClientError: If S3 fails for any reason other than a missing tier.
+    """
+    if interval == "day":
+        return read_json(PREVIEW_KEY)[0]
+    try:
+        return read_json(TIER_KEY.format(interval=interval))[0]
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+    return downsample_preview(read_json(PREVIEW_KEY)[0], interval)
+
+
+def get_backtest(event: dict[str, Any], _: Any) -> dict[str, Any]:
+    """Backtest the published signals against daily prices.
+
+    The backtest is rerun only when either input's ETag changes, and a warm
+    container otherwise serves the body it built last.
+
+    Args:
+        event: API Gateway event.
+        _: Lambda context (unused).
+
+    Returns:
+        API response with balance curves and stats in the preview.json schema.
+    """
+    origin = get_origin(event)
+    signals_etag, signals = read_source(SIGNALS_KEY)
+    prices_etag, prices = read_source(PRICES_KEY)
+    etags = (signals_etag, prices_etag)
+    if backtest_cache["etags"] != etags:
+        try:
+            preview = build_preview(prices.decode(), signals.decode())
+        except ValueError:
+            return error(404, "No prices found for the signal dates.", origin)
+        backtest_cache["etags"], backtest_cache["body"] = etags, json.dumps(preview)
+    return success(RawJSON(backtest_cache["body"]), origin=origin, event=event)
+
+
+def read_source(key: str) -> tuple[str, bytes]:
+    """Read a backtest input, with a conditional GET if it was read before.
+
+    Args:
+        key: S3 key.
+
+    Returns:
+        The object's ETag and body, from the cache if it has not changed.
+    """
+    cached = backtest_cache["sources"].get(key)
+    conditions = {"IfNoneMatch": cached[0]} if cached else {}
+    try:
+        obj = get_client("s3").get_object(
+            Bucket=os.environ["S3_BUCKET"], Key=key, **conditions
+        )
+    except ClientError as e:
+        if cached and e.response["Error"]["Code"] == "304":
+            return cached
+        raise
+    cached = backtest_cache["sources"][key] = (obj["ETag"], obj["Body"].read())
+    return cached
@@ -1,54 +1,200 @@
 """Authentication utilities for JWT token verification."""
 
+import hashlib
 import json
 import os
-from time import time
+from collections import OrderedDict
+from time import monotonic, time
 from typing import Any
 
 import requests
 from jose import jwk, jwt
 from jose.utils import base64url_decode
+from utils import get_body
 
-if os.environ.get("TEST") != "true":
+# JWKS caching configuration
+# JWKS_TTL: Seconds before cached signing keys are refetched
+# JWKS_MIN_REFETCH: Minimum seconds between refetches triggered by an unknown kid
+JWKS_TTL = int(os.environ.get("JWKS_TTL", 3600))
+JWKS_MIN_REFETCH = int(os.environ.get("JWKS_MIN_REFETCH", 60))
+# VERIFIED_CACHE_SIZE: Maximum number of verified tokens kept per container
+VERIFIED_CACHE_SIZE = int(os.environ.get("VERIFIED_CACHE_SIZE", 256))
+
+
+def get_keys_url() -> str:
+    """Build the Cognito JWKS URL from the environment.
+
+    Returns:
+        URL of the user pool's jwks.json.
+    """
     region = os.environ["REGION"]
     user_pool_id = os.environ["USER_POOL_ID"]
-    web_client_id = os.environ["WEB_CLIENT_ID"]
-    keys_url = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}/.well-known/jwks.json"
-    keys = requests.get(keys_url).json()["keys"]
+    return f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}/.well-known/jwks.json"
 
 
-def verify_token(event: dict[str, Any]) -> dict[str, Any] | None:
-    """Verify JWT token from Cognito.
+class JWKSCache:
+    """Lazily fetched signing keys, constructed once and indexed by kid."""
+
+    def __init__(
+        self,
+        url: str | None = None,
+        ttl: float = JWKS_TTL,
+        min_refetch: float = JWKS_MIN_REFETCH,
+    ) -> None:
+        """Initialize an empty cache without touching the network.
+
+        Args:
+            url: JWKS URL. Defaults to the Cognito user pool from the environment.
+            ttl: Seconds before cached keys are refetched.
+            min_refetch: Minimum seconds between refetches for unknown kids.
+        """
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch = min_refetch
+        self.keys: dict[str, Any] = {}
+        self.fetched_at: float | None = None
+        self.failed_at: float | None = None
+        self.fetches = 0
+
+    def fetch(self) -> None:
+        """Download the JWKS and construct a public key for each kid."""
+        res = requests.get(self.url or get_keys_url(), timeout=5)
+        res.raise_for_status()
+        self.keys = {key["kid"]: jwk.construct(key) for key in res.json()["keys"]}
+        self.fetched_at = monotonic()
+        self.failed_at = None
+        self.fetches += 1
+
+    def get(self, kid: str) -> Any:
+        """Get the public key for a kid, fetching or refreshing as needed.
+
+        A failed fetch keeps any cached keys, and fetching is not retried for
+        `min_refetch` seconds, so an outage of the JWKS endpoint fails
+        verification instead of every request waiting on it.
+
+        Args:
+            kid: Key ID from the token header.
+
+        Returns:
+            Constructed public key, or None if the kid is unknown or the keys
+            could not be fetched.
+        """
+        now = monotonic()
+        if self.failed_at is not None and now - self.failed_at < self.min_refetch:
+            return self.keys.get(kid)
+        age = None if self.fetched_at is None else now - self.fetched_at
+        # An unknown kid may mean the pool rotated its keys
+        if (
+            age is None
+            or age >= self.ttl
+            or (kid not in self.keys and age >= self.min_refetch)
+        ):
+            try:
+                self.fetch()
+            except requests.RequestException as e:
+                self.failed_at = now
+                print(f"Could not fetch jwks.json, using cached keys: {e}")
+        return self.keys.get(kid)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of verified claims, keyed by token hash until expiry."""
+
+    def __init__(self, capacity: int = VERIFIED_CACHE_SIZE) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            capacity: Maximum number of tokens to keep.
+        """
+        self.capacity = capacity
+        self.claims: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Get unexpired claims for a token hash.
+
+        Args:
+            key: SHA-256 hex digest of the token.
+
+        Returns:
+            Copy of the cached claims, or None if missing or expired.
+        """
+        claims = self.claims.get(key)
+        if claims is None:
+            return None
+        if time() > claims["exp"]:
+            del self.claims[key]
+            return None
+        self.claims.move_to_end(key)
+        return dict(claims)
+
+    def put(self, key: str, claims: dict[str, Any]) -> None:
+        """Cache verified claims, evicting expired then least recently used.
+
+        Args:
+            key: SHA-256 hex digest of the token.
+            claims: Verified token claims.
+        """
+        self.claims[key] = dict(claims)
+        self.claims.move_to_end(key)
+        if len(self.claims) > self.capacity:
+            now = time()
+            for expired in [k for k, v in self.claims.items() if now > v["exp"]]:
+                del self.claims[expired]
+        while len(self.claims) > self.capacity:
+            self.claims.popitem(last=False)
+
+
+jwks = JWKSCache()
+verified_tokens = VerifiedTokenCache()
+
+
+def verify_signature(token: str) -> dict[str, Any] | None:
+    """Verify a token's signature against the pool's signing keys.
 
     Args:
-        event: API Gateway event with token in body.
+        token: Encoded JWT.
 
     Returns:
-        Token claims dict if valid, None otherwise.
+        Unvalidated token claims if the signature is valid, None otherwise.
     """
-    token = json.loads(event["body"])["token"]
     headers = jwt.get_unverified_headers(token)
-    kid = headers["kid"]
-    key_index = -1
-    for i in range(len(keys)):
-        if kid == keys[i]["kid"]:
-            key_index = i
-            break
-    if key_index == -1:
+    public_key = jwks.get(headers["kid"])
+    if public_key is None:
         print("Public key not found in jwks.json")
         return None
-    public_key = jwk.construct(keys[key_index])
     message, encoded_signature = str(token).rsplit(".", 1)
     decoded_signature = base64url_decode(encoded_signature.encode("utf-8"))
     if not public_key.verify(message.encode("utf8"), decoded_signature):
         print("Signature verification failed")
         return None
     print("Signature successfully verified")
-    claims = jwt.get_unverified_claims(token)
+    return jwt.get_unverified_claims(token)
+
+
+def verify_token(event: dict[str, Any]) -> dict[str, Any] | None:
+    """Verify JWT token from Cognito.
+
+    Tokens verified earlier in the same container are served from
+    `verified_tokens` without repeating the signature check.
+
+    Args:
+        event: API Gateway event with token in body.
+
+    Returns:
+        Token claims dict if valid, None otherwise.
+    """
+    token = json.loads(get_body(event))["token"]
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = verified_tokens.get(key)
+    claims = cached or verify_signature(token)
+    if claims is None:
+        return None
     if time() > claims["exp"]:
         print("Token is expired")
         return None
-    if claims["aud"] != web_client_id:
+    if claims["aud"] != os.environ["WEB_CLIENT_ID"]:
         print("Token was not issued for this audience")
         return None
+    if cached is None:
+        verified_tokens.put(key, claims)
     return claims
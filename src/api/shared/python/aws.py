@@ -0,0 +1,83 @@
+"""Lazily created AWS clients shared across invocations."""
+
+import os
+from functools import cache
+from threading import Lock
+from typing import Any
+
+from utils import lazy_import
+
+boto3 = lazy_import("boto3")
+
+# AWS client configuration
+# AWS_MAX_POOL_CONNECTIONS: Pooled connections per client (notify sends in parallel)
+# AWS_CONNECT_TIMEOUT / AWS_READ_TIMEOUT: Seconds before a request fails over to a retry
+# AWS_MAX_ATTEMPTS: Total attempts per request, including the first
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", 25))
+AWS_CONNECT_TIMEOUT = float(os.environ.get("AWS_CONNECT_TIMEOUT", 2))
+AWS_READ_TIMEOUT = float(os.environ.get("AWS_READ_TIMEOUT", 10))
+AWS_MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", 3))
+
+clients: dict[tuple[str, str | None, str | None], Any] = {}
+_lock = Lock()
+
+
+@cache
+def get_config() -> Any:
+    """Build the botocore config shared by every client.
+
+    Returns:
+        Client config with pool size, timeouts, retries and keep-alive.
+    """
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={"max_attempts": AWS_MAX_ATTEMPTS, "mode": "standard"},
+        tcp_keepalive=True,
+    )
+
+
+def get_client(
+    service: str, region_name: str | None = None, endpoint_url: str | None = None
+) -> Any:
+    """Get a client for a service, creating it on first use.
+
+    Clients are kept for the life of the container so later invocations
+    reuse their pooled connections.
+
+    Args:
+        service: AWS service name, e.g. 's3'.
+        region_name: Region override. Defaults to the environment's region.
+        endpoint_url: Endpoint override, e.g. a WebSocket callback URL.
+
+    Returns:
+        Shared boto3 client.
+    """
+    key = (service, region_name, endpoint_url)
+    client = clients.get(key)
+    if client is None:
+        with _lock:
+            client = clients.get(key)
+            if client is None:
+                # The default session is not thread-safe to create clients from
+                client = boto3.session.Session().client(
+                    service,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=get_config(),
+                )
+                clients[key] = client
+    return client
+
+
+def _reset_after_fork() -> None:
+    """Drop inherited clients so a forked child never shares parent sockets."""
+    global _lock
+    clients.clear()
+    _lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,565 @@
+"""Vectorized long/flat BTC backtests in the preview.json schema.
+
+Every strategy starts holding 1 BTC. A signal of True holds BTC over the
+next period and False holds USD, trading at the close the signal is given
+for. HODL is the strategy that always holds BTC. Balances are reported in
+BTC (so HODL stays at 1) and in USD (so HODL tracks the close).
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+from typing import Any
+
+from utils import DATE_FMT, lazy_import
+
+np = lazy_import("numpy")
+
+# Backtest configuration
+# BACKTEST_FEE: Fraction of the traded balance paid as fees on every trade
+# PERIODS_PER_YEAR: Periods used to annualize ratios (BTC trades every day)
+BACKTEST_FEE = float(os.environ.get("BACKTEST_FEE", 0.001))
+PERIODS_PER_YEAR = 365
+
+HODL = "HODL"
+HYPERDRIVE = "hyperdrive"
+STRATEGIES = [HODL, HYPERDRIVE]
+
+# Metrics the UI shows per denomination, in order
+METRICS = {
+    "BTC": [
+        "Total Return [%]",
+        "Max Drawdown [%]",
+        "Win Rate [%]",
+        "Profit Factor",
+        "Total Fees Paid",
+        "Profitable Time [%]",
+    ],
+    "USD": [
+        "Total Return [%]",
+        "Max Drawdown [%]",
+        "Win Rate [%]",
+        "Profit Factor",
+        "Sharpe Ratio",
+        "Sortino Ratio",
+    ],
+}
+# Decimal places kept for balances and stats per denomination
+BALANCE_DECIMALS = {"BTC": 6, "USD": 2}
+STAT_DECIMALS = 2
+# Preview tiers: the daily preview plus downsampled weekly and monthly series
+INTERVALS = ["day", "week", "month"]
+
+
+def simulate(close: Any, positions: Any, fee: float = BACKTEST_FEE) -> dict[str, Any]:
+    """Simulate many strategies over one price series at once.
+
+    Args:
+        close: Close prices, shape (periods,).
+        positions: Whether each strategy holds BTC after each close, shape
+            (strategies, periods) or (periods,).
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        Dict with 'traded' (bool, strategies × periods) and, per denomination,
+        'balances' (strategies × periods) and 'fees' (total per strategy).
+    """
+    close = np.asarray(close, dtype=float)
+    held = np.atleast_2d(np.asarray(positions, dtype=bool))
+    # Every strategy starts out holding BTC
+    before = np.concatenate([np.ones((len(held), 1), dtype=bool), held[:, :-1]], 1)
+    traded = held != before
+    # Compound in BTC so strategies holding BTC stay exact
+    growth = np.ones(held.shape)
+    growth[:, 1:] = np.where(held[:, :-1], 1.0, close[:-1] / close[1:])
+    btc = np.cumprod(growth * np.where(traded, 1 - fee, 1.0), axis=1)
+    paid = np.where(traded, btc / (1 - fee) * fee, 0.0)
+    return {
+        "traded": traded,
+        "BTC": {"balances": btc, "fees": paid.sum(1)},
+        "USD": {"balances": btc * close, "fees": (paid * close).sum(1)},
+    }
+
+
+def _ratio(num: Any, den: Any) -> Any:
+    """Divide elementwise, giving NaN where the result is undefined."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / np.where(den != 0, den, 1), np.nan)
+
+
+def aggregate(
+    balances: Any, exposed: Any, traded: Any, fees: Any, fee: float = BACKTEST_FEE
+) -> dict[str, Any]:
+    """Reduce balance histories to the running totals every metric needs.
+
+    A trade spans the periods a strategy holds the asset it is measured
+    against, i.e. BTC for USD balances and USD for BTC balances. Its profit
+    is measured from the balance before the entry fee.
+
+    Args:
+        balances: Balances after each close, shape (strategies, periods).
+        exposed: Whether each strategy is in a trade after each close.
+        traded: Whether each strategy traded at each close.
+        fees: Total fees paid per strategy.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        Running total name mapped to one value per strategy. 'Entry' is the
+        balance an open trade started from, or NaN when flat.
+    """
+    count, periods = balances.shape
+    pre = np.where(traded, balances / (1 - fee), balances)
+    edges = np.diff(exposed.astype(np.int8), prepend=0, append=0, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    closed = ends < periods
+    profit = balances[rows[closed], ends[closed]] - pre[rows[closed], starts[closed]]
+    entry = np.full(count, np.nan)
+    entry[rows[~closed]] = pre[rows[~closed], starts[~closed]]
+    closed_rows = rows[closed]
+    returns = balances[:, 1:] / balances[:, :-1] - 1
+    return {
+        "Bal": balances[:, -1],
+        "Start": pre[:, 0],
+        "Peak": balances.max(1),
+        "Drawdown": (1 - balances / np.maximum.accumulate(balances, 1)).max(1),
+        "Fees": np.asarray(fees, dtype=float),
+        "Profitable": (balances > pre[:, :1]).sum(1),
+        "Periods": np.full(count, periods),
+        "Returns": returns.sum(1),
+        "SquaredReturns": (returns**2).sum(1),
+        "SquaredLosses": (np.minimum(returns, 0) ** 2).sum(1),
+        "Entry": entry,
+        "Trades": np.bincount(closed_rows, minlength=count),
+        "Wins": np.bincount(closed_rows, profit > 0, minlength=count),
+        "Gains": np.bincount(closed_rows, np.maximum(profit, 0), minlength=count),
+        "Losses": np.bincount(closed_rows, np.maximum(-profit, 0), minlength=count),
+    }
+
+
+def metrics(totals: dict[str, Any]) -> dict[str, Any]:
+    """Compute every summary metric from running totals.
+
+    Args:
+        totals: Output of aggregate, or the same totals kept by advance.
+
+    Returns:
+        Metric name mapped to one value per strategy. Metrics without any
+        closed trades or without return variance are NaN.
+    """
+    totals = {key: np.asarray(value, dtype=float) for key, value in totals.items()}
+    count = totals["Periods"] - 1
+    mean = _ratio(totals["Returns"], count)
+    variance = _ratio(totals["SquaredReturns"] - totals["Returns"] * mean, count - 1)
+    downside = np.sqrt(_ratio(totals["SquaredLosses"], count))
+    annual = np.sqrt(PERIODS_PER_YEAR)
+    trades = totals["Trades"]
+    return {
+        "Total Return [%]": (totals["Bal"] / totals["Start"] - 1) * 100,
+        "Max Drawdown [%]": totals["Drawdown"] * 100,
+        "Win Rate [%]": _ratio(totals["Wins"], trades) * 100,
+        "Profit Factor": np.where(
+            trades > 0, _ratio(totals["Gains"], totals["Losses"]), np.nan
+        ),
+        "Total Fees Paid": totals["Fees"],
+        "Profitable Time [%]": _ratio(totals["Profitable"], totals["Periods"]) * 100,
+        "Sharpe Ratio": _ratio(mean, np.sqrt(np.maximum(variance, 0))) * annual,
+        "Sortino Ratio": _ratio(mean, downside) * annual,
+    }
+
+
+def compute_stats(
+    balances: Any, exposed: Any, traded: Any, fees: Any, fee: float = BACKTEST_FEE
+) -> dict[str, Any]:
+    """Compute every summary metric for many strategies in one denomination.
+
+    Args:
+        balances: Balances after each close, shape (strategies, periods).
+        exposed: Whether each strategy is in a trade after each close.
+        traded: Whether each strategy traded at each close.
+        fees: Total fees paid per strategy.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        Metric name mapped to one value per strategy, as from metrics.
+    """
+    return metrics(aggregate(balances, exposed, traded, fees, fee))
+
+
+def backtest(close: Any, signals: Any, fee: float = BACKTEST_FEE) -> dict[str, Any]:
+    """Backtest hyperdrive signals against HODL in BTC and USD.
+
+    Args:
+        close: Close prices, shape (periods,).
+        signals: Signal at each close, True for BUY and False for SELL.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        Dict with 'traded' and, per denomination, 'balances', 'totals' and
+        'stats' for the strategies in STRATEGIES order.
+    """
+    signals = np.asarray(signals, dtype=bool)
+    positions = np.stack([np.ones_like(signals), signals])
+    result = simulate(close, positions, fee)
+    # USD balances are exposed while holding BTC, BTC balances while holding USD
+    exposure = {"USD": positions, "BTC": ~positions}
+    for denom in METRICS:
+        side = result[denom]
+        side["totals"] = aggregate(
+            side["balances"], exposure[denom], result["traded"], side["fees"], fee
+        )
+        side["stats"] = metrics(side["totals"])
+    return result
+
+
+def _round(value: float, decimals: int) -> float | None:
+    """Round a metric for JSON, mapping NaN and infinities to None."""
+    return round(float(value), decimals) if math.isfinite(value) else None
+
+
+def to_preview(times: Any, signals: Any, result: dict[str, Any]) -> dict[str, Any]:
+    """Format a backtest in the preview.json schema the UI consumes.
+
+    Args:
+        times: Date of each close, as DATE_FMT strings.
+        signals: Signal at each close, True for BUY and False for SELL.
+        result: Output of backtest for the same closes.
+
+    Returns:
+        Dict with 'data' points and 'stats' rows per denomination. Each
+        hyperdrive point has the held signal as 'Full_Sig' and, on closes
+        where it traded, the new signal as 'Sig' (otherwise None).
+    """
+    times = [str(time) for time in times]
+    held = np.asarray(signals, dtype=bool).tolist()
+    traded = result["traded"][1].tolist()
+    preview = {}
+    for denom, names in METRICS.items():
+        side = result[denom]
+        hodl, hyperdrive = side["balances"].round(BALANCE_DECIMALS[denom]).tolist()
+        data = []
+        for idx, time in enumerate(times):
+            data.append({"Name": HODL, "Time": time, "Bal": hodl[idx]})
+            data.append(
+                {
+                    "Name": HYPERDRIVE,
+                    "Time": time,
+                    "Bal": hyperdrive[idx],
+                    "Sig": held[idx] if traded[idx] else None,
+                    "Full_Sig": held[idx],
+                }
+            )
+        preview[denom] = {"data": data, "stats": _stat_rows(names, side["stats"])}
+    return preview
+
+
+def _stat_rows(names: list[str], stats: dict[str, Any]) -> list[dict[str, Any]]:
+    """Format metrics as the preview's per-metric rows."""
+    return [
+        {"metric": name}
+        | {
+            strategy: _round(stats[name][idx], STAT_DECIMALS)
+            for idx, strategy in enumerate(STRATEGIES)
+        }
+        for name in names
+    ]
+
+
+def summarize(
+    times: Any,
+    close: Any,
+    signals: Any,
+    result: dict[str, Any],
+    fee: float = BACKTEST_FEE,
+) -> dict[str, Any]:
+    """Keep the running state needed to extend a backtest one close at a time.
+
+    Args:
+        times: Date of each close, as DATE_FMT strings.
+        close: Close prices, shape (periods,).
+        signals: Signal at each close, True for BUY and False for SELL.
+        result: Output of backtest for the same closes.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        JSON-ready summary with the last close, held positions and, per
+        denomination and strategy, the totals from aggregate.
+    """
+    summary: dict[str, Any] = {
+        "Time": str(times[-1]),
+        "Close": float(close[-1]),
+        "Fee": fee,
+        "Held": {HODL: True, HYPERDRIVE: bool(signals[-1])},
+    }
+    for denom in METRICS:
+        totals = result[denom]["totals"]
+        summary[denom] = {
+            name: {
+                key: None if math.isnan(value[idx]) else value[idx].item()
+                for key, value in totals.items()
+            }
+            for idx, name in enumerate(STRATEGIES)
+        }
+    return summary
+
+
+def _step(
+    totals: dict[str, Any], balance: float, before: float, exposed: bool, was: bool
+) -> None:
+    """Update one strategy's running totals with its next balance."""
+    change = balance / totals["Bal"] - 1
+    totals["Returns"] += change
+    totals["SquaredReturns"] += change**2
+    totals["SquaredLosses"] += min(change, 0) ** 2
+    totals["Fees"] += before - balance
+    totals["Bal"] = balance
+    totals["Peak"] = max(totals["Peak"], balance)
+    totals["Drawdown"] = max(totals["Drawdown"], 1 - balance / totals["Peak"])
+    totals["Profitable"] += balance > totals["Start"]
+    totals["Periods"] += 1
+    if was and not exposed:
+        profit = balance - totals["Entry"]
+        totals["Trades"] += 1
+        totals["Wins"] += profit > 0
+        totals["Gains"] += max(profit, 0)
+        totals["Losses"] += max(-profit, 0)
+        totals["Entry"] = None
+    elif exposed and not was:
+        totals["Entry"] = before
+
+
+def advance(
+    summary: dict[str, Any], time: str, close: float, signal: bool
+) -> dict[str, list[dict[str, Any]]]:
+    """Extend a summary by one close in constant time.
+
+    The summary is updated in place with exactly the totals a full backtest
+    over the longer history would produce.
+
+    Args:
+        summary: Output of summarize, or of earlier calls to advance.
+        time: Date of the new close, as a DATE_FMT string.
+        close: The new close price.
+        signal: Signal at the new close, True for BUY and False for SELL.
+
+    Returns:
+        The new preview data points per denomination.
+    """
+    fee = summary["Fee"]
+    points: dict[str, list[dict[str, Any]]] = {denom: [] for denom in METRICS}
+    for name, held in [(HODL, True), (HYPERDRIVE, bool(signal))]:
+        was_held = summary["Held"][name]
+        btc = summary["BTC"][name]["Bal"]
+        if not was_held:
+            btc *= summary["Close"] / close
+        traded = held != was_held
+        before = {"BTC": btc, "USD": btc * close}
+        for denom in METRICS:
+            balance = before[denom] * (1 - fee if traded else 1.0)
+            # USD balances are exposed while holding BTC, BTC balances while holding USD
+            exposed, was = (
+                (held, was_held) if denom == "USD" else (not held, not was_held)
+            )
+            _step(summary[denom][name], balance, before[denom], exposed, was)
+            point = {
+                "Name": name,
+                "Time": time,
+                "Bal": round(balance, BALANCE_DECIMALS[denom]),
+            }
+            if name == HYPERDRIVE:
+                point |= {"Sig": held if traded else None, "Full_Sig": held}
+            points[denom].append(point)
+        summary["Held"][name] = held
+    summary["Time"], summary["Close"] = time, close
+    return points
+
+
+def summary_stats(summary: dict[str, Any]) -> dict[str, list[dict[str, Any]]]:
+    """Format a summary's metrics as the preview's stats rows.
+
+    Args:
+        summary: Output of summarize or advance.
+
+    Returns:
+        Stats rows per denomination, as in to_preview.
+    """
+    stats = {}
+    for denom, names in METRICS.items():
+        totals = {
+            key: [summary[denom][name][key] for name in STRATEGIES]
+            for key in summary[denom][HODL]
+        }
+        totals["Entry"] = [math.nan] * len(STRATEGIES)
+        stats[denom] = _stat_rows(names, metrics(totals))
+    return stats
+
+
+def from_preview(preview: dict[str, Any]) -> tuple[list, list, list]:
+    """Recover the closes and signals a preview was built from.
+
+    HODL's USD balance is the close, and hyperdrive's Full_Sig the signal.
+
+    Args:
+        preview: Preview dict as produced by to_preview.
+
+    Returns:
+        Tuple of (times, close, signals) lists.
+    """
+    data = preview["USD"]["data"]
+    hodl = [point for point in data if point["Name"] == HODL]
+    hyperdrive = [point for point in data if point["Name"] == HYPERDRIVE]
+    times = [point["Time"] for point in hodl]
+    close = [point["Bal"] for point in hodl]
+    signals = [point["Full_Sig"] for point in hyperdrive]
+    return times, close, signals
+
+
+def _bucket(time: str, interval: str) -> str:
+    """Name the interval bucket a DATE_FMT date falls in."""
+    if interval == "month":
+        return time[:7]
+    if interval == "week":
+        year, week, _ = datetime.strptime(time, DATE_FMT).isocalendar()
+        return f"{year}-W{week:02d}"
+    return time
+
+
+def extend_tier(
+    data: list[dict[str, Any]], points: list[dict[str, Any]], interval: str
+) -> None:
+    """Fold daily preview points into a downsampled tier, in place.
+
+    Each tier point is a bucket of daily points per strategy: its Time, Bal
+    and Full_Sig are the last day's, Min and Max the lowest and highest Bal,
+    and Sig the last trade's signal (None without trades). Folding a day into
+    its bucket is O(1), so tiers can be extended like the preview.
+
+    Args:
+        data: Tier data points, updated in place.
+        points: Daily points in time order, as in preview data.
+        interval: Bucket size from INTERVALS.
+    """
+    for point in points:
+        last = next(
+            (
+                prev
+                for prev in data[-len(STRATEGIES) :]
+                if prev["Name"] == point["Name"]
+            ),
+            None,
+        )
+        bucket = _bucket(point["Time"], interval)
+        if last is None or _bucket(last["Time"], interval) != bucket:
+            data.append(point | {"Min": point["Bal"], "Max": point["Bal"]})
+            continue
+        last["Time"], last["Bal"] = point["Time"], point["Bal"]
+        last["Min"] = min(last["Min"], point["Bal"])
+        last["Max"] = max(last["Max"], point["Bal"])
+        if "Full_Sig" in point:
+            last["Full_Sig"] = point["Full_Sig"]
+        if point.get("Sig") is not None:
+            last["Sig"] = point["Sig"]
+
+
+def downsample_preview(preview: dict[str, Any], interval: str) -> dict[str, Any]:
+    """Build a preview tier with one point per strategy per interval.
+
+    Args:
+        preview: Daily preview dict as produced by to_preview.
+        interval: Bucket size from INTERVALS.
+
+    Returns:
+        Preview dict with tier data, as from extend_tier, and the same stats.
+    """
+    tier = {}
+    for denom, side in preview.items():
+        data: list[dict[str, Any]] = []
+        extend_tier(data, side["data"], interval)
+        tier[denom] = {"data": data, "stats": side["stats"]}
+    return tier
+
+
+def daily_lines(preview: dict[str, Any]) -> list[bytes]:
+    """Split a preview into one JSON line per date, oldest first.
+
+    Each line is {"Time": ..., "BTC": [...], "USD": [...]} with that date's
+    points, so date-ordered readers can fetch only the days they lack.
+
+    Args:
+        preview: Daily preview dict as produced by to_preview.
+
+    Returns:
+        Encoded lines without line terminators.
+    """
+    by_time: dict[str, dict[str, Any]] = {}
+    for denom, side in preview.items():
+        for point in side["data"]:
+            line = by_time.setdefault(point["Time"], {"Time": point["Time"]})
+            line.setdefault(denom, []).append(point)
+    return [json.dumps(line).encode() for line in by_time.values()]
+
+
+def parse_series(text: str, column: str) -> tuple[Any, Any]:
+    """Parse one column of a daily CSV keyed by a Time column.
+
+    Args:
+        text: CSV text with a header row, e.g. signals.csv.
+        column: Name of the column to return.
+
+    Returns:
+        Tuple of (times, values) string arrays in file order.
+    """
+    lines = text.strip().splitlines()
+    keys = lines[0].strip().split(",")
+    time_idx, value_idx = keys.index("Time"), keys.index(column)
+    rows = [line.strip().split(",") for line in lines[1:] if line.strip()]
+    times = np.array([row[time_idx] for row in rows])
+    values = np.array([row[value_idx] for row in rows])
+    return times, values
+
+
+def join_series(prices: str, signals: str) -> tuple[Any, Any, Any]:
+    """Join a daily price CSV with signals.csv on their common dates.
+
+    Args:
+        prices: CSV text with Time and Close columns.
+        signals: CSV text with Time and Sig columns, as in signals.csv.
+
+    Returns:
+        Tuple of (times, close, signals) arrays in date order.
+
+    Raises:
+        ValueError: If the files have no dates in common.
+    """
+    price_times, close = parse_series(prices, "Close")
+    signal_times, sig = parse_series(signals, "Sig")
+    times, price_idx, signal_idx = np.intersect1d(
+        price_times, signal_times, assume_unique=True, return_indices=True
+    )
+    if not len(times):
+        raise ValueError(f"Prices and signals share no {DATE_FMT} dates")
+    sig = np.char.lower(sig[signal_idx]) == "true"
+    return times, close[price_idx].astype(float), sig
+
+
+def build_preview(
+    prices: str, signals: str, fee: float = BACKTEST_FEE
+) -> dict[str, Any]:
+    """Backtest signals.csv against a daily price CSV into preview.json.
+
+    Only dates present in both files are used.
+
+    Args:
+        prices: CSV text with Time and Close columns.
+        signals: CSV text with Time and Sig columns, as in signals.csv.
+        fee: Fraction of the traded balance paid on each trade.
+
+    Returns:
+        Preview dict as produced by to_preview.
+
+    Raises:
+        ValueError: If the files have no dates in common.
+    """
+    times, close, sig = join_series(prices, signals)
+    return to_preview(times, sig, backtest(close, sig, fee))
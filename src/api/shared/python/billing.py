@@ -0,0 +1,19 @@
+"""Lazily created Stripe client shared by the billing handlers."""
+
+import os
+from functools import cache
+from typing import Any
+
+from utils import lazy_import
+
+stripe = lazy_import("stripe")
+
+
+@cache
+def get_stripe_client() -> Any:
+    """Create the Stripe client on first use.
+
+    Returns:
+        Stripe client for the configured secret key.
+    """
+    return stripe.StripeClient(os.environ["STRIPE_SECRET_KEY"])
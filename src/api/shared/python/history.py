@@ -0,0 +1,159 @@
+"""Date-ordered S3 objects that are appended to daily, and reading them."""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any
+
+from aws import get_client
+from botocore.exceptions import ClientError
+from utils import decode
+
+# Published signals, one dated row per day
+SIGNALS_KEY = "models/latest/signals.csv"
+# Preview artifacts; the summary holds the running backtest state so an
+# emitted signal can extend the preview, its downsampled tiers and its daily
+# lines (one JSON line per date, for ?since= reads) without recomputing
+# their history
+PREVIEW_KEY = "data/api/preview.json"
+TIER_KEY = "data/api/preview/{interval}.json"
+SUMMARY_KEY = "data/api/preview_summary.json"
+DAILY_KEY = "data/api/preview/daily.jsonl"
+
+# Delta reads of date-ordered objects (signals.csv, daily preview lines)
+# TAIL_READ_BYTES: Bytes read from the end of an object before widening the range
+TAIL_READ_BYTES = int(os.environ.get("TAIL_READ_BYTES", 4096))
+DATE_PATTERN = re.compile(rb"\d{4}-\d{2}-\d{2}")
+
+
+def history_version(obj: dict[str, Any]) -> str:
+    """Identify the history an S3 object holds.
+
+    Writers that only append keep the 'history-version' metadata of the
+    object they extend, so the version changes only when the history is
+    rewritten. Objects without it are identified by their ETag.
+
+    Args:
+        obj: GetObject or HeadObject response.
+
+    Returns:
+        Version token.
+    """
+    version = obj.get("Metadata", {}).get("history-version")
+    return version or obj["ETag"].strip('"')
+
+
+def history_digest(lines: list[bytes]) -> str:
+    """Identify the history held in some lines by their content.
+
+    For objects whose writers do not keep 'history-version', like
+    signals.csv: a client holding the lines up to a date can check them
+    against the digest of the same lines in the current object.
+
+    Args:
+        lines: Lines without their line endings.
+
+    Returns:
+        Version token.
+    """
+    return hashlib.sha256(b"\n".join(lines)).hexdigest()[:16]
+
+
+def read_json(key: str) -> tuple[Any, str | None, str]:
+    """Read and decompress a JSON object from S3.
+
+    Args:
+        key: S3 key.
+
+    Returns:
+        Tuple of (parsed JSON, Content-Encoding it is stored with if any,
+        history version).
+
+    Raises:
+        ValueError: If the object is stored with an unsupported coding.
+    """
+    obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=key)
+    encoding = obj.get("ContentEncoding")
+    body = json.loads(decode(obj["Body"].read(), encoding))
+    return body, None if encoding == "identity" else encoding, history_version(obj)
+
+
+def read_since(
+    s3: Any, bucket: str, key: str, since: str, header: bool = False
+) -> tuple[bytes | None, list[bytes], dict[str, Any]]:
+    """Read the lines of a date-ordered object that are dated after a date.
+
+    Reads a range from the end of the object and widens it until it reaches
+    a line dated on or before `since`, so the bytes read scale with the
+    number of new lines rather than the size of the object. Each line's
+    date is the first YYYY-MM-DD in it; undated lines are skipped. If the
+    object is rewritten between two ranged reads, the new version is read
+    whole instead.
+
+    Args:
+        s3: S3 client.
+        bucket: Bucket name.
+        key: Object key.
+        since: Date in YYYY-MM-DD form.
+        header: Whether to also return the object's first line.
+
+    Returns:
+        Tuple of (first line if requested, lines dated after `since` in
+        order, GetObject response of the last read).
+    """
+    try:
+        return _read_tail(s3, bucket, key, since, header)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "PreconditionFailed":
+            raise
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    lines = obj["Body"].read().splitlines()
+    first = (lines[0] if lines else b"") if header else None
+    return first, [line for date, line in _dated(lines) if date > since], obj
+
+
+def _read_tail(
+    s3: Any, bucket: str, key: str, since: str, header: bool
+) -> tuple[bytes | None, list[bytes], dict[str, Any]]:
+    """Read growing ranges from the end of an object, see read_since.
+
+    Raises:
+        ClientError: PreconditionFailed if the object changed between reads.
+    """
+    size = TAIL_READ_BYTES
+    match: dict[str, str] = {}
+    while True:
+        obj = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{size}", **match)
+        body = obj["Body"].read()
+        total = int(obj.get("ContentRange", f"/{len(body)}").rsplit("/", 1)[1])
+        lines = body.splitlines()
+        whole = len(body) >= total
+        dated = _dated(lines if whole else lines[1:])
+        if whole or (dated and dated[0][0] <= since):
+            break
+        size *= 4
+        # Never stitch together two versions of the object
+        match = {"IfMatch": obj["ETag"]}
+    first = None
+    if header:
+        if whole:
+            first = lines[0] if lines else b""
+        else:
+            head = s3.get_object(
+                Bucket=bucket,
+                Key=key,
+                Range=f"bytes=0-{TAIL_READ_BYTES - 1}",
+                IfMatch=obj["ETag"],
+            )
+            first = head["Body"].read().split(b"\n", 1)[0].rstrip(b"\r")
+    return first, [line for date, line in dated if date > since], obj
+
+
+def _dated(lines: list[bytes]) -> list[tuple[str, bytes]]:
+    """Pair each line that has a date with that date, skipping the others."""
+    return [
+        (found.group().decode(), line)
+        for line in lines
+        if (found := DATE_PATTERN.search(line))
+    ]
@@ -2,18 +2,24 @@
 
 import os
 import secrets
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
 from typing import Any
 
 from pynamodb.attributes import (
+    Attribute,
     BooleanAttribute,
-    ListAttribute,
     MapAttribute,
     NumberAttribute,
+    TTLAttribute,
     UnicodeAttribute,
     UTCDateTimeAttribute,
 )
-from pynamodb.indexes import AllProjection, GlobalSecondaryIndex
+from pynamodb.constants import LIST, NUMBER, STRING
+from pynamodb.exceptions import UpdateError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.indexes import GlobalSecondaryIndex, IncludeProjection
 from pynamodb.models import Model
 from utils import PAST_DATE, TEST
 
@@ -30,6 +36,15 @@ def query_by_api_key(api_key: str) -> list[Any]:
     return list(UserModel.api_key_index.query(api_key)) if api_key else []
 
 
+def generate_api_key() -> str:
+    """Generate a random API key without checking for collisions.
+
+    Returns:
+        URL-safe token string.
+    """
+    return secrets.token_urlsafe(64)
+
+
 def get_api_key() -> str:
     """Generate a unique API key.
 
@@ -38,19 +53,59 @@ def get_api_key() -> str:
     """
     key_already_exists = True
     while key_already_exists:
-        api_key = secrets.token_urlsafe(64)
+        api_key = generate_api_key()
         query_results = query_by_api_key(api_key)
         key_already_exists = len(query_results)
     return api_key
 
 
-def get_default_access_queue() -> list[datetime]:
+def get_default_access_queue() -> list[int]:
     """Get default access queue for rate limiting.
 
     Returns:
-        List of 5 past dates.
+        List of 5 past epoch timestamps.
     """
-    return [PAST_DATE] * 5
+    return [int(PAST_DATE.timestamp())] * 5
+
+
+_datetime_attribute = UTCDateTimeAttribute()
+
+
+class EpochListAttribute(Attribute[list[int]]):
+    """List of epoch second timestamps stored as DynamoDB numbers.
+
+    Items written before the compact format hold ISO datetime strings. They
+    are converted on read and stored as numbers on the next write.
+    """
+
+    attr_type = LIST
+
+    def serialize(self, value: list[int]) -> list[dict[str, str]]:
+        """Serialize timestamps to a list of numbers.
+
+        Args:
+            value: Epoch seconds.
+
+        Returns:
+            DynamoDB list of number values.
+        """
+        return [{NUMBER: str(timestamp)} for timestamp in value]
+
+    def deserialize(self, value: list[dict[str, str]]) -> list[int]:
+        """Deserialize a list of numbers or legacy datetime strings.
+
+        Args:
+            value: DynamoDB list of number or string values.
+
+        Returns:
+            Epoch seconds.
+        """
+        return [
+            int(item[NUMBER])
+            if NUMBER in item
+            else int(_datetime_attribute.deserialize(item[STRING]).timestamp())
+            for item in value
+        ]
 
 
 ATTRS_LOOKUP = {UnicodeAttribute: str, BooleanAttribute: bool}
@@ -95,50 +150,133 @@ class Stripe(MapAttribute):
     checkout = MapAttribute(default=Checkout)
 
 
-class APIKeyIndex(GlobalSecondaryIndex):
+def _keep_attributes(item: Any, names: list[str]) -> Any:
+    """Unset every attribute of a model instance except the given ones."""
+    for name in set(item.attribute_values) - set(names):
+        del item.attribute_values[name]
+    return item
+
+
+class ProjectedIndex(GlobalSecondaryIndex):
+    """Global secondary index that hydrates only its projected attributes.
+
+    PynamoDB fills every attribute missing from a returned item with its
+    default, which would make unprojected attributes look like defaults and
+    could be written back over real values. Items queried through this index
+    only have the table key, the index keys and the projected attributes set;
+    everything else reads as None. Projected attributes missing from an item
+    keep their plain default.
+    """
+
+    def projected_attributes(self) -> list[str]:
+        """Get the model attribute names stored in this index.
+
+        Returns:
+            Table hash key, index keys and projected non-key attributes.
+        """
+        table_keys = [
+            name
+            for name, attr in self._model.get_attributes().items()
+            if attr.is_hash_key
+        ]
+        return [
+            *table_keys,
+            *self.Meta.attributes,
+            *self.Meta.projection.non_key_attributes,
+        ]
+
+    def query(
+        self,
+        hash_key: Any,
+        range_key_condition: Condition | None = None,
+        filter_condition: Condition | None = None,
+        consistent_read: bool = False,
+        scan_index_forward: bool | None = None,
+        limit: int | None = None,
+        last_evaluated_key: dict[str, dict[str, Any]] | None = None,
+        attributes_to_get: list[str] | None = None,
+        page_size: int | None = None,
+        rate_limit: float | None = None,
+    ) -> Iterator[Any]:
+        """Query the index, leaving unprojected attributes unset.
+
+        Takes the same arguments as `Index.query`.
+
+        Returns:
+            Iterator over partially hydrated model instances.
+
+        Raises:
+            ValueError: If `attributes_to_get` names unprojected attributes.
+        """
+        projected = self.projected_attributes()
+        if attributes_to_get is None:
+            attributes_to_get = projected
+        unknown = set(attributes_to_get) - set(projected)
+        if unknown:
+            raise ValueError(f"Not projected into this index: {sorted(unknown)}")
+        results = super().query(
+            hash_key,
+            range_key_condition=range_key_condition,
+            filter_condition=filter_condition,
+            consistent_read=consistent_read,
+            scan_index_forward=scan_index_forward,
+            limit=limit,
+            last_evaluated_key=last_evaluated_key,
+            attributes_to_get=attributes_to_get,
+            page_size=page_size,
+            rate_limit=rate_limit,
+        )
+        return (_keep_attributes(item, attributes_to_get) for item in results)
+
+
+class APIKeyIndex(ProjectedIndex):
     """Global secondary index for API key lookup."""
 
     class Meta:
         """Index metadata."""
 
-        index_name = "api_key_index"
-        projection = AllProjection()
+        index_name = "api_key_index_v2"
+        # Read by signals for the subscription check and rate limit
+        projection = IncludeProjection(["in_beta", "subscribed", "access_queue"])
 
     api_key = UnicodeAttribute(hash_key=True)
 
 
-class InBetaIndex(GlobalSecondaryIndex):
+class InBetaIndex(ProjectedIndex):
     """Global secondary index for beta users."""
 
     class Meta:
         """Index metadata."""
 
-        index_name = "in_beta_index"
-        projection = AllProjection()
+        index_name = "in_beta_index_v2"
+        # Read by notify to filter and deliver alerts
+        projection = IncludeProjection(["alerts", "api_key"])
 
     in_beta = NumberAttribute(hash_key=True)
 
 
-class CustomerIdIndex(GlobalSecondaryIndex):
+class CustomerIdIndex(ProjectedIndex):
     """Global secondary index for Stripe customer ID."""
 
     class Meta:
         """Index metadata."""
 
-        index_name = "customer_id_index"
-        projection = AllProjection()
+        index_name = "customer_id_index_v2"
+        # Read by the Stripe webhook to detect subscription changes
+        projection = IncludeProjection(["subscribed"])
 
     customer_id = UnicodeAttribute(hash_key=True)
 
 
-class SubscribedIndex(GlobalSecondaryIndex):
+class SubscribedIndex(ProjectedIndex):
     """Global secondary index for subscribed users."""
 
     class Meta:
         """Index metadata."""
 
-        index_name = "subscribed_index"
-        projection = AllProjection()
+        index_name = "subscribed_index_v2"
+        # Read by notify to filter and deliver alerts
+        projection = IncludeProjection(["alerts", "api_key"])
 
     subscribed = NumberAttribute(hash_key=True)
 
@@ -154,17 +292,116 @@ class UserModel(Model):
             host = "http://localhost:8000"
 
     email = UnicodeAttribute(hash_key=True)
-    api_key = UnicodeAttribute(default=get_api_key)
+    # default_for_new: plain defaults also run on every deserialization
+    api_key = UnicodeAttribute(default_for_new=get_api_key)
     alerts = MapAttribute(default=Alerts)
     permissions = MapAttribute(default=Permissions)
     in_beta = NumberAttribute(default=0)
     subscribed = NumberAttribute(default=0)
     stripe = MapAttribute(default=Stripe)
-    access_queue = ListAttribute(
-        of=UTCDateTimeAttribute, default=get_default_access_queue
-    )
+    access_queue = EpochListAttribute(default=get_default_access_queue)
     customer_id = UnicodeAttribute(default="_")
     api_key_index = APIKeyIndex()
     customer_id_index = CustomerIdIndex()
     in_beta_index = InBetaIndex()
     subscribed_index = SubscribedIndex()
+
+
+def get_new_user_actions() -> list[Action]:
+    """Build if_not_exists SET actions for every defaulted user attribute.
+
+    The API key skips the index uniqueness query; a collision between two
+    512-bit random tokens is not a realistic event.
+
+    Returns:
+        Update actions that create a user without overwriting existing values.
+    """
+    actions = []
+    for name, attr in UserModel.get_attributes().items():
+        if attr.is_hash_key:
+            continue
+        default = attr.default_for_new or attr.default
+        if name == "api_key":
+            default = generate_api_key
+        value = default() if callable(default) else default
+        serialized = {attr.attr_type: attr.serialize(value)}
+        actions.append(attr.set(attr | serialized))
+    return actions
+
+
+def get_or_create_user(
+    email: str, attributes_to_get: list[str] | None = None
+) -> UserModel:
+    """Get a user, creating it with defaults on first login.
+
+    Existing users cost one GetItem. A first login costs that GetItem and
+    then one UpdateItem that returns ALL_NEW. Every attribute is set with
+    if_not_exists, so concurrent first logins converge on the same item.
+    Sending the UpdateItem alone would save new users the read, but it
+    would turn every returning user's read into a write.
+
+    Args:
+        email: User email (hash key).
+        attributes_to_get: Optional projection for existing users.
+
+    Returns:
+        The existing or newly created user.
+    """
+    try:
+        return UserModel.get(email, attributes_to_get=attributes_to_get)
+    except UserModel.DoesNotExist:
+        user = UserModel(email, _user_instantiated=False)
+        user.update(actions=get_new_user_actions())
+        return user
+
+
+class ThrottleModel(Model):
+    """DynamoDB model for failed attempt counters that expire via TTL."""
+
+    class Meta:
+        """Model metadata."""
+
+        table_name = os.environ["THROTTLE_TABLE_NAME"]
+        if TEST:
+            host = "http://localhost:8000"
+
+    key = UnicodeAttribute(hash_key=True)
+    attempts = NumberAttribute(default=0)
+    expires = TTLAttribute()
+
+
+def is_throttled(limits: dict[str, int]) -> bool:
+    """Check whether any throttle key has reached its failure limit.
+
+    Args:
+        limits: Mapping of throttle key to maximum allowed failures.
+
+    Returns:
+        True if any unexpired counter is at or above its limit.
+    """
+    now = datetime.now(UTC)
+    # TTL deletion is lazy, so expired items can still be returned
+    return any(
+        throttle.expires > now and throttle.attempts >= limits[throttle.key]
+        for throttle in ThrottleModel.batch_get(list(limits))
+    )
+
+
+def record_failed_attempt(keys: list[str], window: timedelta) -> None:
+    """Increment failure counters, starting a new window for expired ones.
+
+    Args:
+        keys: Throttle keys to increment.
+        window: Duration a counter lives after its first failure.
+    """
+    now = datetime.now(UTC)
+    for key in keys:
+        try:
+            ThrottleModel(key).update(
+                actions=[ThrottleModel.attempts.add(1)],
+                condition=ThrottleModel.expires > now,
+            )
+        except UpdateError as e:
+            if e.cause_response_code != "ConditionalCheckFailedException":
+                raise
+            ThrottleModel(key, attempts=1, expires=now + window).save()
@@ -1,10 +1,22 @@
 """Utility functions for API Lambda handlers."""
 
+import base64
+import gzip
+import importlib.util
 import json
 import os
+import sys
+from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
+from functools import partial
+from types import ModuleType
 from typing import Any
 
+try:
+    import brotli
+except ImportError:  # Not in every Lambda build
+    brotli = None
+
 DOMAIN = os.environ["DOMAIN"]
 ALLOWED_ORIGINS: set[str] = {
     f"https://{DOMAIN}",
@@ -15,6 +27,49 @@ ALLOWED_ORIGINS: set[str] = {
 PAST_DATE = datetime(2020, 1, 1, tzinfo=UTC)
 DATE_FMT = "%Y-%m-%d"
 
+# Response compression
+# COMPRESSION_MIN_BYTES: Smaller bodies are sent as-is, where base64 and the
+#   extra header would outweigh the savings
+# GZIP_LEVEL / BROTLI_QUALITY: Speed over ratio, as bodies are compressed per request
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+
+# Content coding -> (compress, decompress), most preferred first
+CODINGS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+if brotli is not None:
+    CODINGS["br"] = (
+        partial(brotli.compress, quality=BROTLI_QUALITY),
+        brotli.decompress,
+    )
+CODINGS["gzip"] = (partial(gzip.compress, compresslevel=GZIP_LEVEL), gzip.decompress)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module on first attribute access instead of immediately.
+
+    Heavy dependencies imported this way are only paid for by invocations
+    that use them, so CORS preflights and early error returns stay cheap on
+    a cold start. Names used in `from x import y` are still imported eagerly.
+
+    Args:
+        name: Top-level module name, e.g. 'pandas'.
+
+    Returns:
+        The module, which finishes loading when first used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
 
 def normalize_headers(event: dict[str, Any]) -> dict[str, str]:
     """Normalize event headers to lowercase keys.
@@ -32,6 +87,52 @@ def normalize_headers(event: dict[str, Any]) -> dict[str, str]:
     return {k.lower(): v for k, v in headers.items()}
 
 
+def accepts(header: str, value: str) -> bool:
+    """Check whether an Accept-style header explicitly allows a value.
+
+    Wildcards such as */* are not matched, so only clients that name the
+    value opt in and everyone else keeps the default representation.
+
+    Args:
+        header: Accept or Accept-Encoding header value.
+        value: Media type or content coding, e.g. 'gzip'.
+
+    Returns:
+        True if the header lists the value without q=0.
+    """
+    for item in header.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        if name.lower() != value:
+            continue
+        for param in params:
+            key, _, weight = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    return float(weight) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def get_body(event: dict[str, Any]) -> str:
+    """Get the request body as text.
+
+    The API treats every media type as binary so that handlers can return
+    compressed bodies, so API Gateway passes request bodies base64-encoded.
+
+    Args:
+        event: API Gateway event dict.
+
+    Returns:
+        The decoded body, or '' if there is none.
+    """
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body).decode()
+    return body
+
+
 def get_origin(event: dict[str, Any]) -> str:
     """Extract the Origin header from an API Gateway event.
 
@@ -46,6 +147,19 @@ def get_origin(event: dict[str, Any]) -> str:
     return origin if origin in ALLOWED_ORIGINS else f"https://{DOMAIN}"
 
 
+def get_source_ip(event: dict[str, Any]) -> str:
+    """Extract the caller's IP address from an API Gateway event.
+
+    Args:
+        event: API Gateway event dict.
+
+    Returns:
+        The source IP, or 'unknown' if the event has no request identity.
+    """
+    identity = (event.get("requestContext") or {}).get("identity") or {}
+    return identity.get("sourceIp") or "unknown"
+
+
 def get_headers(origin: str = "") -> dict[str, str]:
     """Build response headers with validated CORS origin.
 
@@ -149,17 +263,93 @@ def error(status: int, message: str, origin: str = "") -> dict[str, Any]:
     }
 
 
-def success(body: Any, status: int = 200, origin: str = "") -> dict[str, Any]:
+def decode(data: bytes, encoding: str | None) -> bytes:
+    """Decompress a body stored with a Content-Encoding, e.g. an S3 object.
+
+    Args:
+        data: Body as stored.
+        encoding: Its Content-Encoding, or None if stored uncompressed.
+
+    Returns:
+        The uncompressed body.
+
+    Raises:
+        ValueError: If `encoding` is not in CODINGS, e.g. br when the brotli
+            module is not installed.
+    """
+    if encoding in (None, "identity"):
+        return data
+    if encoding not in CODINGS:
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    return CODINGS[encoding][1](data)
+
+
+class RawJSON:
+    """JSON that is already encoded, sent by success without parsing it."""
+
+    __slots__ = ("data", "encoding")
+
+    def __init__(self, data: bytes | str, encoding: str | None = None) -> None:
+        """Wrap encoded JSON, e.g. an S3 object body.
+
+        Args:
+            data: JSON text or UTF-8 bytes, trusted to be valid.
+            encoding: Content coding `data` is compressed with, e.g. for an S3
+                object stored with Content-Encoding: gzip.
+
+        Raises:
+            ValueError: If `encoding` is not in CODINGS, as the body could
+                neither be passed through nor decompressed for every client.
+        """
+        self.data = data
+        self.encoding = None if encoding == "identity" else encoding
+        if self.encoding is not None and self.encoding not in CODINGS:
+            raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def success(
+    body: Any,
+    status: int = 200,
+    origin: str = "",
+    event: dict[str, Any] | None = None,
+) -> dict[str, Any]:
     """Construct a successful API response.
 
     Args:
         body: Response body - will be JSON serialized if not already a string.
+            RawJSON is sent as-is without being parsed. Compressed RawJSON is
+            passed through if the client accepts its coding, and
+            decompressed otherwise.
         status: HTTP status code (default 200).
         origin: Validated CORS origin.
+        event: Request event. If given, the body is compressed to match its
+            Accept-Encoding, see compress.
 
     Returns:
         Lambda response dict with statusCode, body, and headers.
     """
+    if isinstance(body, RawJSON):
+        data = body.data
+        if body.encoding is not None:
+            accept = normalize_headers(event or {}).get("accept-encoding", "")
+            if accepts(accept, body.encoding):
+                headers = _vary(get_headers(origin)) | {
+                    "Content-Encoding": body.encoding
+                }
+                return {
+                    "statusCode": status,
+                    "body": base64.b64encode(data).decode(),
+                    "isBase64Encoded": True,
+                    "headers": headers,
+                }
+            data = CODINGS[body.encoding][1](data)
+        response = {"statusCode": status, "body": data, "headers": get_headers(origin)}
+        if event is not None:
+            return compress(response, event)
+        if isinstance(data, bytes):
+            response["body"] = data.decode()
+        return response
+
     # Serialize to JSON if body isn't already a valid JSON string.
     # Example: dict {"a": 1} -> '{"a": 1}', JSON string '{"a": 1}' -> unchanged,
     # plain string "OK" -> '"OK"' (plain strings aren't valid JSON).
@@ -170,11 +360,58 @@ def success(body: Any, status: int = 200, origin: str = "") -> dict[str, Any]:
         except json.decoder.JSONDecodeError:
             dump = True
 
-    return {
+    response = {
         "statusCode": status,
         "body": json.dumps(body) if dump else body,
         "headers": get_headers(origin),
     }
+    return response if event is None else compress(response, event)
+
+
+def compress(response: dict[str, Any], event: dict[str, Any]) -> dict[str, Any]:
+    """Compress a text response body for the request's Accept-Encoding.
+
+    Uses the most preferred coding in CODINGS that the client accepts: br
+    when the brotli module is installed, then gzip. Bodies under
+    COMPRESSION_MIN_BYTES are left alone.
+
+    Args:
+        response: Lambda response dict. A bytes body is compressed without
+            decoding it, and decoded if left uncompressed.
+        event: Request event.
+
+    Returns:
+        The response, base64-encoded with Content-Encoding if compressed.
+    """
+    body = response["body"]
+    raw = body if isinstance(body, bytes) else body.encode()
+    headers = _vary(response["headers"])
+    if len(raw) >= COMPRESSION_MIN_BYTES:
+        accept = normalize_headers(event).get("accept-encoding", "")
+        for coding, (encode, _) in CODINGS.items():
+            if accepts(accept, coding):
+                return response | {
+                    "body": base64.b64encode(encode(raw)).decode(),
+                    "isBase64Encoded": True,
+                    "headers": headers | {"Content-Encoding": coding},
+                }
+    text = raw.decode() if isinstance(body, bytes) else body
+    return response | {"body": text, "headers": headers}
+
+
+def _vary(headers: dict[str, str]) -> dict[str, str]:
+    """Add Accept-Encoding to a response's Vary header.
+
+    Args:
+        headers: Response headers.
+
+    Returns:
+        Headers with Vary naming Accept-Encoding.
+    """
+    vary = [name.strip() for name in headers.get("Vary", "").split(",") if name.strip()]
+    if "Accept-Encoding" not in vary:
+        vary.append("Accept-Encoding")
+    return headers | {"Vary": ", ".join(vary)}
 
 
 def options(origin: str = "") -> dict[str, Any]:
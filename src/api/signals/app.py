@@ -1,13 +1,16 @@
 """Signals Lambda handler for trading signal access with rate limiting."""
 
 import os
-from datetime import UTC, datetime, timedelta
-from typing import Any, cast
+from bisect import bisect_right
+from datetime import datetime
+from time import time
+from typing import Any
 
-import boto3
+from aws import get_client
+from history import SIGNALS_KEY, history_digest
 from models import UserModel, query_by_api_key
 from utils import (
-    enough_time_has_passed,
+    DATE_FMT,
     error,
     get_origin,
     normalize_headers,
@@ -16,13 +19,12 @@ from utils import (
     transform_signal,
 )
 
-s3 = boto3.client("s3")
-
 # Rate limiting configuration for signal access
 # MAX_ACCESSES: Number of signal requests allowed per rate limit window
 # RATE_LIMIT_DAYS: Duration of the rate limit window in days
 MAX_ACCESSES = int(os.environ.get("SIGNAL_MAX_ACCESSES", 5))
 RATE_LIMIT_DAYS = int(os.environ.get("SIGNAL_RATE_LIMIT_DAYS", 1))
+SECONDS_PER_DAY = 86400
 
 
 def handle_signals(event: dict[str, Any], _: Any) -> dict[str, Any]:
@@ -49,32 +51,31 @@ def update_access_queue(user: UserModel) -> int | None:
     Returns:
         Number of remaining requests, or None if quota reached.
     """
-    access_queue: list[datetime] = cast(list[datetime], user.access_queue)
-
-    reset_duration = timedelta(days=RATE_LIMIT_DAYS)
-    now = datetime.now(UTC)
+    access_queue: list[int] = user.access_queue
+    reset_duration = RATE_LIMIT_DAYS * SECONDS_PER_DAY
+    now = int(time())
     quota_reached = False
 
     # Update access queue
-    if len(user.access_queue) >= MAX_ACCESSES:
+    if len(access_queue) >= MAX_ACCESSES:
         start = access_queue[-MAX_ACCESSES]
-        if enough_time_has_passed(start, now, reset_duration):
+        if now - start >= reset_duration:
             access_queue = access_queue[-MAX_ACCESSES + 1 :] + [now]
         else:
             access_queue = access_queue[-MAX_ACCESSES:]
             quota_reached = True
     else:
-        access_queue += [now]
+        access_queue = access_queue + [now]
 
     # Update user model in db with new access_queue
-    user.update(actions=[UserModel.access_queue.set(cast(Any, access_queue))])
+    user.update(actions=[UserModel.access_queue.set(access_queue)])
     if quota_reached:
         return None
 
     # Find out how many requests are left
     remaining = 0
     for access in access_queue:
-        if enough_time_has_passed(access, now, reset_duration):
+        if now - access >= reset_duration:
             remaining += 1
         else:
             break
@@ -86,11 +87,17 @@ def update_access_queue(user: UserModel) -> int | None:
 def get_signals(event: dict[str, Any]) -> dict[str, Any]:
     """Get trading signals for authenticated user with rate limiting.
 
+    Returns the last week of signals, or with ?since=YYYY-MM-DD every signal
+    after that date. 'version' identifies the signals up to the last one
+    returned. Passing it back with 'since' checks that the signals up to
+    that date have not been rewritten since.
+
     Args:
         event: API Gateway event with x-api-key header.
 
     Returns:
-        Success response with signals data or error response.
+        Success response with signals data or error response, 409 if the
+        signals up to 'since' no longer match 'version'.
     """
     origin = get_origin(event)
     # first get user by api key
@@ -106,6 +113,14 @@ def get_signals(event: dict[str, Any]) -> dict[str, Any]:
     if not (user.in_beta or user.subscribed):
         return error(402, "This endpoint is for subscribers only.", origin)
 
+    params = event.get("queryStringParameters") or {}
+    since = params.get("since")
+    if since is not None:
+        try:
+            datetime.strptime(since, DATE_FMT)
+        except ValueError:
+            return error(400, "Provide since as a YYYY-MM-DD date.", origin)
+
     remaining = update_access_queue(user)
     if not remaining:
         return error(
@@ -114,17 +129,27 @@ def get_signals(event: dict[str, Any]) -> dict[str, Any]:
             origin,
         )
 
-    obj = s3.get_object(Bucket=os.environ["S3_BUCKET"], Key="models/latest/signals.csv")
-
-    days_in_a_week = 7
-    lines = [line.decode() for line in list(obj["Body"].iter_lines())]
-    header = lines[0]
-    rows = lines[-days_in_a_week:]
-    keys = header.split(",")
-
-    response: dict[str, Any] = {"message": None, "data": []}
-    for row in rows:
-        cols = row.split(",")
+    obj = get_client("s3").get_object(Bucket=os.environ["S3_BUCKET"], Key=SIGNALS_KEY)
+    lines = obj["Body"].read().splitlines()
+    keys = lines[0].decode().split(",")
+    if since is None:
+        days_in_a_week = 7
+        start = max(len(lines) - days_in_a_week, 1)
+    else:
+        time_idx = keys.index("Time")
+        start = bisect_right(
+            lines, since, lo=1, key=lambda line: line.decode().split(",")[time_idx]
+        )
+        if "version" in params and history_digest(lines[:start]) != params["version"]:
+            return error(409, "Signals were rewritten. Fetch them again.", origin)
+
+    response: dict[str, Any] = {
+        "message": None,
+        "data": [],
+        "version": history_digest(lines),
+    }
+    for line in lines[start:]:
+        cols = line.decode().split(",")
         item = {}
         for idx, col in enumerate(cols):
             key = keys[idx]
@@ -6,22 +6,26 @@ import os
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
-import stripe
+from billing import get_stripe_client
 from models import UserModel
 from pynamodb.attributes import UTCDateTimeAttribute
+from pynamodb.exceptions import UpdateError
+from pynamodb.expressions.update import Action
 from utils import (
     PAST_DATE,
     TEST,
     enough_time_has_passed,
     error,
+    get_body,
     get_origin,
+    lazy_import,
     normalize_headers,
     options,
     success,
     verify_user,
 )
 
-stripe_client = stripe.StripeClient(os.environ["STRIPE_SECRET_KEY"])
+stripe = lazy_import("stripe")
 
 
 def get_price(price_id: str, origin: str = "") -> dict[str, Any]:
@@ -34,7 +38,7 @@ def get_price(price_id: str, origin: str = "") -> dict[str, Any]:
     Returns:
         Success response with price data.
     """
-    price = stripe_client.v1.prices.retrieve(price_id)
+    price = get_stripe_client().v1.prices.retrieve(price_id)
     return success(price, origin=origin)
 
 
@@ -66,7 +70,7 @@ def get_product(event: dict[str, Any], _: Any) -> dict[str, Any]:
     origin = get_origin(event)
     params = event["queryStringParameters"]
     product_id = params["id"]
-    product = stripe_client.v1.products.retrieve(product_id)
+    product = get_stripe_client().v1.products.retrieve(product_id)
     return success(product, origin=origin)
 
 
@@ -112,7 +116,7 @@ def post_checkout(event: dict[str, Any]) -> dict[str, Any]:
             return error(400, "User is already subscribed.", origin)
     else:
         name = verified["name"]
-        customer = stripe_client.v1.customers.create(
+        customer = get_stripe_client().v1.customers.create(
             params={"email": email, "name": name}
         )
         customer_id = customer.id
@@ -127,7 +131,7 @@ def post_checkout(event: dict[str, Any]) -> dict[str, Any]:
     now = datetime.now(UTC)
 
     if enough_time_has_passed(start, now, reset_duration):
-        session = stripe_client.v1.checkout.sessions.create(
+        session = get_stripe_client().v1.checkout.sessions.create(
             params={
                 "customer": customer_id,
                 "customer_update": {"address": "auto", "name": "auto"},
@@ -186,7 +190,7 @@ def post_billing(event: dict[str, Any]) -> dict[str, Any]:
 
     user = UserModel.get(email)
     customer_id = user.customer_id
-    session = stripe_client.v1.billing_portal.sessions.create(
+    session = get_stripe_client().v1.billing_portal.sessions.create(
         params={
             "customer": customer_id,
             "return_url": f"{origin}/subscription",
@@ -197,6 +201,28 @@ def post_billing(event: dict[str, Any]) -> dict[str, Any]:
     return success(url, origin=origin)
 
 
+def expire_checkout(user: UserModel, actions: list[Action]) -> None:
+    """Apply update actions and expire the user's saved checkout session.
+
+    The customer_id index does not project `stripe`, so only the nested
+    timestamp is written. Users without a checkout map get `actions` alone.
+
+    Args:
+        user: User model with at least the hash key set.
+        actions: Other update actions to apply in the same write.
+    """
+    created = UTCDateTimeAttribute().serialize(PAST_DATE)
+    try:
+        user.update(
+            actions=[*actions, UserModel.stripe["checkout"]["created"].set(created)],
+            condition=UserModel.stripe["checkout"].exists(),
+        )
+    except UpdateError as e:
+        if e.cause_response_code != "ConditionalCheckFailedException":
+            raise
+        user.update(actions=actions)
+
+
 def post_subscribe(event: dict[str, Any], _: Any) -> dict[str, Any]:
     """Handle Stripe webhook events for subscription updates.
 
@@ -208,10 +234,10 @@ def post_subscribe(event: dict[str, Any], _: Any) -> dict[str, Any]:
         Success response acknowledging webhook receipt.
     """
     if TEST:
-        event = json.loads(event["body"])
+        event = json.loads(get_body(event))
     else:
         webhook_secret = os.environ["STRIPE_WEBHOOK_SECRET"]
-        req_body = event["body"]
+        req_body = get_body(event)
         req_headers = normalize_headers(event)
         signature = req_headers["stripe-signature"]
         try:
@@ -243,16 +269,13 @@ def post_subscribe(event: dict[str, Any], _: Any) -> dict[str, Any]:
         ):
             return response
         sub_is_active = sub["status"] == "active"
-        stripe_lookup = user.stripe
         sub_was_active = bool(user.subscribed)
 
         if sub_was_active != sub_is_active:
             actions = [UserModel.subscribed.set(int(sub_is_active))]
-            if not sub_is_active:
-                stripe_lookup.checkout["created"] = UTCDateTimeAttribute().serialize(
-                    PAST_DATE
-                )
-                actions.append(UserModel.stripe.set(stripe_lookup))
-            user.update(actions=actions)
+            if sub_is_active:
+                user.update(actions=actions)
+            else:
+                expire_checkout(user, actions)
 
     return response
@@ -13,15 +13,16 @@ from time import sleep
 from typing import Any
 from zoneinfo import ZoneInfo
 
-import boto3
 import pyotp
 import robin_stocks.robinhood as rh
 from botocore.exceptions import ClientError
 
 if str(os.environ.get("LOCAL")).lower() == "true":
     from src.api.shared.python.auth import verify_token
+    from src.api.shared.python.aws import get_client
     from src.api.shared.python.utils import (
         error,
+        get_body,
         get_origin,
         options,
         str_to_bool,
@@ -30,9 +31,16 @@ if str(os.environ.get("LOCAL")).lower() == "true":
     )
 else:
     from auth import verify_token
-    from utils import error, get_origin, options, str_to_bool, success, verify_user
-
-s3 = boto3.resource("s3")
+    from aws import get_client
+    from utils import (
+        error,
+        get_body,
+        get_origin,
+        options,
+        str_to_bool,
+        success,
+        verify_user,
+    )
 
 
 def calc_d1(
@@ -138,15 +146,14 @@ def handle_ws(event: dict[str, Any], _: Any) -> dict[str, Any]:
     connection = context["connectionId"]
     callback = f"https://{domain}"
 
-    client = boto3.client("apigatewaymanagementapi", endpoint_url=callback)
-    req_body = json.loads(event["body"])
+    client = get_client("apigatewaymanagementapi", endpoint_url=callback)
+    req_body = json.loads(get_body(event))
     variant = bool(req_body.get("variant"))
     login(variant)
     response = post_trade(event)
     data = response["body"]
     client.post_to_connection(Data=data.encode(), ConnectionId=connection)
     client.delete_connection(ConnectionId=connection)
-    client.close()
 
     return success("OK")
 
@@ -162,11 +169,10 @@ def login(variant: bool = False) -> None:
     filename = "robinhood"
     auth_path = os.path.join(os.path.expanduser("~"), ".tokens", f"{filename}{ext}")
     key = f"data/{filename}{postfix}{ext}"
-    bucket = s3.Bucket(os.environ["S3_BUCKET"])
     try:
         Path(auth_path).parent.mkdir(parents=True, exist_ok=True)
         with open(auth_path, "wb") as file:
-            bucket.download_fileobj(key, file)
+            get_client("s3").download_fileobj(os.environ["S3_BUCKET"], key, file)
             print("Loaded auth file from S3.")
     except ClientError:
         print("Could not load auth file from S3.")
@@ -188,7 +194,7 @@ def login(variant: bool = False) -> None:
 
     try:
         if os.path.exists(auth_path):
-            bucket.upload_file(auth_path, key)
+            get_client("s3").upload_file(auth_path, os.environ["S3_BUCKET"], key)
             print("Saved auth file to S3.")
     except Exception as e:
         print(f"Warning: Could not save auth file to S3: {e}")
@@ -246,7 +252,7 @@ def post_trade(event: dict[str, Any]) -> dict[str, Any]:
     Returns:
         Success response with trade results.
     """
-    req_body = json.loads(event["body"])
+    req_body = json.loads(get_body(event))
     trade_type = req_body["type"]
     symbols = req_body["symbols"]
     trade = Buy() if trade_type.upper() == "BUY" else Sell()
@@ -1,8 +1,10 @@
 """Tests for account Lambda handler."""
 
 import json
+from typing import Any
 
 import pytest
+from account import app
 from account.app import get_account, handle_account, options, post_account
 from shared.python.models import UserModel
 
@@ -54,6 +56,12 @@ def test_get_account() -> None:
     body = json.loads(res["body"])
     assert body == user_data
 
+    event["queryStringParameters"] = {"fields": "api_key,alerts,stripe"}
+    res = get_account(event)
+    assert res["statusCode"] == 200
+    body = json.loads(res["body"])
+    assert body == {"api_key": user.api_key, "alerts": user_data["alerts"]}
+
 
 def test_post_account() -> None:
     """Test post_account updates user account settings."""
@@ -84,3 +92,58 @@ def test_post_account() -> None:
     assert user.alerts.email
     assert user.alerts.sms
     assert user.alerts.webhook
+
+
+def test_post_account_diff(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test post_account skips no-op writes and updates legacy items."""
+    event = {
+        "httpMethod": "POST",
+        "requestContext": {
+            "authorizer": {"claims": {"email_verified": "true", "email": "new_user"}}
+        },
+        "body": json.dumps({"alerts": {"unknown": True, "email": "not a bool"}}),
+    }
+    res = post_account(event)
+    assert res["statusCode"] == 200
+    assert json.loads(res["body"]) == UserModel.get("new_user").to_simple_dict()
+
+    # Repeating the stored values reads the user but does not write it
+    body = {"permissions": {"read_disclaimer": True}, "alerts": {"sms": True}}
+    event["body"] = json.dumps(body)
+    assert post_account(event)["statusCode"] == 200
+    writes = []
+    update = app.UserModel.update
+
+    def _update(self: Any, actions: list, **kwargs: Any) -> Any:
+        writes.append(actions)
+        return update(self, actions, **kwargs)
+
+    monkeypatch.setattr(app.UserModel, "update", _update)
+    res = post_account(event)
+    assert res["statusCode"] == 200
+    assert json.loads(res["body"]) == UserModel.get("new_user").to_simple_dict()
+    assert writes == []
+
+    # Only the paths that differ are written
+    email = UserModel.get("new_user").alerts.email
+    event["body"] = json.dumps({"alerts": {"sms": False, "email": email}})
+    res = post_account(event)
+    assert len(writes) == 1
+    assert len(writes[0]) == 1
+    assert not json.loads(res["body"])["alerts"]["sms"]
+    monkeypatch.undo()
+    event["body"] = json.dumps(body)
+
+    # Items saved before alerts/permissions existed have no maps to update
+    legacy = UserModel("legacy_user")
+    legacy.save()
+    legacy.update(actions=[UserModel.alerts.remove(), UserModel.permissions.remove()])
+    event["requestContext"]["authorizer"]["claims"]["email"] = "legacy_user"
+    res = post_account(event)
+    assert res["statusCode"] == 200
+    user = UserModel.get("legacy_user")
+    assert json.loads(res["body"]) == user.to_simple_dict()
+    assert user.permissions["read_disclaimer"]
+    assert user.alerts["sms"]
+    assert not user.alerts["email"]
+    user.delete()
@@ -1,10 +1,22 @@
 """Pytest configuration and fixtures for API tests."""
 
 import os
+from collections.abc import Callable, Iterator
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from threading import Thread
+from time import sleep
+from types import ModuleType
+from typing import Any
+
+import pytest
+from botocore.exceptions import ClientError
 
 # Set required environment variables BEFORE any imports
 # These are needed during model class definition
 os.environ.setdefault("TABLE_NAME", "users-local")
+os.environ.setdefault("THROTTLE_TABLE_NAME", "throttle-local")
 os.environ.setdefault("TEST", "true")
 os.environ.setdefault("STAGE", "dev")
 os.environ.setdefault("DOMAIN", "algotrade.io")
@@ -19,3 +31,138 @@ os.environ.setdefault("S3_BUCKET", "test-bucket")
 os.environ.setdefault("EMAIL_USER", "test")
 os.environ.setdefault("EMAIL_PASS", "test")
 os.environ.setdefault("SIGNAL_EMAIL", "signal@test.com")
+
+
+class LocalServer:
+    """Local HTTP stand-in for third-party endpoints in tests.
+
+    Serves `payload` with `status` to every GET request, optionally after
+    `delay` seconds, and counts the requests it receives.
+    """
+
+    def __init__(self) -> None:
+        """Start the server on a free localhost port."""
+        self.payload = b""
+        self.status = 200
+        self.delay = 0.0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler that serves the current payload."""
+
+            def do_GET(self) -> None:
+                """Respond with the configured status and payload."""
+                server.requests += 1
+                sleep(server.delay)
+                self.send_response(server.status)
+                self.send_header("Content-Length", str(len(server.payload)))
+                self.end_headers()
+                self.wfile.write(server.payload)
+
+            def log_message(self, *_: Any) -> None:
+                """Silence per-request logging."""
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def local_server() -> Iterator[LocalServer]:
+    """Provide a running LocalServer that is shut down after the test."""
+    server = LocalServer()
+    yield server
+    server.close()
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 client.
+
+    Objects are kept as their put_object arguments with an md5 ETag. GETs
+    honour Range, IfMatch and IfNoneMatch, and fail with NoSuchKey,
+    PreconditionFailed or 304 like S3. `keys` lists the key of every GET and
+    `read` counts the body bytes returned.
+    """
+
+    def __init__(self, objects: dict[str, bytes] | None = None) -> None:
+        """Store the given bodies by key."""
+        self.objects: dict[str, dict[str, Any]] = {}
+        self.keys: list[str] = []
+        self.read = 0
+        for key, body in (objects or {}).items():
+            self.put_object(Bucket="", Key=key, Body=body)
+
+    def put_object(
+        self,
+        Bucket: str,  # noqa: N803
+        Key: str,  # noqa: N803
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Store an object's body and metadata."""
+        etag = f'"{md5(kwargs["Body"]).hexdigest()}"'
+        self.objects[Key] = kwargs | {"ETag": etag}
+        return {"ETag": etag}
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]:  # noqa: N803
+        """Return an object's metadata, or raise 404."""
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": Key}}, "HeadObject")
+        return {k: v for k, v in self.objects[Key].items() if k != "Body"}
+
+    def get_object(
+        self,
+        Bucket: str,  # noqa: N803
+        Key: str,  # noqa: N803
+        Range: str | None = None,  # noqa: N803
+        IfMatch: str | None = None,  # noqa: N803
+        IfNoneMatch: str | None = None,  # noqa: N803
+    ) -> dict[str, Any]:
+        """Return an object or a byte range of it."""
+        self.keys.append(Key)
+        if Key not in self.objects:
+            error = {"Error": {"Code": "NoSuchKey", "Message": Key}}
+            raise ClientError(error, "GetObject")
+        obj = self.objects[Key]
+        if IfMatch is not None and IfMatch != obj["ETag"]:
+            error = {"Error": {"Code": "PreconditionFailed", "Message": Key}}
+            raise ClientError(error, "GetObject")
+        if IfNoneMatch == obj["ETag"]:
+            error = {"Error": {"Code": "304", "Message": "Not Modified"}}
+            raise ClientError(error, "GetObject")
+        body = obj["Body"]
+        res = dict(obj)
+        if Range is not None:
+            start, end = Range.removeprefix("bytes=").split("-")
+            if start:
+                first, last = int(start), min(int(end), len(body) - 1)
+            else:
+                first, last = max(len(body) - int(end), 0), len(body) - 1
+            body = body[first : last + 1]
+            res["ContentRange"] = f"bytes {first}-{last}/{len(obj['Body'])}"
+        self.read += len(body)
+        return res | {"Body": BytesIO(body)}
+
+
+@pytest.fixture
+def fake_s3(monkeypatch: pytest.MonkeyPatch) -> Callable[..., FakeS3]:
+    """Provide a factory that serves a FakeS3 to the given modules.
+
+    Call it with the modules whose get_client should return the fake, and
+    optionally the bodies to start with by key.
+    """
+
+    def install(
+        *modules: ModuleType, objects: dict[str, bytes] | None = None
+    ) -> FakeS3:
+        s3 = FakeS3(objects)
+        for module in modules:
+            monkeypatch.setattr(module, "get_client", lambda _: s3)
+        return s3
+
+    return install
@@ -2,8 +2,13 @@
 
 import json
 import os
+from time import time
+from typing import Any
 
-from gym.app import get_exercise_log
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from gym import app
+from gym.app import ExerciseLogCache, get_exercise_log
 
 DOMAIN = os.environ["DOMAIN"]
 
@@ -18,3 +23,122 @@ def test_get_exercise_log() -> None:
         data[0].keys()
     )
     assert res["headers"]["Access-Control-Allow-Origin"] == f"https://dev.{DOMAIN}"
+
+
+CSV = (
+    b"Date,Id,Weight,Reps,Exercise,Volume,1RM\n"
+    b"2024-01-01,1,100,5,Squat,500,116.7\n"
+    b"Date,Id,Weight,Reps,Exercise,Volume,1RM\n"
+    b"2024-01-02,2,60,8,Bench,480,76\n"
+)
+
+
+def test_exercise_log_refresh(local_server: Any, fake_s3: Any) -> None:
+    """Test fresh logs are served from memory and stale ones revalidated."""
+    s3 = fake_s3(app)
+    local_server.payload = CSV
+    cache = ExerciseLogCache(local_server.url, ttl=60, max_stale=600)
+    records = json.loads(cache.get())
+    assert [record["Exercise"] for record in records] == ["Squat", "Bench"]
+    assert set(records[0]) == set(app.COLUMNS)
+    assert s3.objects[app.SNAPSHOT_KEY]["Body"] == cache.records
+    cache.get()
+    assert local_server.requests == 1
+
+    # An unchanged sheet keeps the snapshot as it is
+    snapshot = s3.objects[app.SNAPSHOT_KEY]
+    cache.fetched_at -= 3600
+    cache.get()
+    assert local_server.requests == 2
+    assert s3.objects[app.SNAPSHOT_KEY] is snapshot
+    # Cold containers still see when it was last confirmed current
+    snapshot["Metadata"]["fetched-at"] = str(time() - 3600)
+    cold = ExerciseLogCache(local_server.url, ttl=60, max_stale=0)
+    assert cold.get() == cache.records
+    assert cold.fetched_at == cache.fetched_at
+    assert local_server.requests == 2
+
+    # Stale: served at once, then refreshed in the background
+    local_server.payload = CSV.replace(b"Bench", b"Press")
+    stale = cache.records
+    cache.fetched_at -= 120
+    assert cache.get() == stale
+    cache.refreshing.join()
+    assert local_server.requests == 3
+    assert b"Press" in cache.get()
+    assert s3.objects[app.SNAPSHOT_KEY]["Body"] == cache.records
+
+    # Past max_stale: refreshed before responding
+    local_server.payload = CSV
+    cache.fetched_at -= 3600
+    assert b"Bench" in cache.get()
+    assert local_server.requests == 4
+
+    # A cold container starts from the snapshot without reading the sheet
+    cold = ExerciseLogCache(local_server.url, ttl=60)
+    assert cold.get() == cache.records
+    assert cold.digest == cache.digest
+    assert local_server.requests == 4
+
+
+def test_exercise_log_fallback(local_server: Any, fake_s3: Any) -> None:
+    """Test a slow, failing or malformed sheet falls back to the last good log."""
+    fake_s3(app)
+    local_server.payload = CSV
+    cache = ExerciseLogCache(local_server.url, ttl=60, max_stale=0, timeout=(1, 0.2))
+    good = cache.get()
+
+    local_server.delay = 0.5
+    cache.fetched_at -= 120
+    start = time()
+    assert cache.get() == good
+    assert time() - start < 0.5
+    assert cache.failed_at is not None
+    # Failed refreshes are not retried on every request
+    requests = local_server.requests
+    assert cache.get() == good
+    assert local_server.requests == requests
+
+    local_server.delay = 0
+    for status, payload in [(500, CSV), (200, b"<html>Sign in</html>")]:
+        local_server.status, local_server.payload = status, payload
+        cache.failed_at = None
+        assert cache.get() == good
+        assert cache.failed_at is not None
+
+    # A cold container with the sheet down serves the snapshot
+    assert ExerciseLogCache(local_server.url, ttl=60).get() == good
+
+
+def test_exercise_log_s3_down(
+    local_server: Any, fake_s3: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test an unreachable snapshot bucket falls through to the sheet."""
+    s3 = fake_s3(app)
+
+    def down(**_: Any) -> None:
+        raise EndpointConnectionError(endpoint_url="https://s3.amazonaws.com")
+
+    for method in ["get_object", "head_object", "put_object"]:
+        monkeypatch.setattr(s3, method, down)
+    local_server.payload = CSV
+    cache = ExerciseLogCache(local_server.url)
+    assert json.loads(cache.get())[1]["Exercise"] == "Bench"
+    assert local_server.requests == 1
+
+
+def test_get_exercise_log_unavailable(
+    local_server: Any, fake_s3: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the handler serves cached records, or 502 before any fetch."""
+    fake_s3(app)
+    local_server.status = 500
+    monkeypatch.setattr(app, "exercise_log", ExerciseLogCache(local_server.url))
+    event = {"headers": {"origin": f"https://dev.{DOMAIN}"}}
+    assert get_exercise_log(event, None)["statusCode"] == 502
+
+    local_server.status, local_server.payload = 200, CSV
+    app.exercise_log.failed_at = None
+    res = get_exercise_log(event, None)
+    assert res["statusCode"] == 200
+    assert json.loads(res["body"])[1]["Exercise"] == "Bench"
@@ -1,17 +1,42 @@
 """Tests for model Lambda handler."""
 
+import base64
+import gzip
 import json
 import os
+import pickle
+import struct
+from collections import Counter
 from datetime import datetime
+from typing import Any
 
 import numpy as np
 import pytest
-from model.app import NumpyEncoder, get_model, get_visualization
+from model import app
+from model.app import (
+    NumpyEncoder,
+    downsample_visualization,
+    encode_binary,
+    encode_json,
+    extract_boundary,
+    get_model,
+    get_visualization,
+    load_visualization,
+    unpack_visualization,
+)
+from publish_model import pack_visualization, publish_version, publish_visualization
 from shared.python.utils import DATE_FMT
 
 DOMAIN = os.environ["DOMAIN"]
 
 
+@pytest.fixture(autouse=True)
+def reset_caches(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Start every test with a cold container."""
+    monkeypatch.setattr(app, "manifest_cache", {"version": None, "expires": 0.0})
+    monkeypatch.setattr(app, "known_versions", set())
+
+
 def test_get_model() -> None:
     """Test get_model returns model metadata with expected fields."""
     event = {"headers": {"origin": f"https://dev.{DOMAIN}"}}
@@ -62,6 +87,454 @@ def test_get_visualization() -> None:
         assert res["headers"]["Access-Control-Allow-Origin"] == f"https://dev.{DOMAIN}"
 
 
+def _sample_visualization(dims: int) -> dict[str, Any]:
+    """Build visualization data shaped like the published artifacts."""
+    rng = np.random.default_rng(0)
+    axes = np.meshgrid(*[np.linspace(-1, 1, 4)] * dims)
+    return {
+        "actual": [{"BUY": rng.random(6), "SELL": rng.random(4)} for _ in range(dims)],
+        "centroid": rng.random(dims),
+        "radius": 0.75,
+        "grid": list(axes),
+        "preds": np.arange(axes[0].size) % 2,
+    }
+
+
+def test_pack_visualization() -> None:
+    """Test the packed artifact round-trips to the same JSON as the pickles."""
+    for dims in [2, 3]:
+        data = _sample_visualization(dims)
+        unpacked = unpack_visualization(pack_visualization(data))
+        expected = json.dumps(data, cls=NumpyEncoder)
+        assert json.dumps(unpacked, cls=NumpyEncoder) == expected
+        _verify_visualization(json.loads(expected), dims)
+
+
+def test_load_visualization(fake_s3: Any) -> None:
+    """Test one GET for the packed artifact and a pickle fallback without it."""
+    data = _sample_visualization(2)
+    packed = {"models/latest/2D/visualization.npz": pack_visualization(data)}
+    s3 = fake_s3(app, objects=packed)
+    expected = json.dumps(data, cls=NumpyEncoder)
+    assert json.dumps(load_visualization("2D"), cls=NumpyEncoder) == expected
+    assert s3.keys == ["models/latest/2D/visualization.npz"]
+
+    pickles = {
+        f"models/latest/2D/{label}.pkl": pickle.dumps(value)
+        for label, value in data.items()
+    }
+    s3 = fake_s3(app, objects=pickles)
+    assert json.dumps(load_visualization("2D"), cls=NumpyEncoder) == expected
+    assert len(s3.keys) == 6
+
+
+def test_get_visualization_rendered(
+    monkeypatch: pytest.MonkeyPatch, fake_s3: Any
+) -> None:
+    """Test published response JSON is served as-is and matches live encoding."""
+    data = _sample_visualization(3)
+    artifacts = publish_visualization(data)
+    s3 = fake_s3(
+        app,
+        objects={f"models/latest/3D/{name}": body for name, body in artifacts.items()},
+    )
+    event = {"queryStringParameters": {"dims": "3D"}, "headers": {}}
+    res = get_visualization(event, None)
+    assert res["statusCode"] == 200
+    assert res["body"] == artifacts["visualization.json"].decode()
+    assert s3.keys == [
+        "models/latest/manifest.json",
+        "models/latest/3D/visualization.json",
+    ]
+
+    # Without the rendered JSON the packed arrays produce the same body
+    del s3.objects["models/latest/3D/visualization.json"]
+    assert get_visualization(event, None)["body"] == res["body"]
+
+
+def test_downsample_visualization() -> None:
+    """Test cells take the majority label at the mean of their coordinates."""
+    xs, ys = np.meshgrid(np.arange(4.0), np.arange(6.0))
+    preds = np.zeros(xs.shape, dtype=int)
+    preds[:3, :2] = [[1, 1], [1, 0], [0, 0]]  # 3 of 6 is a tie, lower label wins
+    preds[3:, :2] = [[1, 1], [1, 0], [0, 1]]
+    preds[:, 2:] = 1
+    data = {"radius": 0.5, "grid": [xs.ravel(), ys.ravel()], "preds": preds.ravel()}
+    res = downsample_visualization(data, 2)
+    assert res["radius"] == 0.5
+    # x varies fastest in the input, so it still does
+    np.testing.assert_array_equal(res["grid"][0], [0.5, 2.5, 0.5, 2.5])
+    np.testing.assert_array_equal(res["grid"][1], [1, 1, 4, 4])
+    np.testing.assert_array_equal(res["preds"], [0, 1, 1, 1])
+
+    # Transposed input keeps its own order
+    data = {"grid": [xs.T.ravel(), ys.T.ravel()], "preds": preds.T.ravel()}
+    res = downsample_visualization(data, 2)
+    np.testing.assert_array_equal(res["grid"][0], [0.5, 0.5, 2.5, 2.5])
+    np.testing.assert_array_equal(res["preds"], [0, 1, 1, 1])
+
+    # Already coarse enough, or not a full lattice
+    assert downsample_visualization(data, 8) is data
+    data["preds"] = data["preds"][:-1]
+    assert downsample_visualization(data, 2) is data
+
+    data = _sample_visualization(3)
+    res = downsample_visualization(data, 2)
+    assert [axis.size for axis in res["grid"]] == [8, 8, 8]
+    assert res["preds"].size == 8
+    assert res["actual"] is data["actual"]
+
+
+def _ball(dims: int, size: int = 12) -> dict[str, Any]:
+    """Build a lattice predicting 1 inside a ball and 0 outside."""
+    axes = np.meshgrid(*[np.linspace(-1, 1, size)] * dims)
+    inside = sum(axis**2 for axis in axes) < 0.5
+    return {
+        "radius": 0.5,
+        "grid": [axis.ravel() for axis in axes],
+        "preds": inside.ravel().astype(int),
+    }
+
+
+def test_extract_boundary() -> None:
+    """Test boundaries are closed, deduplicated and lie between the classes."""
+    for dims in [2, 3]:
+        res = extract_boundary(_ball(dims))
+        assert "grid" not in res and "preds" not in res
+        assert res["radius"] == 0.5
+        vertices = np.stack(res["boundary"]["vertices"], axis=1)
+        faces = np.stack(res["boundary"]["faces"], axis=1)
+        assert faces.shape[1] == dims
+        assert len(np.unique(vertices, axis=0)) == len(vertices)
+        assert np.array_equal(np.unique(faces), np.arange(len(vertices)))
+        # Between the inside (r^2 < 0.5) and outside points one step away
+        radii = np.sqrt((vertices**2).sum(axis=1))
+        assert np.all(np.abs(radii - np.sqrt(0.5)) < 2 / 11)
+        # A closed curve meets every vertex twice, a closed surface every edge
+        if dims == 2:
+            counts = Counter(faces.ravel().tolist())
+        else:
+            edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+            counts = Counter(map(tuple, edges.tolist()))
+        assert set(counts.values()) == {2}
+
+    data = _ball(2)
+    data["preds"] = np.zeros_like(data["preds"])
+    assert extract_boundary(data)["boundary"]["faces"][0].size == 0
+    data["preds"] = data["preds"][:-1]
+    with pytest.raises(ValueError):
+        extract_boundary(data)
+
+
+def test_round_significant() -> None:
+    """Test rounding keeps relative precision and prints the requested digits."""
+    values = np.array([0.000123456, -1.98765, 123456.7, 0.0, np.nan, np.inf])
+    rounded = app.round_significant(values, 3).tolist()
+    assert rounded[:4] == [0.000123, -1.99, 123000.0, 0.0]
+    assert np.isnan(rounded[4])
+    assert rounded[5] == np.inf
+    values = np.random.default_rng(0).normal(size=1000) * 10.0 ** np.arange(
+        -8, 12, 0.02
+    )
+    expected = [float(f"{value:.4g}") for value in values.tolist()]
+    assert app.round_significant(values, 4).tolist() == expected
+
+
+def test_get_visualization_digits(
+    monkeypatch: pytest.MonkeyPatch, fake_s3: Any
+) -> None:
+    """Test full precision by default and rounding only when requested."""
+    data = _sample_visualization(2)
+    artifacts = publish_visualization(data)
+    fake_s3(
+        app,
+        objects={f"models/latest/2D/{name}": body for name, body in artifacts.items()},
+    )
+    monkeypatch.setattr(app, "lod_cache", type(app.lod_cache)())
+    event = {"queryStringParameters": {"dims": "2D"}, "headers": {}}
+    full = get_visualization(event, None)
+    assert full["body"] == json.dumps(data, cls=NumpyEncoder)
+
+    event["queryStringParameters"]["digits"] = "2"
+    res = get_visualization(event, None)
+    assert json.loads(res["body"])["centroid"] == [
+        float(f"{value:.2g}") for value in data["centroid"]
+    ]
+
+    # Or for every request through the environment
+    monkeypatch.setattr(app, "VISUALIZATION_DIGITS", 2)
+    del event["queryStringParameters"]["digits"]
+    assert get_visualization(event, None)["body"] == res["body"]
+
+
+def test_get_visualization_resolution(
+    monkeypatch: pytest.MonkeyPatch, fake_s3: Any
+) -> None:
+    """Test resolution validation and one downsample per published model."""
+    data = _sample_visualization(2)
+    key = "models/latest/2D/visualization.npz"
+    s3 = fake_s3(app, objects={key: pack_visualization(data)})
+    calls = []
+
+    def downsample(data: dict[str, Any], resolution: int) -> dict[str, Any]:
+        calls.append(resolution)
+        return downsample_visualization(data, resolution)
+
+    monkeypatch.setattr(app, "downsample_visualization", downsample)
+    for params in [
+        {"resolution": "abc"},
+        {"resolution": "-4"},
+        {"resolution": "2"},
+        {"resolution": "1000"},
+        {"format": "mesh"},
+        {"digits": "0"},
+        {"digits": "18"},
+    ]:
+        res = get_visualization({"queryStringParameters": params, "headers": {}}, None)
+        assert res["statusCode"] == 400
+
+    event = {"queryStringParameters": {"resolution": "4"}, "headers": {}}
+    res = get_visualization(event, None)
+    assert res["statusCode"] == 200
+    assert json.loads(res["body"])["preds"] == data["preds"].tolist()
+    assert get_visualization(event, None)["body"] == res["body"]
+    assert calls == [4]
+
+    # A newly published model is downsampled again
+    data["preds"] = 1 - data["preds"]
+    s3.put_object(Bucket="", Key=key, Body=pack_visualization(data))
+    res = get_visualization(event, None)
+    assert json.loads(res["body"])["preds"] == data["preds"].tolist()
+    assert calls == [4, 4]
+
+    # Boundary bodies are cached alongside
+    event["queryStringParameters"]["format"] = "boundary"
+    res = get_visualization(event, None)
+    body = json.loads(res["body"])
+    assert {"actual", "centroid", "radius", "boundary"} == body.keys()
+    assert len(body["boundary"]["vertices"]) == 2
+    assert len(app.lod_cache) == 2
+    assert get_visualization(event, None)["body"] == res["body"]
+
+
+def _decode_binary(body: bytes) -> dict[str, Any]:
+    """Decode encode_binary output the way a browser client would."""
+    (length,) = struct.unpack_from("<I", body)
+    header = json.loads(body[4 : 4 + length])
+    assert header["format"] == 1
+    start = 4 + length
+    arrays = {}
+    for entry in header["arrays"]:
+        assert (start + entry["offset"]) % 4 == 0
+        count = int(np.prod(entry["shape"]))
+        array = np.frombuffer(
+            body,
+            np.dtype(entry["dtype"]).newbyteorder("<"),
+            count,
+            start + entry["offset"],
+        )
+        arrays[entry["path"]] = (entry["dtype"], array.reshape(entry["shape"]))
+    return arrays
+
+
+def test_encode_binary() -> None:
+    """Test typed arrays round-trip with aligned buffers and narrow dtypes."""
+    data = _sample_visualization(2)
+    arrays = _decode_binary(encode_binary(data))
+    assert list(arrays) == [
+        "actual/0/BUY",
+        "actual/0/SELL",
+        "actual/1/BUY",
+        "actual/1/SELL",
+        "centroid",
+        "radius",
+        "grid/0",
+        "grid/1",
+        "preds",
+    ]
+    dtype, grid = arrays["grid/1"]
+    assert dtype == "float32"
+    np.testing.assert_array_equal(grid, data["grid"][1].astype(np.float32))
+    assert arrays["radius"] == ("float32", np.float32(0.75))
+    dtype, preds = arrays["preds"]
+    assert dtype == "uint8"
+    np.testing.assert_array_equal(preds, data["preds"])
+
+    data = {
+        "faces": [np.arange(300)],
+        "offsets": np.array([-1, 2]),
+        "empty": np.array([]),
+    }
+    arrays = _decode_binary(encode_binary(data))
+    assert arrays["faces/0"][0] == "uint32"
+    assert arrays["offsets"][0] == "int32"
+    assert arrays["empty"][1].size == 0
+    with pytest.raises(ValueError):
+        encode_binary({"labels": np.array(["BUY"])})
+
+
+def test_get_visualization_binary(
+    monkeypatch: pytest.MonkeyPatch, fake_s3: Any
+) -> None:
+    """Test Accept selects base64 typed arrays, gzipped on request."""
+    data = _sample_visualization(3)
+    fake_s3(
+        app,
+        objects={
+            f"models/latest/3D/{name}": body
+            for name, body in publish_visualization(data).items()
+        },
+    )
+    monkeypatch.setattr(app, "lod_cache", type(app.lod_cache)())
+    headers = {
+        "Accept": "application/vnd.algotrade.visualization, application/json;q=0.5"
+    }
+    event = {"queryStringParameters": {"dims": "3D"}, "headers": headers}
+    res = get_visualization(event, None)
+    assert res["isBase64Encoded"]
+    assert res["headers"]["Content-Type"] == "application/vnd.algotrade.visualization"
+    assert "Content-Encoding" not in res["headers"]
+    body = base64.b64decode(res["body"])
+    assert body == encode_binary(data)
+
+    headers["Accept-Encoding"] = "gzip, deflate"
+    res = get_visualization(event, None)
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert gzip.decompress(base64.b64decode(res["body"])) == body
+
+    # Browsers sending */* keep getting JSON, compressed like any response
+    event["headers"] = {"Accept": "*/*", "Accept-Encoding": "gzip"}
+    res = get_visualization(event, None)
+    assert res["headers"]["Content-Type"] == "application/json"
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert res["headers"]["Vary"] == "Accept, Accept-Encoding"
+    assert json.loads(gzip.decompress(base64.b64decode(res["body"])))["radius"] == 0.75
+    event["headers"] = {"Accept": "*/*"}
+    assert json.loads(get_visualization(event, None)["body"])["radius"] == 0.75
+
+
+def _publish(data: dict[str, Any]) -> dict[str, bytes]:
+    """Publish a 2D model version the way the pipeline would."""
+    metadata = {"created": "2024-01-02", "start": "2020-01-01", "end": "2024-01-01"}
+    metadata |= {"features": ["a", "b"], "accuracy": 0.6}
+    files = {"metadata.json": json.dumps(metadata).encode()}
+    for name, body in publish_visualization(data).items():
+        files[f"2D/{name}"] = body
+    return publish_version(files)
+
+
+def test_publish_version() -> None:
+    """Test versions are content hashes and the active manifest comes last."""
+    data = _sample_visualization(2)
+    objects = _publish(data)
+    keys = list(objects)
+    assert keys[-1] == "models/latest/manifest.json"
+    manifest = json.loads(objects[keys[-1]])
+    version = manifest["version"]
+    assert len(version) == 16
+    assert manifest["files"] == [
+        "2D/visualization.json",
+        "2D/visualization.npz",
+        "metadata.json",
+    ]
+    assert all(key.startswith(f"models/versions/{version}/") for key in keys[:-1])
+    assert _publish(data) == objects
+    data["radius"] = 0.5
+    assert json.loads(_publish(data)[keys[-1]])["version"] != version
+
+
+def test_model_versions(fake_s3: Any) -> None:
+    """Test manifest resolution, caching headers, pinning and rollback."""
+    data = _sample_visualization(2)
+    v1_objects = _publish(data)
+    v1 = json.loads(v1_objects["models/latest/manifest.json"])["version"]
+    s3 = fake_s3(app, objects=dict(v1_objects))
+
+    def get(params: dict[str, str], headers: dict[str, str] | None = None) -> dict:
+        event = {"queryStringParameters": params, "headers": headers or {}}
+        return get_visualization(event, None)
+
+    res = get({"dims": "2D"})
+    assert (
+        res["body"]
+        == v1_objects[f"models/versions/{v1}/2D/visualization.json"].decode()
+    )
+    etag = res["headers"]["ETag"]
+    assert etag == f'"{v1}-2D-full-grid-json"'
+    assert res["headers"]["Cache-Control"] == "public, max-age=30"
+    assert s3.keys == [
+        "models/latest/manifest.json",
+        f"models/versions/{v1}/2D/visualization.json",
+    ]
+
+    # Revalidation within the manifest TTL touches nothing
+    s3.keys.clear()
+    res = get({"dims": "2D"}, {"If-None-Match": f'W/"other", {etag}'})
+    assert res["statusCode"] == 304
+    assert res["body"] == ""
+    assert s3.keys == []
+
+    # Derived bodies of a version are computed once
+    first = get({"dims": "2D", "resolution": "4"})
+    s3.keys.clear()
+    assert get({"dims": "2D", "resolution": "4"})["body"] == first["body"]
+    assert s3.keys == []
+
+    event = {"queryStringParameters": None, "headers": {}}
+    metadata = json.loads(app.get_model(event, None)["body"])
+    assert metadata["version"] == v1
+    assert metadata["num_features"] == 2
+
+    # A new version is picked up once the manifest expires
+    data["preds"] = 1 - data["preds"]
+    v2_objects = _publish(data)
+    for key, body in v2_objects.items():
+        s3.put_object(Bucket="", Key=key, Body=body)
+    v2 = json.loads(v2_objects["models/latest/manifest.json"])["version"]
+    assert get({"dims": "2D"})["headers"]["ETag"] == etag
+    app.manifest_cache["expires"] = 0.0
+    res = get({"dims": "2D"}, {"If-None-Match": etag})
+    assert res["statusCode"] == 200
+    assert res["headers"]["ETag"] == f'"{v2}-2D-full-grid-json"'
+
+    # Pinned versions stay available and never change
+    res = get({"dims": "2D", "version": v1})
+    assert res["headers"]["ETag"] == etag
+    assert res["headers"]["Cache-Control"] == "public, max-age=31536000, immutable"
+    for version in ["0" * 16, "../latest", "abc"]:
+        assert get({"version": version})["statusCode"] == 404
+
+    # Rolling back is rewriting the active manifest
+    manifest = "models/latest/manifest.json"
+    s3.put_object(Bucket="", Key=manifest, Body=v1_objects[manifest])
+    app.manifest_cache["expires"] = 0.0
+    assert get({"dims": "2D"})["headers"]["ETag"] == etag
+
+
+def test_encode_json() -> None:
+    """Test encode_json matches NumpyEncoder and applies digits and NaN policy."""
+    for dims in [2, 3]:
+        data = _sample_visualization(dims)
+        data["mixed"] = [np.float32(0.1), np.int64(2), np.bool_(True), "BUY", None]
+        assert encode_json(data) == json.dumps(data, cls=NumpyEncoder)
+        compact = json.dumps(data, cls=NumpyEncoder, separators=(",", ":"))
+        assert encode_json(data, compact=True) == compact
+
+    data = {"grid": np.array([[0.123456, -1987.65]]), "preds": np.array([0, 1])}
+    encoded = encode_json(data, digits=3, compact=True)
+    assert encoded == '{"grid":[[0.123,-1990.0]],"preds":[0,1]}'
+
+    # Non-finite values are the one difference from NumpyEncoder
+    data = {"grid": np.array([1.5, np.nan, np.inf]), "radius": float("-inf")}
+    numpy_encoded = json.dumps(data, cls=NumpyEncoder)
+    assert numpy_encoded == '{"grid": [1.5, NaN, Infinity], "radius": -Infinity}'
+    assert encode_json(data) == '{"grid": [1.5, null, null], "radius": null}'
+    with pytest.raises(ValueError):
+        encode_json(data, nonfinite="raise")
+    with pytest.raises(ValueError):
+        encode_json(data, nonfinite="NaN")
+
+
 encoder = NumpyEncoder()
 
 
@@ -1,10 +1,24 @@
 """Tests for notify Lambda handler."""
 
+import gzip
 import json
 from math import pow
+from time import perf_counter
+from typing import Any
 
-from notify.app import Processor, notify_email, post_notify
-from shared.python.models import UserModel, UTCDateTimeAttribute
+import history
+import pytest
+from backtest import backtest, downsample_preview, summarize, to_preview
+from botocore.exceptions import ClientError
+from notify import app
+from notify.app import (
+    EMIT_MAX_FAILURES_PER_IP,
+    Processor,
+    check_emit_secret,
+    notify_email,
+    post_notify,
+)
+from shared.python.models import ThrottleModel, UserModel, UTCDateTimeAttribute
 from shared.python.utils import transform_signal
 
 
@@ -39,9 +53,195 @@ def test_post_notify() -> None:
     assert res["statusCode"] == 200
 
 
+def test_post_notify_close(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a close is in the alerts' Perf and written to the preview after."""
+    calls = []
+    close = [100.0, 110.0]
+    signals = [True, False]
+    summary = summarize(
+        ["2024-01-01", "2024-01-02"], close, signals, backtest(close, signals)
+    )
+
+    class FakeProcessor:
+        def __init__(self, _: Any, signal: dict[str, Any]) -> None:
+            calls.append(("notify", signal["Perf"]))
+            self.total = 0
+
+        def run(self, _: Any) -> list[str]:
+            return []
+
+    def update_preview(*_: Any) -> dict[str, Any]:
+        calls.append(("update", None))
+        raise ClientError({"Error": {"Code": "SlowDown", "Message": ""}}, "PutObject")
+
+    monkeypatch.setattr(app, "check_emit_secret", lambda *_: None)
+    monkeypatch.setattr(app, "get_summary", lambda: summary)
+    monkeypatch.setattr(app, "Processor", FakeProcessor)
+    monkeypatch.setattr(app, "update_preview", update_preview)
+    body = {"Time": "2024-01-03", "Sig": "True", "Close": 121.0}
+    res = post_notify({"headers": {}, "body": json.dumps(body)}, None)
+    # A failed preview write does not fail delivery
+    assert res["statusCode"] == 200
+    # Bought back at 121 after selling at 110, paying the fee twice
+    perf = 110 / 121 * 0.999**2 - 1
+    assert calls == [("notify", pytest.approx(perf)), ("update", None)]
+
+
+def test_post_notify_summary(monkeypatch: pytest.MonkeyPatch, fake_s3: Any) -> None:
+    """Test a notify without a close rebuilds a missing summary only once."""
+    times = ["2024-01-01", "2024-01-02", "2024-01-03"]
+    close = [100.123, 110.456, 99.789]
+    signals = [True, False, True]
+    preview = to_preview(times, signals, backtest(close, signals))
+    s3 = fake_s3(app, history, objects={app.PREVIEW_KEY: json.dumps(preview).encode()})
+    perfs = []
+
+    class FakeProcessor:
+        def __init__(self, _: Any, signal: dict[str, Any]) -> None:
+            perfs.append(signal["Perf"])
+            self.total = 0
+
+        def run(self, _: Any) -> list[str]:
+            return []
+
+    monkeypatch.setattr(app, "check_emit_secret", lambda *_: None)
+    monkeypatch.setattr(app, "Processor", FakeProcessor)
+    event = {"headers": {}, "body": json.dumps({"Time": "2024-01-04", "Sig": "True"})}
+    assert post_notify(event, None)["statusCode"] == 200
+    # Perf is the balance the preview shows, not a re-simulation of its closes
+    assert perfs == [preview["BTC"]["data"][-1]["Bal"] - 1]
+    stored = s3.objects[app.SUMMARY_KEY]
+    version = s3.objects[app.PREVIEW_KEY]["ETag"].strip('"')
+    assert stored["Metadata"] == {"history-version": version}
+    assert json.loads(stored["Body"])["Stats"]["USD"] == preview["USD"]["stats"]
+
+    # Later notifies read only the stored summary
+    s3.keys.clear()
+    assert post_notify(event, None)["statusCode"] == 200
+    assert s3.keys == [app.SUMMARY_KEY]
+    assert perfs[1] == perfs[0]
+
+
+def test_post_notify_throttle(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test post_notify rejects a burst of bad secrets without blocking."""
+    source_ip = "203.0.113.7"
+    event = {
+        "headers": {"emit-secret": "wrong"},
+        "body": "{}",
+        "requestContext": {"identity": {"sourceIp": source_ip}},
+    }
+    statuses = []
+    for _ in range(EMIT_MAX_FAILURES_PER_IP * 2):
+        start = perf_counter()
+        statuses.append(post_notify(event, None)["statusCode"])
+        # Previously each bad attempt slept for 10 seconds
+        assert perf_counter() - start < 0.5
+    assert statuses[:EMIT_MAX_FAILURES_PER_IP] == [401] * EMIT_MAX_FAILURES_PER_IP
+    assert set(statuses[EMIT_MAX_FAILURES_PER_IP:]) == {429}
+
+    # Throttled sources are refused even with the correct secret
+    event["headers"]["emit-secret"] = "secret"
+    assert post_notify(event, None)["statusCode"] == 429
+
+    # Past the global limit, only the emitter's own IPs get through
+    monkeypatch.setattr(app, "EMIT_MAX_FAILURES", EMIT_MAX_FAILURES_PER_IP)
+    monkeypatch.setattr(app, "EMIT_SOURCE_IPS", {"198.51.100.1"})
+    identity = event["requestContext"]["identity"]
+    identity["sourceIp"] = "198.51.100.2"
+    assert check_emit_secret(event, "")["statusCode"] == 429
+    identity["sourceIp"] = "198.51.100.1"
+    assert check_emit_secret(event, "") is None
+
+    for key in [f"notify#{source_ip}", "notify#*"]:
+        ThrottleModel(key).delete()
+
+
 def test_notify_email() -> None:
     """Test notify_email sends signal alert via SES."""
     signal = transform_signal({"Time": "2020-01-01", "Sig": True})
     signal["Perf"] = 0.5
     user = UserModel.get("test_user@example.com")
     notify_email(user, signal)
+
+
+def test_update_preview(fake_s3: Any) -> None:
+    """Test an emitted close extends the gzip-stored preview and its summary."""
+    times = ["2024-01-01", "2024-01-02", "2024-01-03"]
+    close = [100.0, 110.0, 99.0]
+    signals = [True, False, False]
+    result = backtest(close, signals)
+    s3 = fake_s3(app, history)
+    s3.put_object(
+        Bucket="",
+        Key=app.PREVIEW_KEY,
+        Body=gzip.compress(json.dumps(to_preview(times, signals, result)).encode()),
+        ContentEncoding="gzip",
+    )
+
+    # A missing summary is rebuilt from the preview
+    assert app.get_summary()["Time"] == "2024-01-03"
+
+    version = s3.objects[app.PREVIEW_KEY]["ETag"].strip('"')
+    signal = transform_signal({"Time": "2024-01-04", "Sig": "True"})
+    summary = app.update_preview("2024-01-04", 120.0, signal)
+    close.append(120.0)
+    signals.append(True)
+    times.append("2024-01-04")
+    expected = to_preview(times, signals, backtest(close, signals))
+
+    stored = s3.objects[app.PREVIEW_KEY]
+    assert stored["ContentEncoding"] == "gzip"
+    preview = json.loads(gzip.decompress(stored["Body"]))
+    for denom in ["BTC", "USD"]:
+        assert preview[denom]["data"] == expected[denom]["data"]
+        for row, want in zip(
+            preview[denom]["stats"], expected[denom]["stats"], strict=True
+        ):
+            assert row == pytest.approx(want, abs=0.011)
+    assert json.loads(s3.objects[app.SUMMARY_KEY]["Body"]) == summary
+    assert summary["Stats"]["BTC"] == preview["BTC"]["stats"]
+    # Every artifact carries the version of the preview it extends
+    for key in [app.PREVIEW_KEY, app.SUMMARY_KEY, app.DAILY_KEY]:
+        assert s3.objects[key]["Metadata"] == {"history-version": version}
+    lines = s3.objects[app.DAILY_KEY]["Body"].splitlines()
+    assert [json.loads(line)["Time"] for line in lines] == times
+    assert json.loads(lines[-1])["USD"] == expected["USD"]["data"][-2:]
+    # Missing tiers are built from the updated preview
+    week_key = app.TIER_KEY.format(interval="week")
+    week = json.loads(s3.objects[week_key]["Body"])
+    assert week == json.loads(json.dumps(downsample_preview(preview, "week")))
+    assert summary["BTC"]["hyperdrive"]["Bal"] == pytest.approx(110 / 120 * 0.999**2)
+    assert app.get_summary() == summary
+
+    # Re-emitting the same close is a no-op
+    app.update_preview("2024-01-04", 120.0, signal)
+    preview = json.loads(gzip.decompress(s3.objects[app.PREVIEW_KEY]["Body"]))
+    assert len(preview["USD"]["data"]) == 8
+
+    # Existing tiers are extended in place: the 5th shares the 4th's week
+    signal = transform_signal({"Time": "2024-01-05", "Sig": "True"})
+    app.update_preview("2024-01-05", 90.0, signal)
+    preview = json.loads(gzip.decompress(s3.objects[app.PREVIEW_KEY]["Body"]))
+    week = json.loads(s3.objects[week_key]["Body"])
+    assert week == json.loads(json.dumps(downsample_preview(preview, "week")))
+    assert week["USD"]["data"][0] | {"Time": "2024-01-05", "Bal": 90.0} == {
+        "Name": "HODL",
+        "Time": "2024-01-05",
+        "Bal": 90.0,
+        "Min": 90.0,
+        "Max": 120.0,
+    }
+
+    # A preview rewritten offline gets a new version, so nothing stale is reused
+    s3.put_object(
+        Bucket="",
+        Key=app.PREVIEW_KEY,
+        Body=json.dumps(
+            to_preview(times[:2], signals[:2], backtest(close[:2], signals[:2]))
+        ).encode(),
+    )
+    signal = transform_signal({"Time": "2024-01-06", "Sig": "False"})
+    summary = app.update_preview("2024-01-06", 100.0, signal)
+    assert summary["BTC"]["HODL"]["Periods"] == 3
+    lines = s3.objects[app.DAILY_KEY]["Body"].splitlines()
+    assert [json.loads(line)["Time"] for line in lines] == [*times[:2], "2024-01-06"]
@@ -1,8 +1,21 @@
 """Tests for preview Lambda handler."""
 
+import base64
+import gzip
 import json
 import os
+from typing import Any
 
+import history
+import pytest
+from backtest import (
+    BACKTEST_FEE,
+    backtest,
+    daily_lines,
+    downsample_preview,
+    to_preview,
+)
+from preview import app
 from preview.app import get_preview
 
 DOMAIN = os.environ["DOMAIN"]
@@ -36,3 +49,140 @@ def test_get_preview() -> None:
     }.issubset({datum["metric"] for datum in data["USD"]["stats"]})
 
     assert res["headers"]["Access-Control-Allow-Origin"] == f"https://dev.{DOMAIN}"
+
+
+def test_get_preview_precompressed(fake_s3: Any) -> None:
+    """Test a gzip-stored preview is served without recompressing."""
+    preview = json.dumps({"BTC": {"data": [{"Bal": 1.0}] * 200}}).encode()
+    stored = gzip.compress(preview)
+    fake_s3(app, history).put_object(
+        Bucket="", Key=app.PREVIEW_KEY, Body=stored, ContentEncoding="gzip"
+    )
+    event = {"headers": {"Accept-Encoding": "gzip, deflate, br"}}
+    res = get_preview(event, None)
+    assert res["isBase64Encoded"]
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert base64.b64decode(res["body"]) == stored
+
+    res = get_preview({"headers": {}}, None)
+    assert res["body"] == preview.decode()
+
+
+def test_get_backtest(monkeypatch: pytest.MonkeyPatch, fake_s3: Any) -> None:
+    """Test the backtest endpoint combines signals.csv with prices."""
+    objects = {
+        app.SIGNALS_KEY: b"Time,Sig\n2024-01-01,True\n2024-01-02,False\n",
+        app.PRICES_KEY: b"Time,Close\n2024-01-01,100\n2024-01-02,110\n",
+    }
+    s3 = fake_s3(app, history, objects=objects)
+    builds = []
+
+    def build_preview(prices: str, signals: str) -> dict[str, Any]:
+        builds.append(prices)
+        return backtest_build(prices, signals)
+
+    backtest_build = app.build_preview
+    monkeypatch.setattr(app, "build_preview", build_preview)
+    monkeypatch.setattr(
+        app, "backtest_cache", {"sources": {}, "etags": None, "body": None}
+    )
+    res = app.get_backtest({"headers": {}}, None)
+    assert res["statusCode"] == 200
+    data = json.loads(res["body"])
+    assert data["USD"]["data"][-1] == {
+        "Name": "hyperdrive",
+        "Time": "2024-01-02",
+        "Bal": round(110 * (1 - BACKTEST_FEE), 2),
+        "Sig": False,
+        "Full_Sig": False,
+    }
+
+    # Unchanged inputs are neither downloaded nor backtested again
+    read = s3.read
+    assert app.get_backtest({"headers": {}}, None)["body"] == res["body"]
+    assert s3.read == read
+    assert len(builds) == 1
+
+    prices = b"Time,Close\n2023-01-01,100\n"
+    s3.put_object(Bucket="", Key=app.PRICES_KEY, Body=prices)
+    assert app.get_backtest({"headers": {}}, None)["statusCode"] == 404
+    assert s3.read == read + len(prices)
+
+
+def test_get_preview_window(fake_s3: Any) -> None:
+    """Test ?interval= and ?range= serve a window of a preview tier."""
+    times = [f"2024-{month:02d}-{day:02d}" for month in [1, 2] for day in [1, 10, 20]]
+    close = [100.0, 110.0, 99.0, 120.0, 130.0, 125.0]
+    signals = [True, False, True, True, False, True]
+    preview = to_preview(times, signals, backtest(close, signals))
+    s3 = fake_s3(app, history, objects={app.PREVIEW_KEY: json.dumps(preview).encode()})
+
+    def _get(params: dict[str, str]) -> dict[str, Any]:
+        res = get_preview({"headers": {}, "queryStringParameters": params}, None)
+        assert res["statusCode"] == 200
+        return json.loads(res["body"])
+
+    data = _get({"range": "15d"})["USD"]["data"]
+    assert [point["Time"] for point in data] == ["2024-02-10"] * 2 + ["2024-02-20"] * 2
+    assert _get({"range": "all"}) == preview
+
+    # Missing tiers are downsampled from the daily preview
+    month = _get({"interval": "month"})
+    assert month == downsample_preview(preview, "month")
+    assert [point["Max"] for point in month["USD"]["data"][::2]] == [110.0, 130.0]
+    month = _get({"interval": "month", "range": "1m"})
+    assert len(month["BTC"]["data"]) == 2
+    assert month["BTC"]["stats"] == preview["BTC"]["stats"]
+
+    week_key = app.TIER_KEY.format(interval="week")
+    s3.put_object(Bucket="", Key=week_key, Body=b'{"BTC": {"data": []}}')
+    assert _get({"interval": "week", "range": "1y"}) == {"BTC": {"data": []}}
+
+    for params in [{"interval": "hour"}, {"range": "0d"}, {"range": "3x"}]:
+        event = {"headers": {}, "queryStringParameters": params}
+        assert get_preview(event, None)["statusCode"] == 400
+
+
+def test_get_preview_since(fake_s3: Any) -> None:
+    """Test ?since= returns only later days, read from the daily lines."""
+    times = [f"2024-01-{day:02d}" for day in range(1, 21)]
+    close = [100.0 + day for day in range(20)]
+    signals = [day % 3 != 0 for day in range(20)]
+    preview = to_preview(times, signals, backtest(close, signals))
+    stats = {denom: side["stats"] for denom, side in preview.items()}
+    s3 = fake_s3(app, history)
+    for key, body in {
+        app.PREVIEW_KEY: json.dumps(preview).encode(),
+        app.SUMMARY_KEY: json.dumps({"Time": times[-1], "Stats": stats}).encode(),
+        app.DAILY_KEY: b"\n".join(daily_lines(preview)) + b"\n",
+    }.items():
+        s3.put_object(Bucket="", Key=key, Body=body, Metadata={"history-version": "v1"})
+    reads = s3.keys
+
+    def _since(since: str) -> dict[str, Any]:
+        reads.clear()
+        event = {"headers": {}, "queryStringParameters": {"since": since}}
+        res = get_preview(event, None)
+        assert res["statusCode"] == 200
+        return json.loads(res["body"])
+
+    delta = _since("2024-01-18")
+    assert delta["version"] == "v1"
+    assert delta["USD"]["data"] == preview["USD"]["data"][-4:]
+    assert delta["BTC"]["stats"] == preview["BTC"]["stats"]
+    assert app.PREVIEW_KEY not in reads
+    # Nothing new: only the summary is read
+    assert _since("2024-01-20")["BTC"]["data"] == []
+    assert reads == [app.SUMMARY_KEY]
+
+    # Stale or missing artifacts fall back to filtering the full preview
+    s3.objects[app.PREVIEW_KEY]["Metadata"] = {"history-version": "v2"}
+    delta = _since("2024-01-18")
+    assert delta["version"] == "v2"
+    assert delta["USD"]["data"] == preview["USD"]["data"][-4:]
+    assert app.PREVIEW_KEY in reads
+    del s3.objects[app.SUMMARY_KEY]
+    assert _since("2024-01-01")["BTC"]["data"] == preview["BTC"]["data"][2:]
+
+    event = {"headers": {}, "queryStringParameters": {"since": "yesterday"}}
+    assert get_preview(event, None)["statusCode"] == 400
@@ -0,0 +1,162 @@
+"""Tests for shared JWT authentication utilities."""
+
+import json
+from time import time
+from typing import Any
+
+import pytest
+import rsa
+from jose import jwk, jwt
+from shared.python import auth
+from shared.python.auth import JWKSCache, VerifiedTokenCache, verify_token
+
+WEB_CLIENT_ID = "test_web_client_id"
+
+
+def _create_key(kid: str) -> tuple[str, dict]:
+    """Create an RSA private key PEM and its public JWK."""
+    public, private = rsa.newkeys(1024)
+    public_jwk = jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict()
+    return private.save_pkcs1().decode(), public_jwk | {"kid": kid}
+
+
+PRIVATE_KEY, PUBLIC_JWK = _create_key("key_1")
+ROTATED_PRIVATE_KEY, ROTATED_PUBLIC_JWK = _create_key("key_2")
+
+
+def _create_token(
+    private_key: str = PRIVATE_KEY, kid: str = "key_1", **claims: object
+) -> str:
+    """Sign a token with default claims for the test audience."""
+    claims = {"email": "test_user@example.com", "aud": WEB_CLIENT_ID} | claims
+    claims.setdefault("exp", int(time()) + 3600)
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def _serve_jwks(local_server: Any, *keys: dict) -> None:
+    """Point the local server at a JWKS containing the given keys."""
+    local_server.payload = json.dumps({"keys": list(keys)}).encode()
+
+
+class TestJWKSCache:
+    """Tests for JWKSCache."""
+
+    def test_lazy_fetch(self, local_server: Any) -> None:
+        """Test keys are fetched on first use and then served from memory."""
+        _serve_jwks(local_server, PUBLIC_JWK)
+        cache = JWKSCache(local_server.url)
+        assert local_server.requests == 0
+        assert cache.get("key_1") is not None
+        assert cache.get("key_1") is cache.get("key_1")
+        assert local_server.requests == 1
+
+    def test_unknown_kid_refetch(self, local_server: Any) -> None:
+        """Test an unknown kid triggers a single rate-limited refetch."""
+        _serve_jwks(local_server, PUBLIC_JWK)
+        cache = JWKSCache(local_server.url)
+        cache.get("key_1")
+        _serve_jwks(local_server, PUBLIC_JWK, ROTATED_PUBLIC_JWK)
+        # Within the refetch interval unknown kids are rejected from cache
+        assert cache.get("key_2") is None
+        assert local_server.requests == 1
+
+        cache.min_refetch = 0
+        assert cache.get("key_2") is not None
+        assert cache.get("key_2") is not None
+        assert local_server.requests == 2
+
+    def test_ttl_refresh(self, local_server: Any) -> None:
+        """Test expired keys are refreshed and kept if the refresh fails."""
+        _serve_jwks(local_server, PUBLIC_JWK)
+        cache = JWKSCache(local_server.url, ttl=0)
+        cache.get("key_1")
+        cache.get("key_1")
+        assert local_server.requests == 2
+
+        local_server.status = 500
+        assert cache.get("key_1") is not None
+        assert cache.fetches == 2
+
+    def test_first_fetch_failure(self, local_server: Any) -> None:
+        """Test an unreachable JWKS fails lookups and backs off before retrying."""
+        local_server.status = 500
+        cache = JWKSCache(local_server.url)
+        assert cache.get("key_1") is None
+        assert cache.get("key_1") is None
+        assert local_server.requests == 1
+
+        local_server.status = 200
+        _serve_jwks(local_server, PUBLIC_JWK)
+        cache.min_refetch = 0
+        assert cache.get("key_1") is not None
+        assert local_server.requests == 2
+
+
+class TestVerifiedTokenCache:
+    """Tests for VerifiedTokenCache."""
+
+    def test_expiry(self) -> None:
+        """Test expired claims are evicted on lookup."""
+        cache = VerifiedTokenCache()
+        cache.put("live", {"exp": time() + 60})
+        cache.put("expired", {"exp": time() - 1})
+        assert cache.get("live")
+        assert cache.get("expired") is None
+        assert "expired" not in cache.claims
+
+    def test_capacity(self) -> None:
+        """Test expired then least recently used entries are evicted."""
+        cache = VerifiedTokenCache(capacity=2)
+        cache.put("a", {"exp": time() + 60})
+        cache.put("b", {"exp": time() - 1})
+        cache.put("c", {"exp": time() + 60})
+        assert list(cache.claims) == ["a", "c"]
+        cache.get("a")
+        cache.put("d", {"exp": time() + 60})
+        assert list(cache.claims) == ["a", "d"]
+
+
+def test_verify_token(local_server: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test verify_token checks signature, expiry and audience."""
+    _serve_jwks(local_server, PUBLIC_JWK)
+    monkeypatch.setattr(auth, "jwks", JWKSCache(local_server.url))
+    monkeypatch.setattr(auth, "verified_tokens", VerifiedTokenCache())
+    monkeypatch.setenv("WEB_CLIENT_ID", WEB_CLIENT_ID)
+
+    def _event(token: str) -> dict:
+        return {"body": json.dumps({"token": token})}
+
+    claims = verify_token(_event(_create_token()))
+    assert claims and claims["email"] == "test_user@example.com"
+    assert not verify_token(_event(_create_token(exp=int(time()) - 1)))
+    assert not verify_token(_event(_create_token(aud="other_client_id")))
+    assert not verify_token(_event(_create_token(ROTATED_PRIVATE_KEY, "key_2")))
+    # Signed with a different key than the kid advertises
+    assert not verify_token(_event(_create_token(ROTATED_PRIVATE_KEY)))
+
+    # A JWKS outage on first use is an auth failure, not an exception
+    local_server.status = 500
+    monkeypatch.setattr(auth, "jwks", JWKSCache(local_server.url))
+    monkeypatch.setattr(auth, "verified_tokens", VerifiedTokenCache())
+    assert verify_token(_event(_create_token())) is None
+
+
+def test_verify_token_cached(
+    local_server: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test repeated tokens skip signature checks but keep audience checks."""
+    _serve_jwks(local_server, PUBLIC_JWK)
+    monkeypatch.setattr(auth, "jwks", JWKSCache(local_server.url))
+    monkeypatch.setattr(auth, "verified_tokens", VerifiedTokenCache())
+    monkeypatch.setenv("WEB_CLIENT_ID", WEB_CLIENT_ID)
+    event = {"body": json.dumps({"token": _create_token()})}
+    assert verify_token(event)
+
+    # Signing keys are no longer reachable, only the cache can verify
+    monkeypatch.setattr(auth, "jwks", JWKSCache(local_server.url))
+    local_server.status = 500
+    assert verify_token(event)
+    assert local_server.requests == 1
+
+    monkeypatch.setenv("WEB_CLIENT_ID", "other_client_id")
+    assert not verify_token(event)
@@ -0,0 +1,37 @@
+"""Tests for the shared AWS client registry."""
+
+import multiprocessing
+from multiprocessing.connection import Connection
+
+from shared.python import aws
+
+
+def _count_clients(conn: Connection) -> None:
+    """Send the number of clients a forked child inherits."""
+    conn.send(len(aws.clients))
+
+
+def test_get_client() -> None:
+    """Test clients are created once per service, region and endpoint."""
+    s3 = aws.get_client("s3")
+    assert aws.get_client("s3") is s3
+    assert aws.get_client("s3", region_name="us-west-2") is not s3
+    assert s3.meta.config.max_pool_connections == aws.AWS_MAX_POOL_CONNECTIONS
+    assert s3.meta.config.retries["mode"] == "standard"
+
+    endpoint = "https://example.execute-api.us-east-1.amazonaws.com"
+    ws = aws.get_client("apigatewaymanagementapi", endpoint_url=endpoint)
+    assert ws.meta.endpoint_url == endpoint
+
+
+def test_get_client_fork() -> None:
+    """Test forked children start without the parent's clients."""
+    aws.get_client("s3")
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.get_context("fork").Process(
+        target=_count_clients, args=(child_conn,)
+    )
+    process.start()
+    assert parent_conn.recv() == 0
+    process.join()
+    assert aws.clients
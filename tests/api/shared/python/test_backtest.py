@@ -0,0 +1,187 @@
+"""Tests for the vectorized backtest engine."""
+
+import numpy as np
+import pytest
+from shared.python import backtest
+
+FEE = 0.01
+
+
+def _loop_backtest(close: list[float], signals: list[bool]) -> tuple[list, float]:
+    """Backtest one strategy a trade at a time, as a reference."""
+    btc, usd, held, fees = 1.0, 0.0, True, 0.0
+    balances = []
+    for price, sig in zip(close, signals, strict=True):
+        if sig and not held:
+            fees += usd * FEE
+            btc, usd = usd * (1 - FEE) / price, 0.0
+        elif held and not sig:
+            fees += btc * price * FEE
+            btc, usd = 0.0, btc * price * (1 - FEE)
+        held = sig
+        balances.append(btc * price + usd)
+    return balances, fees
+
+
+def test_simulate() -> None:
+    """Test balances and fees match a trade-by-trade simulation."""
+    rng = np.random.default_rng(0)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.03, 200))
+    signals = rng.random(200) < 0.6
+    result = backtest.simulate(close, np.stack([np.ones(200), signals]), FEE)
+
+    balances, fees = _loop_backtest(close.tolist(), signals.tolist())
+    np.testing.assert_allclose(result["USD"]["balances"][1], balances)
+    np.testing.assert_allclose(result["USD"]["fees"], [0, fees])
+    np.testing.assert_allclose(result["USD"]["balances"][0], close)
+    np.testing.assert_allclose(result["BTC"]["balances"][0], 1)
+    np.testing.assert_allclose(result["BTC"]["balances"][1], balances / close)
+    assert result["traded"][1].tolist() == (signals != [True, *signals[:-1]]).tolist()
+
+
+def test_backtest_stats() -> None:
+    """Test stats on a hand-checked series."""
+    close = [100, 110, 99, 99, 120, 132]
+    # Sell at 110, buy back at 99, hold to the end
+    signals = [True, False, False, True, True, True]
+    result = backtest.backtest(close, signals, fee=0)
+
+    usd = result["USD"]["stats"]
+    assert usd["Total Return [%]"][0] == pytest.approx(32)
+    assert usd["Total Return [%]"][1] == pytest.approx(1.32 * 110 / 99 * 100 - 100)
+    assert usd["Max Drawdown [%]"] == pytest.approx([10, 0])
+    # HODL never closes a trade, so trade stats are undefined
+    assert np.isnan(usd["Win Rate [%]"][0])
+    assert np.isnan(usd["Profit Factor"][0])
+    # The first trade (held from the start, sold at 110) is the only closed one
+    assert usd["Win Rate [%]"][1] == 100
+
+    btc = result["BTC"]["stats"]
+    assert btc["Total Return [%]"][0] == 0
+    assert btc["Total Return [%]"][1] == pytest.approx(110 / 99 * 100 - 100)
+    # Holding USD from 110 to 99 gained BTC
+    assert btc["Win Rate [%]"][1] == 100
+    assert btc["Profitable Time [%]"] == pytest.approx([0, 200 / 3])
+    assert btc["Total Fees Paid"] == pytest.approx([0, 0])
+
+    result = backtest.backtest(close, signals, fee=0.5)
+    btc = result["BTC"]["stats"]
+    assert btc["Total Fees Paid"][1] == pytest.approx(0.5 + 0.25 * 110 / 99)
+    # Fees turn the USD round trip into a loss
+    assert btc["Win Rate [%]"][1] == 0
+    assert btc["Profit Factor"][1] == 0
+
+
+def test_build_preview() -> None:
+    """Test signals.csv and prices build the preview.json schema."""
+    prices = (
+        "Time,Close\n2024-01-01,100\n2024-01-02,110\n2024-01-03,99\n2024-01-04,120\n"
+    )
+    signals = "Time,Sig\n2024-01-02,False\n2024-01-03,True\n2024-01-04,True\n2024-01-05,False\n"
+    preview = backtest.build_preview(prices, signals, fee=0)
+
+    assert set(preview) == {"BTC", "USD"}
+    data = preview["BTC"]["data"]
+    assert [point["Time"] for point in data[::2]] == [
+        "2024-01-02",
+        "2024-01-03",
+        "2024-01-04",
+    ]
+    assert {point["Name"] for point in data[::2]} == {"HODL"}
+    hyperdrive = data[1::2]
+    assert [point["Sig"] for point in hyperdrive] == [False, True, None]
+    assert [point["Full_Sig"] for point in hyperdrive] == [False, True, True]
+    assert [point["Bal"] for point in hyperdrive] == pytest.approx(
+        [1, 110 / 99, 110 / 99], abs=1e-6
+    )
+    assert [point["Bal"] for point in preview["USD"]["data"][::2]] == [110, 99, 120]
+
+    for denom, metrics in backtest.METRICS.items():
+        stats = preview[denom]["stats"]
+        assert [row["metric"] for row in stats] == metrics
+        assert all(set(row) == {"metric", "HODL", "hyperdrive"} for row in stats)
+    # Undefined metrics serialize as null
+    assert preview["USD"]["stats"][2]["HODL"] is None
+
+    with pytest.raises(ValueError):
+        backtest.build_preview("Time,Close\n2020-01-01,1\n", signals)
+
+
+def test_advance() -> None:
+    """Test extending a summary matches a backtest over the longer history."""
+    rng = np.random.default_rng(1)
+    close = (100 * np.cumprod(1 + rng.normal(0, 0.03, 300))).round(2)
+    signals = rng.random(300) < 0.6
+    times = [f"2024-{idx:04d}" for idx in range(300)]
+    full = backtest.to_preview(times, signals, backtest.backtest(close, signals, FEE))
+
+    head = 250
+    result = backtest.backtest(close[:head], signals[:head], FEE)
+    summary = backtest.summarize(
+        times[:head], close[:head], signals[:head], result, FEE
+    )
+    points = {"BTC": [], "USD": []}
+    for idx in range(head, 300):
+        new = backtest.advance(summary, times[idx], close[idx], signals[idx])
+        for denom in points:
+            points[denom] += new[denom]
+
+    stats = backtest.summary_stats(summary)
+    for denom in points:
+        expected = full[denom]["data"][2 * head :]
+        assert [point["Time"] for point in points[denom]] == [
+            point["Time"] for point in expected
+        ]
+        assert [point.get("Sig") for point in points[denom]] == [
+            point.get("Sig") for point in expected
+        ]
+        assert [point["Bal"] for point in points[denom]] == pytest.approx(
+            [point["Bal"] for point in expected], abs=1e-6
+        )
+        for row, want in zip(stats[denom], full[denom]["stats"], strict=True):
+            assert row == pytest.approx(want, abs=0.011)
+
+
+def test_from_preview() -> None:
+    """Test a preview yields back the closes and signals it was built from."""
+    close = [100.0, 110.0, 99.0]
+    signals = [True, False, True]
+    times = ["2024-01-01", "2024-01-02", "2024-01-03"]
+    preview = backtest.to_preview(times, signals, backtest.backtest(close, signals))
+    assert backtest.from_preview(preview) == (times, close, signals)
+
+
+def test_downsample_preview() -> None:
+    """Test tiers keep each bucket's last, lowest and highest balance."""
+    times = [f"2024-01-{day:02d}" for day in range(1, 32)]
+    times += [f"2024-02-{day:02d}" for day in range(1, 11)]
+    rng = np.random.default_rng(2)
+    close = (100 * np.cumprod(1 + rng.normal(0, 0.03, len(times)))).round(2)
+    signals = rng.random(len(times)) < 0.6
+    preview = backtest.to_preview(times, signals, backtest.backtest(close, signals))
+
+    month = backtest.downsample_preview(preview, "month")
+    data = month["USD"]["data"]
+    assert [(point["Name"], point["Time"]) for point in data] == [
+        ("HODL", "2024-01-31"),
+        ("hyperdrive", "2024-01-31"),
+        ("HODL", "2024-02-10"),
+        ("hyperdrive", "2024-02-10"),
+    ]
+    assert data[0]["Bal"] == close[30]
+    assert data[0]["Min"] == close[:31].min()
+    assert data[2]["Max"] == close[31:].max()
+    assert data[3]["Full_Sig"] == signals[-1]
+    assert month["USD"]["stats"] == preview["USD"]["stats"]
+
+    # 2024-01-01 is a Monday, so weeks are whole from the start
+    week = backtest.downsample_preview(preview, "week")
+    assert len(week["BTC"]["data"]) == 2 * 6
+    assert week["BTC"]["data"][1]["Time"] == "2024-01-07"
+
+    # Folding days in one at a time gives the same tier
+    for interval in backtest.INTERVALS:
+        data = []
+        for idx in range(0, len(preview["BTC"]["data"]), 2):
+            backtest.extend_tier(data, preview["BTC"]["data"][idx : idx + 2], interval)
+        assert data == backtest.downsample_preview(preview, interval)["BTC"]["data"]
@@ -0,0 +1,10 @@
+"""Tests for the shared Stripe client."""
+
+from shared.python.billing import get_stripe_client
+
+
+def test_get_stripe_client() -> None:
+    """Test the client is created once and reused."""
+    get_stripe_client.cache_clear()
+    client = get_stripe_client()
+    assert get_stripe_client() is client
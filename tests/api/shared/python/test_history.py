@@ -0,0 +1,81 @@
+"""Tests for reading date-ordered S3 objects."""
+
+import gzip
+import json
+from datetime import date, timedelta
+from typing import Any
+
+import pytest
+from shared.python import history
+
+
+def _signals(days: int, start: date = date(2000, 1, 1)) -> tuple[list[str], bytes]:
+    """Build signals.csv rows and the object holding them."""
+    rows = [f"{start + timedelta(days=idx)},{idx % 2 == 0}" for idx in range(days)]
+    return rows, ("Time,Sig\n" + "\n".join(rows) + "\n").encode()
+
+
+def _rewrite_after(s3: Any, reads: int, body: bytes) -> None:
+    """Rewrite the object read from a fake S3 once it has served `reads` GETs."""
+    get_object = s3.get_object
+
+    def get(**kwargs: Any) -> dict[str, Any]:
+        if len(s3.keys) == reads:
+            s3.put_object(Bucket=kwargs["Bucket"], Key=kwargs["Key"], Body=body)
+        return get_object(**kwargs)
+
+    s3.get_object = get
+
+
+def test_read_since(monkeypatch: pytest.MonkeyPatch, fake_s3: Any) -> None:
+    """Test only the tail after a date is read from a date-ordered object."""
+    rows, body = _signals(9000)
+    s3 = fake_s3(objects={"key": body})
+    monkeypatch.setattr(history, "TAIL_READ_BYTES", 64)
+
+    header, lines, obj = history.read_since(s3, "bucket", "key", rows[-4][:10], True)
+    assert header == b"Time,Sig"
+    assert lines == [row.encode() for row in rows[-3:]]
+    assert s3.read <= 64 + 64 * 4 + 64
+    assert history.history_version(obj) == s3.objects["key"]["ETag"].strip('"')
+
+    # Widening the range reaches further back, up to the whole object
+    s3.read = 0
+    _, lines, _ = history.read_since(s3, "bucket", "key", rows[-500][:10])
+    assert len(lines) == 499
+    assert s3.read < 64 * 4**5
+    _, lines, _ = history.read_since(s3, "bucket", "key", "1999-12-31")
+    assert len(lines) == 9000
+    _, lines, _ = history.read_since(s3, "bucket", "key", rows[-1][:10])
+    assert lines == []
+
+    s3.objects["key"]["Metadata"] = {"history-version": "v1"}
+    obj = s3.get_object(Bucket="bucket", Key="key", Range="bytes=-1")
+    assert history.history_version(obj) == "v1"
+
+
+def test_read_since_rewritten(monkeypatch: pytest.MonkeyPatch, fake_s3: Any) -> None:
+    """Test an object rewritten between ranged reads is read whole instead."""
+    rows, body = _signals(9000)
+    new_rows, new_body = _signals(100, date(2030, 1, 1))
+    monkeypatch.setattr(history, "TAIL_READ_BYTES", 64)
+    # Rewritten while widening the range, or before the header is read
+    for since, reads in [(rows[-500][:10], 2), (rows[-4][:10], 1)]:
+        s3 = fake_s3(objects={"key": body})
+        _rewrite_after(s3, reads, new_body)
+        header, lines, obj = history.read_since(s3, "bucket", "key", since, True)
+        assert header == b"Time,Sig"
+        assert lines == [row.encode() for row in new_rows]
+        assert obj["ETag"] == s3.objects["key"]["ETag"]
+
+
+def test_read_json(fake_s3: Any) -> None:
+    """Test JSON is decompressed and returned with its coding and version."""
+    fake_s3(history).put_object(
+        Bucket="",
+        Key="key",
+        Body=gzip.compress(json.dumps({"a": 1}).encode()),
+        ContentEncoding="gzip",
+        Metadata={"history-version": "v1"},
+    )
+    assert history.read_json("key") == ({"a": 1}, "gzip", "v1")
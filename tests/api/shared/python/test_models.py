@@ -2,6 +2,7 @@
 
 from datetime import datetime
 
+import pytest
 from pynamodb.attributes import UTCDateTimeAttribute
 from shared.python.models import (
     Alerts,
@@ -15,6 +16,8 @@ from shared.python.models import (
     UserModel,
     get_api_key,
     get_default_access_queue,
+    get_new_user_actions,
+    get_or_create_user,
     query_by_api_key,
 )
 from shared.python.utils import PAST_DATE
@@ -31,8 +34,97 @@ def test_get_api_key() -> None:
 
 
 def test_get_default_access_queue() -> None:
-    """Test get_default_access_queue returns list of past dates."""
-    assert get_default_access_queue() == [PAST_DATE] * 5
+    """Test get_default_access_queue returns list of past timestamps."""
+    assert get_default_access_queue() == [int(PAST_DATE.timestamp())] * 5
+
+
+def test_get_or_create_user() -> None:
+    """Test get_or_create_user creates once and never overwrites."""
+    email = "get_or_create_user@example.com"
+    created = get_or_create_user(email)
+    assert len(created.api_key) == 86
+    _verify_alerts(created.alerts)
+    # A concurrent first login must not replace the winner's values
+    user = UserModel(email, _user_instantiated=False)
+    user.update(actions=get_new_user_actions())
+    assert user.api_key == created.api_key
+    assert get_or_create_user(email, ["api_key"]).api_key == created.api_key
+    user.delete()
+
+
+def test_projected_indexes() -> None:
+    """Test index reads hydrate only projected attributes without defaults."""
+    email = "projected_indexes@example.com"
+    UserModel(
+        email,
+        api_key="projected_api_key",
+        alerts=Alerts(webhook="https://example.com/hook"),
+        in_beta=1,
+        subscribed=1,
+        customer_id="cus_projected",
+    ).save()
+    # Legacy item without the defaulted attributes
+    legacy_email = "projected_legacy@example.com"
+    UserModel(legacy_email, api_key="legacy_api_key").save()
+    UserModel(legacy_email, _user_instantiated=False).update(
+        actions=[UserModel.access_queue.remove(), UserModel.alerts.remove()]
+    )
+
+    user = query_by_api_key("projected_api_key")[0]
+    assert (user.email, user.in_beta, user.subscribed) == (email, 1, 1)
+    assert user.access_queue == get_default_access_queue()
+    assert user.alerts is None
+    assert user.stripe is None
+    legacy = query_by_api_key("legacy_api_key")[0]
+    assert legacy.access_queue == get_default_access_queue()
+
+    user = list(UserModel.customer_id_index.query("cus_projected"))[0]
+    assert (user.email, user.subscribed) == (email, 1)
+    assert user.api_key is None
+    assert user.stripe is None
+
+    cond = UserModel.alerts["webhook"] == "https://example.com/hook"
+    for index in [UserModel.in_beta_index, UserModel.subscribed_index]:
+        users = list(index.query(1, filter_condition=cond))
+        assert [user.email for user in users] == [email]
+        assert users[0].api_key == "projected_api_key"
+        assert users[0].alerts.webhook == "https://example.com/hook"
+        assert users[0].access_queue is None
+
+    # Query arguments pass through, and unprojected reads are refused
+    users = UserModel.customer_id_index.query(
+        "cus_projected", attributes_to_get=["email"], limit=1
+    )
+    user = list(users)[0]
+    assert (user.email, user.subscribed) == (email, None)
+    with pytest.raises(ValueError):
+        list(
+            UserModel.customer_id_index.query(
+                "cus_projected", attributes_to_get=["stripe"]
+            )
+        )
+
+    for key in [email, legacy_email]:
+        UserModel(key, _user_instantiated=False).delete()
+
+
+def test_access_queue_migration() -> None:
+    """Test legacy datetime access queues are read as epoch timestamps."""
+    email = "access_queue_migration@example.com"
+    legacy = [UTCDateTimeAttribute().serialize(PAST_DATE)] * 5
+    connection = UserModel._get_connection()
+    connection.put_item(
+        email,
+        attributes={
+            "access_queue": {"L": [{"S": value} for value in legacy]},
+        },
+    )
+    user = UserModel.get(email)
+    assert user.access_queue == get_default_access_queue()
+    user.update(actions=[UserModel.access_queue.set(user.access_queue)])
+    raw = connection.get_item(email)["Item"]["access_queue"]
+    assert raw["L"][0] == {"N": str(int(PAST_DATE.timestamp()))}
+    user.delete()
 
 
 def _verify_alerts(alerts: Alerts) -> None:
@@ -162,7 +254,7 @@ class TestUserModel:
         assert isinstance(user.stripe, Stripe)
         _verify_stripe(user.stripe)
         assert isinstance(user.access_queue, list)
-        assert user.access_queue == [PAST_DATE] * 5
+        assert user.access_queue == [int(PAST_DATE.timestamp())] * 5
         assert isinstance(user.api_key_index, APIKeyIndex)
         assert isinstance(user.customer_id_index, CustomerIdIndex)
         assert isinstance(user.in_beta_index, InBetaIndex)
@@ -1,15 +1,30 @@
 """Tests for shared utility functions."""
 
+import base64
+import gzip
+import json
 import os
+import sys
+import zlib
 from datetime import datetime, timedelta
+from types import ModuleType
 
+import pytest
+from shared.python import utils
 from shared.python.utils import (
+    RawJSON,
+    accepts,
+    decode,
     enough_time_has_passed,
     error,
+    get_body,
     get_email,
     get_origin,
+    get_source_ip,
+    lazy_import,
     normalize_headers,
     options,
+    success,
     transform_signal,
     verify_user,
 )
@@ -36,6 +51,18 @@ def test_normalize_headers() -> None:
     assert normalize_headers(event) == {}
 
 
+def test_accepts() -> None:
+    """Test accepts matches listed values and honours q=0 but not wildcards."""
+    header = "text/html, application/vnd.test;q=0.5, */*;q=0.8"
+    assert accepts(header, "application/vnd.test")
+    assert accepts("gzip, deflate, br", "gzip")
+    assert accepts("GZIP", "gzip")
+    assert not accepts("*/*", "application/vnd.test")
+    assert not accepts("gzip;q=0, br", "gzip")
+    assert not accepts("gzip;q=abc", "gzip")
+    assert not accepts("", "gzip")
+
+
 def test_get_origin() -> None:
     """Test get_origin returns allowed origins or falls back to production."""
     # Allowed origins should pass through
@@ -68,6 +95,30 @@ def test_get_origin() -> None:
     assert get_origin(event) == "http://localhost:8000"
 
 
+def test_get_source_ip() -> None:
+    """Test get_source_ip reads the request identity or falls back."""
+    event = {"requestContext": {"identity": {"sourceIp": "203.0.113.7"}}}
+    assert get_source_ip(event) == "203.0.113.7"
+
+    # Missing identity should fall back
+    assert get_source_ip({"requestContext": {}}) == "unknown"
+    assert get_source_ip({}) == "unknown"
+
+
+def test_lazy_import() -> None:
+    """Test lazy_import defers loading until first attribute access."""
+    sys.modules.pop("colorsys", None)
+    colorsys = lazy_import("colorsys")
+    assert type(colorsys) is not ModuleType
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert type(colorsys) is ModuleType
+
+    # Imported modules are returned as they are
+    assert lazy_import("json") is json
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("not_a_real_module")
+
+
 def test_get_email() -> None:
     """Test get_email formats email address based on stage."""
     assert get_email("test", "dev") == f"test@dev.{os.environ['DOMAIN']}"
@@ -114,6 +165,92 @@ def test_error() -> None:
     assert err["headers"]["Access-Control-Allow-Origin"] == f"https://dev.{DOMAIN}"
 
 
+def test_get_body() -> None:
+    """Test get_body decodes base64 bodies from binary media types."""
+    assert get_body({"body": '{"a": 1}'}) == '{"a": 1}'
+    encoded = base64.b64encode(b'{"a": 1}').decode()
+    assert get_body({"body": encoded, "isBase64Encoded": True}) == '{"a": 1}'
+    assert get_body({"body": None}) == ""
+
+
+def test_success_compression(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test success negotiates Accept-Encoding and skips small bodies."""
+    body = {"data": [{"Bal": 1.5, "Time": "2024-01-01"}] * 100}
+    raw = json.dumps(body)
+    gzip_event = {"headers": {"Accept-Encoding": "gzip, deflate"}}
+
+    res = success(body, event=gzip_event)
+    assert res["isBase64Encoded"]
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert res["headers"]["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(base64.b64decode(res["body"])).decode() == raw
+
+    for event in [{"headers": {}}, {"headers": {"accept-encoding": "gzip;q=0"}}]:
+        res = success(body, event=event)
+        assert res["body"] == raw
+        assert "isBase64Encoded" not in res
+        assert res["headers"]["Vary"] == "Accept-Encoding"
+    assert "Vary" not in success(body)["headers"]
+
+    # Small bodies are not worth compressing
+    res = success({"message": "OK"}, event=gzip_event)
+    assert res["body"] == '{"message": "OK"}'
+    assert "Content-Encoding" not in res["headers"]
+
+    # br is preferred when the brotli module is installed
+    codings = {"br": (zlib.compress, zlib.decompress)} | utils.CODINGS
+    monkeypatch.setattr(utils, "CODINGS", codings)
+    res = success(body, event={"headers": {"Accept-Encoding": "gzip, br"}})
+    assert res["headers"]["Content-Encoding"] == "br"
+    assert zlib.decompress(base64.b64decode(res["body"])).decode() == raw
+    assert success(body, event=gzip_event)["headers"]["Content-Encoding"] == "gzip"
+
+    # Pre-compressed bodies pass through or are decompressed for the client
+    stored = gzip.compress(raw.encode())
+    res = success(RawJSON(stored, "gzip"), event=gzip_event)
+    assert base64.b64decode(res["body"]) == stored
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert res["headers"]["Vary"] == "Accept-Encoding"
+    for event in [{"headers": {}}, {"headers": {"Accept-Encoding": "gzip;q=0"}}]:
+        res = success(RawJSON(stored, "gzip"), event=event)
+        assert res["body"] == raw
+        assert "Content-Encoding" not in res["headers"]
+
+    # Small raw bodies are sent as text too
+    res = success(RawJSON(b'{"message": "OK"}'), event=gzip_event)
+    assert res["body"] == '{"message": "OK"}'
+    assert "isBase64Encoded" not in res
+
+
+def test_success_raw_json() -> None:
+    """Test RawJSON is sent as-is while other strings keep the old behaviour."""
+    res = success(RawJSON(b'{"a": 1}'), origin=f"https://dev.{DOMAIN}")
+    assert res["body"] == '{"a": 1}'
+    assert res["headers"]["Access-Control-Allow-Origin"] == f"https://dev.{DOMAIN}"
+    # Trusted, so not even checked
+    assert success(RawJSON("not json"))["body"] == "not json"
+    res = success(RawJSON(b'{"a": 1}'), event={"headers": {"Accept-Encoding": "gzip"}})
+    assert res["body"] == '{"a": 1}'
+    assert res["headers"]["Vary"] == "Accept-Encoding"
+
+    assert success('{"a": 1}')["body"] == '{"a": 1}'
+    assert success("OK")["body"] == '"OK"'
+    assert success({"a": 1})["body"] == '{"a": 1}'
+
+
+def test_stored_encoding() -> None:
+    """Test bodies stored with an unsupported coding fail instead of leaking."""
+    raw = b'{"a": 1}'
+    assert decode(gzip.compress(raw), "gzip") == raw
+    assert decode(raw, None) == decode(raw, "identity") == raw
+    assert RawJSON(raw, "identity").encoding is None
+    # e.g. br when the brotli module is not installed
+    with pytest.raises(ValueError, match="Unsupported Content-Encoding"):
+        decode(raw, "zstd")
+    with pytest.raises(ValueError, match="Unsupported Content-Encoding"):
+        RawJSON(raw, "zstd")
+
+
 def test_options() -> None:
     """Test options returns CORS headers."""
     # Test with no origin (fallback to production domain)
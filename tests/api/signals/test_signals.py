@@ -2,9 +2,12 @@
 
 import json
 from datetime import datetime
+from typing import Any
 
-from shared.python.models import UserModel
+from shared.python.history import SIGNALS_KEY
+from shared.python.models import UserModel, query_by_api_key
 from shared.python.utils import DATE_FMT
+from signals import app
 from signals.app import (
     MAX_ACCESSES,
     get_signals,
@@ -59,3 +62,53 @@ def test_get_signals() -> None:
     assert not remaining
     res = get_signals(event)
     assert res["statusCode"] == 403
+
+
+def test_update_access_queue_projected() -> None:
+    """Test the rate limit updates a user read from the narrowed api_key index."""
+    user = UserModel.get("test_user@example.com")
+    alerts = user.alerts.as_dict()
+    user = query_by_api_key("test_api_key")[0]
+    assert user.alerts is None
+    update_access_queue(user)
+    user = UserModel.get("test_user@example.com")
+    assert user.alerts.as_dict() == alerts
+
+
+def test_get_signals_since(fake_s3: Any) -> None:
+    """Test ?since= returns newer signals and checks the version of older ones."""
+    rows = [f"2024-01-{day:02},{day % 2 == 0}" for day in range(1, 11)]
+    s3 = fake_s3(app, objects={SIGNALS_KEY: ("Time,Sig\n" + "\n".join(rows)).encode()})
+    user = UserModel.get("test_user@example.com")
+    user.update(actions=[UserModel.in_beta.set(1), UserModel.access_queue.set([])])
+    event: dict[str, Any] = {"headers": {"x-api-key": "test_api_key"}}
+
+    body = json.loads(get_signals(event)["body"])
+    assert [datum["Date"] for datum in body["data"]] == [row[:10] for row in rows[-7:]]
+    version = body["version"]
+
+    # Appending keeps the version of the signals the client has
+    rows.append("2024-01-11,False")
+    s3.put_object(
+        Bucket="", Key=SIGNALS_KEY, Body="\n".join(["Time,Sig", *rows]).encode()
+    )
+    event["queryStringParameters"] = {"since": "2024-01-10", "version": version}
+    body = json.loads(get_signals(event)["body"])
+    assert [datum["Date"] for datum in body["data"]] == ["2024-01-11"]
+    assert body["version"] != version
+
+    # Rewriting them does not
+    rows[0] = "2024-01-01,True"
+    s3.put_object(
+        Bucket="", Key=SIGNALS_KEY, Body="\n".join(["Time,Sig", *rows]).encode()
+    )
+    event["queryStringParameters"]["since"] = "2024-01-11"
+    event["queryStringParameters"]["version"] = body["version"]
+    assert get_signals(event)["statusCode"] == 409
+    del event["queryStringParameters"]["version"]
+    assert json.loads(get_signals(event)["body"])["data"] == []
+
+    # Over quota is refused before reading S3
+    reads = len(s3.keys)
+    assert get_signals(event)["statusCode"] == 403
+    assert len(s3.keys) == reads
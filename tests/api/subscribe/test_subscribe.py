@@ -2,10 +2,14 @@
 
 import json
 import os
+from datetime import UTC, datetime
 
 import stripe
-from shared.python.models import UserModel
+from pynamodb.attributes import UTCDateTimeAttribute
+from shared.python.models import Checkout, Stripe, UserModel
+from shared.python.utils import PAST_DATE
 from subscribe.app import (
+    expire_checkout,
     get_plans,
     get_product,
     handle_billing,
@@ -145,6 +149,32 @@ def test_post_subscribe() -> None:
     assert user.subscribed
 
 
+def test_expire_checkout() -> None:
+    """Test expire_checkout resets only the checkout timestamp."""
+    email = "expire_checkout@example.com"
+    checkout = Checkout(
+        url="https://checkout.stripe.com/test", created=datetime.now(UTC)
+    )
+    UserModel(
+        email, customer_id="cus_expire", subscribed=1, stripe=Stripe(checkout=checkout)
+    ).save()
+    user = list(UserModel.customer_id_index.query("cus_expire"))[0]
+    expire_checkout(user, [UserModel.subscribed.set(0)])
+    user = UserModel.get(email)
+    assert not user.subscribed
+    assert user.stripe.checkout["url"] == "https://checkout.stripe.com/test"
+    assert user.stripe.checkout["created"] == UTCDateTimeAttribute().serialize(
+        PAST_DATE
+    )
+
+    # Users without a checkout map still get the other actions
+    user.update(actions=[UserModel.stripe.remove(), UserModel.subscribed.set(1)])
+    expire_checkout(user, [UserModel.subscribed.set(0)])
+    user = UserModel.get(email)
+    assert not user.subscribed
+    user.delete()
+
+
 def test_cleanup() -> None:
     """Clean up test Stripe customers."""
     result = stripe_client.v1.customers.search(
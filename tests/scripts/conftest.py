@@ -0,0 +1,6 @@
+"""Pytest configuration for script tests."""
+
+import os
+
+# The shared layer the scripts import reads DOMAIN at import time
+os.environ.setdefault("DOMAIN", "algotrade.io")
@@ -0,0 +1,40 @@
+"""Tests for the model publishing script."""
+
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+import publish_model
+import pytest
+from model.app import unpack_visualization
+
+
+def test_read_model(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test pickles become visualization artifacts and other files pass as-is."""
+    data = {
+        "actual": [{"BUY": np.arange(3.0), "SELL": np.arange(2.0)}] * 2,
+        "centroid": np.zeros(2),
+        "radius": 0.5,
+        "grid": [np.zeros((2, 2))] * 2,
+        "preds": np.array([0, 1, 1, 0]),
+    }
+    (tmp_path / "metadata.json").write_text('{"accuracy": 0.6}')
+    (tmp_path / "2D").mkdir()
+    for label, value in data.items():
+        (tmp_path / "2D" / f"{label}.pkl").write_bytes(pickle.dumps(value))
+
+    files = publish_model.read_model(tmp_path)
+    assert sorted(files) == [
+        "2D/visualization.json",
+        "2D/visualization.npz",
+        "metadata.json",
+    ]
+    assert files["metadata.json"] == b'{"accuracy": 0.6}'
+    assert json.loads(files["2D/visualization.json"])["radius"] == 0.5
+    unpacked = unpack_visualization(files["2D/visualization.npz"])
+    assert unpacked["preds"].tolist() == [0, 1, 1, 0]
+
+    publish_model.main([str(tmp_path), "--dry-run"])
+    keys = [line.split()[0] for line in capsys.readouterr().out.splitlines()]
+    assert keys == list(publish_model.publish_version(files))
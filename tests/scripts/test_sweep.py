@@ -0,0 +1,118 @@
+"""Tests for the parameter-sweep backtest runner."""
+
+import numpy as np
+import pytest
+import sweep
+from shared.python import backtest
+
+
+def _series(periods: int = 200) -> tuple[np.ndarray, np.ndarray]:
+    """Build random closes and signals."""
+    rng = np.random.default_rng(3)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.03, periods))
+    return close, rng.random(periods) < 0.6
+
+
+def test_confirm_positions() -> None:
+    """Test signals are held only once repeated enough closes in a row."""
+    signals = [False, True, False, False, True, True, True, False]
+    assert sweep.confirm_positions(signals, 1).tolist() == signals
+    assert sweep.confirm_positions(signals, 2).tolist() == [
+        True,
+        True,
+        True,
+        False,
+        False,
+        True,
+        True,
+        True,
+    ]
+    assert sweep.confirm_positions(signals, 4).all()
+
+
+def test_evaluate() -> None:
+    """Test each combination matches a backtest with its fee and positions."""
+    close, signals = _series()
+    combos = [(1, 0.001, 0.0), (3, 0.001, 0.0), (1, 0.002, 0.001)]
+    values = sweep.evaluate(close, signals, combos)
+    assert values.shape == (3, len(sweep.METRIC_COLUMNS))
+
+    for row, (confirm, fee, slippage) in enumerate(combos):
+        positions = sweep.confirm_positions(signals, confirm)
+        result = backtest.backtest(close, positions, 1 - (1 - fee) * (1 - slippage))
+        expected = [
+            result[denom]["stats"][name][1]
+            for denom, names in backtest.METRICS.items()
+            for name in names
+        ]
+        np.testing.assert_allclose(values[row], expected)
+
+
+def test_sweep(tmp_path: pytest.TempPathFactory) -> None:
+    """Test a pooled sweep covers the grid and ranks, saves and loads."""
+    close, signals = _series()
+    grid = {"confirm": [1, 2, 3], "slippage": [0.0, 0.001]}
+    columns = sweep.sweep(close, signals, grid, workers=2, chunk=4)
+
+    assert list(columns) == [*sweep.PARAMS, *sweep.METRIC_COLUMNS]
+    assert columns["confirm"].tolist() == [1, 1, 2, 2, 3, 3]
+    assert columns["slippage"].tolist() == [0.0, 0.001] * 3
+    assert (columns["fee"] == backtest.BACKTEST_FEE).all()
+    combos = list(zip(*(columns[name] for name in sweep.PARAMS), strict=True))
+    expected = sweep.evaluate(close, signals, combos)
+    for col, name in enumerate(sweep.METRIC_COLUMNS):
+        np.testing.assert_array_equal(columns[name], expected[:, col])
+
+    best = sweep.rank(columns, "USD Total Return [%]", top=2)
+    assert len(best) == 2
+    assert best[0]["USD Total Return [%]"] == columns["USD Total Return [%]"].max()
+    lowest = sweep.rank(columns, "USD Max Drawdown [%]", top=1)[0]
+    assert lowest["USD Max Drawdown [%]"] == columns["USD Max Drawdown [%]"].min()
+
+    path = tmp_path / "sweep.npz"
+    sweep.save(columns, path)
+    with np.load(path) as saved:
+        assert list(saved) == list(columns)
+        np.testing.assert_array_equal(
+            saved["USD Sharpe Ratio"], columns["USD Sharpe Ratio"]
+        )
+
+    with pytest.raises(ValueError):
+        sweep.sweep(close, signals, {"threshold": [0.5]})
+
+
+def test_main(tmp_path: pytest.TempPathFactory, capsys: pytest.CaptureFixture) -> None:
+    """Test the command line sweeps local CSVs into a results file."""
+    close, signals = _series(30)
+    times = [f"2024-01-{day:02d}" for day in range(1, 31)]
+    prices = tmp_path / "prices.csv"
+    prices.write_text(
+        "Time,Close\n"
+        + "".join(f"{t},{c}\n" for t, c in zip(times, close, strict=True))
+    )
+    sigs = tmp_path / "signals.csv"
+    sigs.write_text(
+        "Time,Sig\n"
+        + "".join(f"{t},{s}\n" for t, s in zip(times, signals, strict=True))
+    )
+    out = tmp_path / "out.npz"
+    sweep.main(
+        [
+            str(prices),
+            str(sigs),
+            "--confirm",
+            "1",
+            "2",
+            "--workers",
+            "1",
+            "--out",
+            str(out),
+        ]
+    )
+
+    with np.load(out) as saved:
+        assert saved["confirm"].tolist() == [1, 2]
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "2 combinations over 30 closes"
+    assert "USD Sharpe Ratio" in lines[2]
+    assert len(lines) == 5
@@ -5,6 +5,10 @@ if [[ $(aws dynamodb list-tables --endpoint-url=http://localhost:8000 | grep use
     aws dynamodb delete-table --table-name users-local --endpoint-url=http://localhost:8000
 fi
 
+if [[ $(aws dynamodb list-tables --endpoint-url=http://localhost:8000 | grep throttle-local) ]]; then
+    aws dynamodb delete-table --table-name throttle-local --endpoint-url=http://localhost:8000
+fi
+
 aws dynamodb create-table \
     --table-name users-local \
     --key-schema \
@@ -16,11 +20,23 @@ aws dynamodb create-table \
         AttributeName=in_beta,AttributeType=N \
         AttributeName=subscribed,AttributeType=N \
     --global-secondary-indexes \
-        IndexName=api_key_index,KeySchema=["{AttributeName=api_key,KeyType=HASH}"],Projection={ProjectionType=ALL} \
-        IndexName=customer_id_index,KeySchema=["{AttributeName=customer_id,KeyType=HASH}"],Projection={ProjectionType=ALL} \
-        IndexName=in_beta_index,KeySchema=["{AttributeName=in_beta,KeyType=HASH}"],Projection={ProjectionType=ALL} \
-        IndexName=subscribed_index,KeySchema=["{AttributeName=subscribed,KeyType=HASH}"],Projection={ProjectionType=ALL} \
+        IndexName=api_key_index_v2,KeySchema=["{AttributeName=api_key,KeyType=HASH}"],"Projection={ProjectionType=INCLUDE,NonKeyAttributes=[in_beta,subscribed,access_queue]}" \
+        IndexName=customer_id_index_v2,KeySchema=["{AttributeName=customer_id,KeyType=HASH}"],"Projection={ProjectionType=INCLUDE,NonKeyAttributes=[subscribed]}" \
+        IndexName=in_beta_index_v2,KeySchema=["{AttributeName=in_beta,KeyType=HASH}"],"Projection={ProjectionType=INCLUDE,NonKeyAttributes=[alerts,api_key]}" \
+        IndexName=subscribed_index_v2,KeySchema=["{AttributeName=subscribed,KeyType=HASH}"],"Projection={ProjectionType=INCLUDE,NonKeyAttributes=[alerts,api_key]}" \
+    --billing-mode PAY_PER_REQUEST \
+    --endpoint-url http://localhost:8000 \
+    --no-cli-pager
+aws dynamodb put-item --table-name users-local --item "{\"email\":{\"S\":\"test_user@example.com\"}, \"api_key\":{\"S\":\"test_api_key\"}}" --endpoint-url http://localhost:8000
+
+aws dynamodb create-table \
+    --table-name throttle-local \
+    --key-schema AttributeName=key,KeyType=HASH \
+    --attribute-definitions AttributeName=key,AttributeType=S \
     --billing-mode PAY_PER_REQUEST \
     --endpoint-url http://localhost:8000 \
     --no-cli-pager
-aws dynamodb put-item --table-name users-local --item "{\"email\":{\"S\":\"test_user@example.com\"}, \"api_key\":{\"S\":\"test_api_key\"}}" --endpoint-url http://localhost:8000
\ No newline at end of file
+aws dynamodb update-time-to-live --table-name throttle-local \
+    --time-to-live-specification Enabled=true,AttributeName=expires \
+    --endpoint-url http://localhost:8000 \
+    --no-cli-pager
\ No newline at end of file